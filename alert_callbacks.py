@@ -0,0 +1,602 @@
+#!/usr/bin/env python3
+"""
+Card Callbacks and Escalation
+A local HTTP server that receives the button actions of interactive alert
+cards. "Acil Müdahale" acknowledges the alert. "Detayları Gör" answers with
+its details. High urgency cards that nobody acknowledges within the timeout
+are sent again with @all through send_urgent_alert.
+
+Pending escalations live in a hashed timing wheel: scheduling and
+acknowledging are a dict insert or delete, and each tick only looks at the
+slot that is due, however many alerts are outstanding.
+
+Point the bot's card request URL at http://<host>:8791/lark/card. Lark's
+URL verification challenge is answered, and with a verification token set,
+callbacks carrying another token are refused. Without a token the server
+only binds to a loopback address, as anyone reaching it could acknowledge
+alerts.
+"""
+
+import argparse
+import ipaddress
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, List, NamedTuple, Callable
+
+from metrics import Counter, Gauge
+
+CALLBACK_PORT = 8791
+CALLBACK_PATH = "/lark/card"
+ESCALATION_TIMEOUT_SEC = 300  # Unacknowledged high alerts are escalated after this
+TICK_SEC = 1.0  # Timing wheel resolution
+WHEEL_SLOTS = 4096  # Covers timeouts up to ~68 minutes without revisiting entries
+MAX_CLOSED = 10000  # Acknowledged and escalated alerts remembered for late clicks
+
+ACTION_ACK = "ack"
+ACTION_DETAILS = "details"
+
+ALERTS_ACKNOWLEDGED = Counter("alerts_acknowledged_total", "Alerts acknowledged from a card button")
+ALERTS_ESCALATED = Counter("alerts_escalated_total", "Unacknowledged alerts sent again with @all", ["result"])
+ALERTS_AWAITING_ACK = Gauge("alerts_awaiting_ack", "Alerts sent with buttons and not yet acknowledged")
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel
+
+    A timer due at tick t is kept in slot t % slots. Advancing the wheel
+    visits one slot per elapsed tick and expires the timers in it that are
+    due. Timers further out than one rotation stay in their slot until
+    their round comes, so keep timeout / tick below slots for O(1) ticks.
+    """
+
+    def __init__(self, tick: float = TICK_SEC, slots: int = WHEEL_SLOTS, now: Optional[float] = None):
+        """
+        Initialize the wheel
+
+        Args:
+            tick: Seconds per slot
+            slots: Number of slots
+            now: Current time, default time.time()
+        """
+        self.tick = tick
+        self._slots: List[Dict[Any, Any]] = [{} for _ in range(slots)]
+        self._slot_of: Dict[Any, int] = {}
+        self._deadline: Dict[Any, int] = {}
+        self._current = int((time.time() if now is None else now) // tick)
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key) -> bool:
+        return key in self._slot_of
+
+    def schedule(self, key, delay: float, value: Any = None, now: Optional[float] = None):
+        """
+        Expire key after delay seconds, replacing an earlier timer for it
+
+        Args:
+            key: Timer key, hashable
+            delay: Seconds from now
+            value: Returned with the key when it expires
+            now: Current time, default time.time()
+        """
+        self.cancel(key)
+        now = time.time() if now is None else now
+        # Rounded up so a timer never fires early, and never in a tick already passed
+        deadline = max(-int(-(now + delay) // self.tick), self._current + 1)
+        slot = deadline % len(self._slots)
+        self._slots[slot][key] = value
+        self._slot_of[key] = slot
+        self._deadline[key] = deadline
+
+    def cancel(self, key) -> bool:
+        """Remove the timer for key, True if there was one"""
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        del self._deadline[key]
+        return True
+
+    def advance(self, now: Optional[float] = None) -> List[tuple]:
+        """
+        Move the wheel to now
+
+        Args:
+            now: Current time, default time.time()
+
+        Returns:
+            (key, value) of every timer that expired, earliest tick first
+        """
+        target = int((time.time() if now is None else now) // self.tick)
+        expired = []
+        # After a long pause every slot is visited once, not once per missed tick
+        for tick in range(self._current + 1, min(target, self._current + len(self._slots)) + 1):
+            slot = self._slots[tick % len(self._slots)]
+            if not slot:
+                continue
+            for key in [key for key in slot if self._deadline[key] <= target]:
+                expired.append((key, slot.pop(key)))
+                del self._slot_of[key]
+                del self._deadline[key]
+        self._current = max(self._current, target)
+        return expired
+
+
+class PendingAlert(NamedTuple):
+    """Alert card waiting for an acknowledgement"""
+    alert_id: str
+    title: str
+    details: Dict[str, str]
+    sent_at: float
+
+
+class EscalationTracker:
+    """Tracks alert cards until acknowledged, escalating the ones left unanswered"""
+
+    def __init__(self, client, timeout: float = ESCALATION_TIMEOUT_SEC, tick: float = TICK_SEC,
+                 slots: int = WHEEL_SLOTS, clock: Callable[[], float] = time.time):
+        """
+        Initialize the tracker
+
+        Args:
+            client: LarkGroupChatClient used for escalations (not the async one)
+            timeout: Seconds before an unacknowledged alert is escalated
+            tick: Timing wheel resolution in seconds
+            slots: Timing wheel size
+            clock: Time source
+        """
+        self.client = client
+        self.timeout = timeout
+        self.clock = clock
+        self._wheel = TimingWheel(tick, slots, clock())
+        self._pending: Dict[str, PendingAlert] = {}
+        self._closed: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {"tracked": 0, "acknowledged": 0, "escalated": 0, "escalation_failed": 0}
+
+    def track(self, alert_id: str, title: str, details: Dict[str, str]):
+        """
+        Start the escalation timer for a sent card
+
+        A repeat card for an alert still pending only updates its details and
+        keeps the first card's deadline. One for an alert acknowledged less
+        than a timeout ago is not tracked; after that, or after an
+        escalation, it starts a new timer.
+
+        Args:
+            alert_id: ID in the card's button values, the same for every card of one condition
+            title: Alert title
+            details: Card detail fields
+        """
+        now = self.clock()
+        with self._lock:
+            pending = self._pending.get(alert_id)
+            if pending is not None:
+                self._pending[alert_id] = pending._replace(title=title, details=dict(details))
+                return
+            closed = self._closed.get(alert_id)
+            if closed is not None and closed["status"] == "acknowledged" and now - closed["at"] < self.timeout:
+                return
+            self._pending[alert_id] = PendingAlert(alert_id, title, dict(details), now)
+            self._wheel.schedule(alert_id, self.timeout, now=now)
+            self.counts["tracked"] += 1
+            ALERTS_AWAITING_ACK.set(len(self._pending))
+
+    def acknowledge(self, alert_id: str, user: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Mark an alert acknowledged and cancel its escalation
+
+        Args:
+            alert_id: ID from the button value
+            user: Who pressed the button
+
+        Returns:
+            Dictionary with 'status' (acknowledged, already_acknowledged,
+            acknowledged_late after an escalation, or unknown) and the alert
+        """
+        now = self.clock()
+        with self._lock:
+            alert = self._pending.pop(alert_id, None)
+            if alert is not None:
+                self._wheel.cancel(alert_id)
+                self.counts["acknowledged"] += 1
+                ALERTS_ACKNOWLEDGED.inc()
+                ALERTS_AWAITING_ACK.set(len(self._pending))
+                self._close(alert_id, {"status": "acknowledged", "by": user, "at": now, "alert": alert})
+                return {"status": "acknowledged", "alert": alert}
+            closed = self._closed.get(alert_id)
+            if closed is None:
+                return {"status": "unknown", "alert": None}
+            if closed["status"] == "escalated":
+                self._close(alert_id, dict(closed, status="acknowledged", by=user, at=now))
+                return {"status": "acknowledged_late", "alert": closed["alert"]}
+            return {"status": "already_acknowledged", "alert": closed["alert"], "by": closed["by"]}
+
+    def lookup(self, alert_id: str) -> Optional[PendingAlert]:
+        """Pending or recently closed alert with this ID"""
+        with self._lock:
+            alert = self._pending.get(alert_id)
+            if alert is None and alert_id in self._closed:
+                alert = self._closed[alert_id]["alert"]
+            return alert
+
+    def tick(self) -> List[PendingAlert]:
+        """
+        Escalate every alert whose timeout has passed
+
+        Returns:
+            The escalated alerts
+        """
+        now = self.clock()
+        with self._lock:
+            due = []
+            for alert_id, _ in self._wheel.advance(now):
+                alert = self._pending.pop(alert_id)
+                self._close(alert_id, {"status": "escalated", "by": None, "at": now, "alert": alert})
+                due.append(alert)
+            if due:
+                ALERTS_AWAITING_ACK.set(len(self._pending))
+        # Sent outside the lock so acknowledgements are not held up by Lark
+        for alert in due:
+            self._escalate(alert, now)
+        return due
+
+    def _escalate(self, alert: PendingAlert, now: float):
+        waited = now - alert.sent_at
+        since = f"{waited / 60:.0f} dakikadır" if waited >= 120 else f"{waited:.0f} saniyedir"
+        lines = [f"{since} kimse müdahale etmedi.", ""]
+        lines.extend(f"**{key}:** {value}" for key, value in alert.details.items())
+        result = self.client.send_urgent_alert(f"ONAYLANMAYAN ALARM: {alert.title}", "\n".join(lines),
+                                               mention_all=True)
+        outcome = "sent" if result.get('success') else "failed"
+        ALERTS_ESCALATED.inc(result=outcome)
+        with self._lock:
+            self.counts["escalated" if result.get('success') else "escalation_failed"] += 1
+        if not result.get('success'):
+            print(f"❌ Escalation of {alert.alert_id} failed: {result.get('error')}")
+
+    def _close(self, alert_id: str, record: Dict[str, Any]):
+        self._closed[alert_id] = record
+        self._closed.move_to_end(alert_id)
+        while len(self._closed) > MAX_CLOSED:
+            self._closed.popitem(last=False)
+
+    # MemoryBudget protocol, over the closed alerts kept for late clicks; pending ones are never evicted
+
+    def __len__(self) -> int:
+        return len(self._closed)
+
+    def evict(self, count: int) -> int:
+        """Forget the count oldest acknowledged or escalated alerts"""
+        with self._lock:
+            count = min(count, len(self._closed))
+            for _ in range(count):
+                self._closed.popitem(last=False)
+            return count
+
+    def sample(self, count: int) -> list:
+        with self._lock:
+            return list(itertools.islice(self._closed.items(), count))
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts, and alerts still awaiting an acknowledgement"""
+        with self._lock:
+            return dict(self.counts, pending=len(self._pending))
+
+
+def parse_callback(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Button value, user and token of a card callback
+
+    Accepts both the message card callback (action at the top level) and the
+    card.action.trigger event (action under "event").
+
+    Args:
+        body: Decoded callback request
+
+    Returns:
+        Dictionary with 'value', 'user' and 'token'
+    """
+    event = body.get("event") or {}
+    action = body.get("action") or event.get("action") or {}
+    value = action.get("value") or {}
+    if isinstance(value, str):
+        # Older clients send the button value as a JSON string
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = {}
+    operator = event.get("operator") or {}
+    user = body.get("user_id") or body.get("open_id") or operator.get("user_id") or operator.get("open_id")
+    token = body.get("token") or (body.get("header") or {}).get("token")
+    return {"value": value if isinstance(value, dict) else {}, "user": user, "token": token}
+
+
+def _toast(kind: str, content: str) -> Dict[str, Any]:
+    return {"toast": {"type": kind, "content": content}}
+
+
+def handle_callback(tracker: EscalationTracker, body: Dict[str, Any],
+                    verification_token: Optional[str] = None) -> tuple:
+    """
+    Answer one callback request
+
+    Args:
+        tracker: Tracker holding the alerts
+        body: Decoded callback request
+        verification_token: Expected token, None accepts any
+
+    Returns:
+        Tuple of HTTP status code and response body
+    """
+    callback = parse_callback(body)
+    if verification_token is not None and callback["token"] != verification_token:
+        return 401, {"error": "invalid token"}
+    if body.get("type") == "url_verification" or "challenge" in body:
+        return 200, {"challenge": body.get("challenge")}
+
+    value = callback["value"]
+    alert_id = value.get("alert_id")
+    if not alert_id:
+        return 200, _toast("error", "Bu kartın bir alarm kimliği yok")
+
+    if value.get("action") == ACTION_ACK:
+        result = tracker.acknowledge(alert_id, callback["user"])
+        if result["status"] == "acknowledged":
+            return 200, _toast("success", f"Alarm onaylandı: {result['alert'].title}")
+        if result["status"] == "acknowledged_late":
+            return 200, _toast("warning", "Alarm onaylandı, ancak zaten eskale edilmişti")
+        if result["status"] == "already_acknowledged":
+            return 200, _toast("info", "Bu alarm zaten onaylandı")
+        return 200, _toast("error", "Alarm bulunamadı")
+
+    if value.get("action") == ACTION_DETAILS:
+        alert = tracker.lookup(alert_id)
+        if alert is None:
+            return 200, _toast("error", "Alarm bulunamadı")
+        details = ", ".join(f"{key}: {value}" for key, value in alert.details.items())
+        return 200, _toast("info", f"{alert.title} | {details}")
+
+    return 200, _toast("error", "Bilinmeyen işlem")
+
+
+class CallbackServer:
+    """HTTP server for card callbacks, plus the thread ticking the escalation wheel"""
+
+    def __init__(self, tracker: EscalationTracker, host: str = "127.0.0.1", port: int = CALLBACK_PORT,
+                 verification_token: Optional[str] = None):
+        """
+        Initialize the server
+
+        Args:
+            tracker: Tracker the monitors register their cards with
+            host: Interface to bind to
+            port: Port to bind to (0 picks a free port)
+            verification_token: Token from the bot settings, None accepts any
+                and is only allowed on a loopback host
+
+        Raises:
+            ValueError: A non-loopback host without a verification token
+        """
+        if verification_token is None and not _is_loopback(host):
+            raise ValueError(f"Refusing to serve card callbacks on {host} without a verification token")
+        self.tracker = tracker
+        self.verification_token = verification_token
+        self._server = _make_http_server(self, host, port)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def url(self) -> str:
+        """Card request URL to configure for the bot"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{CALLBACK_PATH}"
+
+    def start(self) -> "CallbackServer":
+        """Serve callbacks and tick the wheel in background threads"""
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._server.serve_forever, daemon=True),
+                         threading.Thread(target=self._tick_loop, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _tick_loop(self):
+        while not self._stop.wait(self.tracker._wheel.tick):
+            try:
+                self.tracker.tick()
+            except Exception as e:
+                print(f"❌ Escalation tick failed: {e}")
+
+    def stop(self):
+        """Stop both threads and release the socket"""
+        self._stop.set()
+        self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> "CallbackServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _make_http_server(callbacks: CallbackServer, host: str, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            if self.path != CALLBACK_PATH:
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                if not isinstance(body, dict):
+                    raise ValueError("callback body must be a JSON object")
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(*handle_callback(callbacks.tracker, body, callbacks.verification_token))
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, callbacks.tracker.stats())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def _send_json(self, status: int, data: Dict[str, Any]):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    return Server((host, port), Handler)
+
+
+def start_escalations(client, timeout: float = ESCALATION_TIMEOUT_SEC, port: int = CALLBACK_PORT,
+                      host: str = "127.0.0.1", verification_token: Optional[str] = None) -> CallbackServer:
+    """
+    Serve card callbacks and escalate the cards client sends from now on
+
+    Args:
+        client: LarkGroupChatClient sending the alert cards and the escalations
+        timeout: Seconds before an unacknowledged alert is escalated
+        port: Callback port
+        host: Interface to bind to
+        verification_token: Token from the bot settings, None accepts any
+            and is only allowed on a loopback host
+
+    Returns:
+        The running server, stop() it on shutdown
+    """
+    server = CallbackServer(EscalationTracker(client, timeout), host, port, verification_token).start()
+    client.escalations = server.tracker
+    return server
+
+
+def run_demo(alerts: int = 5, acknowledged: int = 3, timeout: float = 2.0) -> Dict[str, Any]:
+    """
+    Send cards to a mock Lark server, press some buttons, let the rest escalate
+
+    Returns:
+        Tracker stats and the messages the mock server received
+    """
+    from lark_group_chat import LarkGroupChatClient
+    from mock_lark_server import MockLarkServer, press_button
+
+    with MockLarkServer() as lark:
+        client = LarkGroupChatClient(lark.url)
+        server = start_escalations(client, timeout, port=0)
+        try:
+            for i in range(alerts):
+                client.send_rich_alert_card(f"Spread Uyarısı #{i + 1}", {"Parite": "BTC/USDT", "Spread": "2.1%"})
+            for card in lark.received[:acknowledged]:
+                press_button(server.url, card, "Acil Müdahale", user_id="ou_demo")
+            time.sleep(timeout + 2 * server.tracker._wheel.tick)
+        finally:
+            server.stop()
+        return {"stats": server.tracker.stats(), "received": len(lark.received)}
+
+
+def run_benchmark(outstanding: int, tick: float = TICK_SEC, timeout: float = ESCALATION_TIMEOUT_SEC) -> Dict[str, Any]:
+    """
+    Cost of tracking, acknowledging and ticking with many outstanding alerts
+
+    Alerts are sent over the first half of the timeout and half of them are
+    acknowledged. The clock then moves tick by tick: through the second
+    half nothing is due, after it the other half escalates (into a counting
+    stub).
+
+    Returns:
+        Microseconds per track and acknowledge, per idle tick, per
+        escalation, and the number escalated
+    """
+    class Counting:
+        sent = 0
+
+        def send_urgent_alert(self, title, message, mention_all=True):
+            Counting.sent += 1
+            return {'success': True, 'status_code': 200, 'data': {}}
+
+    clock = [1_000_000.0]
+    tracker = EscalationTracker(Counting(), timeout, tick, clock=lambda: clock[0])
+    details = {"Parite": "BTC/USDT"}
+
+    start = time.perf_counter()
+    for i in range(outstanding):
+        tracker.track(f"a{i}", "Spread Uyarısı", details)
+        clock[0] += timeout / outstanding / 2
+    track_us = (time.perf_counter() - start) / outstanding * 1e6
+
+    start = time.perf_counter()
+    for i in range(0, outstanding, 2):
+        tracker.acknowledge(f"a{i}")
+    ack_us = (time.perf_counter() - start) / (outstanding / 2) * 1e6
+
+    idle_ticks = int(timeout / 2 / tick) - 1
+    start = time.perf_counter()
+    for _ in range(idle_ticks):
+        clock[0] += tick
+        tracker.tick()
+    idle_tick_us = (time.perf_counter() - start) / idle_ticks * 1e6
+
+    start = time.perf_counter()
+    for _ in range(int(timeout / 2 / tick) + 3):
+        clock[0] += tick
+        tracker.tick()
+    escalation_us = (time.perf_counter() - start) / max(Counting.sent, 1) * 1e6
+    return {"outstanding": outstanding, "track_us": track_us, "ack_us": ack_us, "idle_tick_us": idle_tick_us,
+            "escalation_us": escalation_us, "escalated": Counting.sent}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Card callback server with escalation of unacknowledged alerts")
+    parser.add_argument("--demo", action="store_true", help="Send cards to a mock Lark server and press buttons")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Time the tracker with N outstanding alerts")
+    parser.add_argument("--timeout", type=float, default=ESCALATION_TIMEOUT_SEC,
+                        help="Seconds before an unacknowledged alert is escalated")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        result = run_benchmark(args.benchmark, timeout=args.timeout)
+        print(f"{result['outstanding']:,} alerts: track {result['track_us']:.2f}µs, "
+              f"acknowledge {result['ack_us']:.2f}µs, idle tick {result['idle_tick_us']:.2f}µs, "
+              f"{result['escalated']:,} escalated at {result['escalation_us']:.2f}µs each")
+        return
+
+    if args.demo:
+        result = run_demo(timeout=min(args.timeout, 2.0))
+        print(f"✅ {result['stats']}, mock Lark received {result['received']} messages")
+        return
+
+    parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Size-Aware Alert Packing for Lark Webhooks
+Splits many alerts across as few text messages or cards as Lark's request
+body limit allows. Sizes are measured as they will be serialized by
+json.dumps in _make_request, so every message fits and none is rejected.
+
+Entries are serialized once and each message is rendered with a single
+join, so packing n alerts is linear in their total size.
+"""
+
+import json
+from typing import Dict, Any, List, Optional, Sequence
+
+MAX_BODY_BYTES = 20000  # Lark rejects webhook request bodies over 20KB
+PART_SUFFIX = " ({part}/{parts})"
+TRUNCATED = "…"
+
+
+def json_size(value: Any) -> int:
+    """Bytes value takes in a request body"""
+    return len(json.dumps(value))
+
+
+def text_size(text: str) -> int:
+    """Bytes text adds inside a JSON string (escapes included)"""
+    return len(json.dumps(text)) - 2
+
+
+def truncate_text(text: str, max_size: int) -> str:
+    """Longest prefix of text (plus an ellipsis) whose JSON-escaped size fits max_size"""
+    if text_size(text) <= max_size:
+        return text
+    room = max_size - text_size(TRUNCATED)
+    size = 0
+    for end, char in enumerate(text):
+        size += text_size(char)
+        if size > room:
+            return text[:end] + TRUNCATED
+    return text
+
+
+def pack_sizes(sizes: Sequence[int], capacity: int, separator: int = 0,
+               preserve_order: bool = True) -> List[List[int]]:
+    """
+    Group item indexes into bins whose total size fits capacity
+
+    Args:
+        sizes: Size of each item, each at most capacity
+        capacity: Room in one bin
+        separator: Size added between two items in the same bin
+        preserve_order: Fill bins in item order (next fit). Otherwise place
+            the largest items first into the first bin with room (first fit
+            decreasing), which can save bins but reorders items.
+
+    Returns:
+        Lists of item indexes, one per bin
+    """
+    bins: List[List[int]] = []
+    if preserve_order:
+        used = 0
+        for index, size in enumerate(sizes):
+            if bins and used + separator + size <= capacity:
+                bins[-1].append(index)
+                used += separator + size
+            else:
+                bins.append([index])
+                used = size
+        return bins
+
+    room: List[int] = []
+    for index in sorted(range(len(sizes)), key=lambda i: sizes[i], reverse=True):
+        size = sizes[index]
+        for number, free in enumerate(room):
+            if separator + size <= free:
+                bins[number].append(index)
+                room[number] -= separator + size
+                break
+        else:
+            bins.append([index])
+            room.append(capacity - size)
+    for items in bins:
+        items.sort()
+    return bins
+
+
+def _parts_label(parts: int, part: int) -> str:
+    return PART_SUFFIX.format(part=part, parts=parts) if parts > 1 else ""
+
+
+def pack_text_messages(entries: Sequence[str], title: str = "", footer: str = "", separator: str = "\n\n",
+                       max_bytes: int = MAX_BODY_BYTES, preserve_order: bool = True) -> List[Dict[str, Any]]:
+    """
+    Text message payloads holding all entries
+
+    Each message is title (with " (k/n)" when there are several), a blank
+    line, its entries joined by separator, and footer on the last message.
+
+    Args:
+        entries: Rendered alerts
+        title: First line of every message
+        footer: Last line of the last message
+        separator: Between entries, and between the title, entries and footer
+        max_bytes: Largest request body
+        preserve_order: Keep entries in order (see pack_sizes)
+    """
+    def payload(text):
+        return {"msg_type": "text", "content": {"text": text}}
+
+    separator_size = text_size(separator)
+    # The title, its part label and the footer are reserved in every message
+    fixed = (json_size(payload("")) + text_size(title + _parts_label(len(entries), len(entries)))
+             + 2 * separator_size + (text_size(footer) if footer else 0))
+    capacity = max_bytes - fixed
+    if capacity <= 0:
+        raise ValueError(f"title and footer leave no room in {max_bytes} bytes")
+
+    entries = [truncate_text(entry, capacity) for entry in entries]
+    bins = pack_sizes([text_size(entry) for entry in entries], capacity, separator_size, preserve_order)
+    if not bins:
+        bins = [[]]
+    payloads = []
+    for part, items in enumerate(bins, 1):
+        pieces = []
+        head = title + _parts_label(len(bins), part)
+        if head:
+            pieces.append(head)
+        if items:
+            pieces.append(separator.join([entries[index] for index in items]))
+        if footer and part == len(bins):
+            pieces.append(footer)
+        payloads.append(payload(separator.join(pieces)))
+    return payloads
+
+
+def pack_card_elements(header: Dict[str, Any], elements: Sequence[Dict[str, Any]],
+                       leading: Sequence[Dict[str, Any]] = (), trailing: Sequence[Dict[str, Any]] = (),
+                       config: Optional[Dict[str, Any]] = None, max_bytes: int = MAX_BODY_BYTES,
+                       preserve_order: bool = True) -> List[Dict[str, Any]]:
+    """
+    Interactive card payloads holding all elements
+
+    Every card repeats the header (its title gets " (k/n)" when there are
+    several) and the leading and trailing elements.
+
+    Args:
+        header: Card header, as in send_rich_alert_card
+        elements: Elements to split across cards
+        leading: Elements at the top of every card, e.g. the title line
+        trailing: Elements at the bottom of every card, e.g. buttons
+        config: Card config, default wide screen
+        max_bytes: Largest request body
+        preserve_order: Keep elements in order (see pack_sizes)
+    """
+    def payload(card_header, card_elements):
+        return {
+            "msg_type": "interactive",
+            "card": {
+                "config": config if config is not None else {"wide_screen_mode": True},
+                "header": card_header,
+                "elements": card_elements
+            }
+        }
+
+    # ", " between list items, and the label every title may get
+    separator_size = 2
+    fixed = json_size(payload(header, list(leading) + list(trailing)))
+    fixed += text_size(_parts_label(len(elements), len(elements)))
+    if leading or trailing:
+        fixed += separator_size
+    capacity = max_bytes - fixed
+    if capacity <= 0:
+        raise ValueError(f"card header and fixed elements leave no room in {max_bytes} bytes")
+
+    elements = [_fit_element(element, capacity) for element in elements]
+    bins = pack_sizes([json_size(element) for element in elements], capacity, separator_size, preserve_order)
+    if not bins:
+        bins = [[]]
+    payloads = []
+    for part, items in enumerate(bins, 1):
+        card_header = header
+        if len(bins) > 1:
+            card_header = dict(header, title=dict(header["title"]))
+            card_header["title"]["content"] += _parts_label(len(bins), part)
+        payloads.append(payload(card_header, list(leading) + [elements[index] for index in items] + list(trailing)))
+    return payloads
+
+
+def _fit_element(element: Dict[str, Any], capacity: int) -> Dict[str, Any]:
+    """Truncate the text of an element that could not fit even in an empty card"""
+    excess = json_size(element) - capacity
+    text = element.get("text")
+    if excess <= 0 or not isinstance(text, dict) or not isinstance(text.get("content"), str):
+        return element
+    content = text["content"]
+    fitted = dict(element, text=dict(text, content=truncate_text(content, text_size(content) - excess)))
+    return fitted
+
+
+def combine_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One result for a batch of requests, failed if any of them failed"""
+    if len(results) == 1:
+        return results[0]
+    failed = [result for result in results if not result['success']]
+    if failed:
+        return {
+            'success': False,
+            'error': f"{len(failed)} of {len(results)} messages failed: {failed[0]['error']}",
+            'status_code': failed[0].get('status_code'),
+            'results': results
+        }
+    return {
+        'success': True,
+        'status_code': results[-1].get('status_code'),
+        'data': [result.get('data') for result in results],
+        'messages': len(results)
+    }
@@ -0,0 +1,1026 @@
+#!/usr/bin/env python3
+"""
+Local Alert Relay
+A long-running service that accepts alerts from any local producer and owns
+delivery to Lark: deduplication, per-webhook rate limiting, batching of text
+messages under backlog, retries and keep-alive connections. Producers get an
+answer as soon as the alert is queued.
+
+Each webhook has three priority lanes, one per card urgency. A high alert is
+always sent next, and the lower lanes leave part of the rate budget unused so
+it can be. Medium and low lanes are capped at a share of the rate (LANE_SHARES).
+Queued low-urgency cards with the same title are coalesced into the latest one,
+and low alerts are shed while higher lanes have a backlog.
+
+Producers use RelayClient, a drop-in LarkGroupChatClient, over a Unix socket,
+or POST JSON to http://127.0.0.1:8790/alerts.
+
+Unix socket wire format, all integers big-endian:
+    frame    u32 body length | body
+    TARGET   b"T" | u16 target id | webhook URL (UTF-8)        registers a target for the connection
+    SUBMIT   b"S" | u16 target id | u8 urgency | u8 key length | dedup key | payload JSON
+    TRACED   b"R" | u16 target id | u8 urgency | u8 key length | f64 quote received | dedup key | payload JSON
+    reply    one status byte per SUBMIT or TRACED (see STATUS_*)
+Urgency is the index in URGENCIES.
+An empty dedup key means the relay dedups on a hash of target and payload.
+TRACED carries the Unix time the alert's quote arrived, so the relay can
+record the alert's end-to-end latency once Lark answers.
+
+An accepted alert is not delivered yet: RelayClient returns it as queued,
+and the relay counts it as sent or dropped, and records its acked stage,
+when Lark answers.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Iterable, Optional, List
+
+import tracing
+from alert_packer import json_size, pack_sizes, text_size
+from lark_group_chat import LarkGroupChatClient
+from lark_webhook import HTTPClientTransport
+from memory_budget import MemoryBudget, debug_endpoints
+from metrics import (Counter, Histogram, ALERTS_SENT, ALERTS_DROPPED, WEBHOOK_LATENCY, WEBHOOK_RESPONSES,
+                     QUEUE_DEPTH)
+
+RELAY_SOCKET = os.environ.get("ALERT_RELAY_SOCKET", "/tmp/alert_relay.sock")
+RELAY_HTTP_PORT = 8790  # localhost ingestion, 0 disables
+
+# Lark custom bots accept 5 messages per second and 100 per minute
+DEFAULT_RATE = 100 / 60
+DEFAULT_BURST = 5
+DEFAULT_MAX_PENDING = 10000  # per webhook, later submissions are shed
+DEFAULT_DEDUP_WINDOW = 60.0  # seconds
+MAX_BATCH_BYTES = 18000  # Lark rejects request bodies over 20KB
+BATCH_SEPARATOR = "\n\n────────\n\n"  # Between text messages merged into one request
+MAX_FRAME = 1 << 20
+MAX_ATTEMPTS = 5
+TARGET_IDLE_SEC = 300  # A webhook's delivery thread exits after this long with nothing to send
+LARK_RATE_LIMITED_CODE = 11232
+
+URGENCIES = ("high", "medium", "low")
+# Share of the webhook rate each lane may use
+LANE_SHARES = {"high": 1.0, "medium": 0.6, "low": 0.2}
+HIGH_RESERVE = 1  # Tokens of the webhook burst that only high alerts may spend
+LOW_MAX_PENDING = 1000
+SHED_LOW_BACKLOG = 50  # High and medium alerts waiting before low ones are shed
+MEMORY_BUDGET_MB = 64  # Dedup keys and queued low/medium alerts (see memory_budget.py)
+
+STATUS_ACCEPTED = 0
+STATUS_DUPLICATE = 1
+STATUS_SHED = 2
+STATUS_BAD_REQUEST = 3
+STATUS_COALESCED = 4
+STATUS_NAMES = {STATUS_ACCEPTED: "accepted", STATUS_DUPLICATE: "duplicate",
+                STATUS_SHED: "shed", STATUS_BAD_REQUEST: "bad_request", STATUS_COALESCED: "coalesced"}
+
+_FRAME_HEADER = struct.Struct("!I")
+_TARGET_HEADER = struct.Struct("!cH")
+_SUBMIT_HEADER = struct.Struct("!cHBB")
+_TRACED_HEADER = struct.Struct("!cHBBd")
+_TARGET_IDS = itertools.count()
+
+RELAY_SUBMISSIONS = Counter("relay_submissions_total", "Alerts submitted to the relay", ["status"])
+RELAY_DELIVERIES = Counter("relay_deliveries_total", "Relay webhook requests by outcome", ["result"])
+RELAY_DELIVERY_LATENCY = Histogram("relay_delivery_seconds", "Time from relay submit to Lark ack", ["urgency"],
+                                   buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+
+class TokenBucket:
+    """Token bucket rate limiter"""
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Initialize a full bucket
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Seconds until tokens are available, 0 if they are available now"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= tokens else (tokens - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Message:
+    __slots__ = ("body", "urgency", "coalesce_key", "attempts", "submitted", "quote_received")
+
+    def __init__(self, body: bytes, urgency: str, coalesce_key: Optional[str] = None,
+                 quote_received: Optional[float] = None):
+        self.body = body
+        self.urgency = urgency
+        self.coalesce_key = coalesce_key
+        self.attempts = 0
+        self.submitted = time.monotonic()
+        self.quote_received = quote_received
+
+
+def _parse_payload(body: bytes) -> Optional[Dict[str, Any]]:
+    """The decoded payload if it is a Lark message the relay can deliver and batch, else None"""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get("msg_type"), str):
+        return None
+    if payload["msg_type"] == "text" and not isinstance(_field(payload, "content", "text"), str):
+        return None
+    if payload["msg_type"] == "interactive" and not isinstance(payload.get("card"), dict):
+        return None
+    return payload
+
+
+def _field(value: Any, *keys: str) -> Any:
+    """value[key][key]..., None where a level is missing or not an object"""
+    for key in keys:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def _coalesce_key(payload: Dict[str, Any]) -> Optional[str]:
+    """Cards with the same header and title replace each other while queued in the low lane"""
+    if payload["msg_type"] != "interactive":
+        return None
+    card = payload["card"]
+    header = _field(card, "header", "title", "content")
+    header = header if isinstance(header, str) else ""
+    elements = card.get("elements")
+    for element in elements if isinstance(elements, list) else []:
+        content = _field(element, "text", "content")
+        if isinstance(content, str) and content and content != "<at id=all></at>":
+            return header + "|" + content
+    return header
+
+
+def _merged_text(texts: List[str]) -> Dict[str, Any]:
+    """One text message holding several queued ones"""
+    return {"msg_type": "text", "content": {"text": BATCH_SEPARATOR.join(texts)}}
+
+
+class _Target:
+    """Priority lanes and the delivery thread of one webhook"""
+
+    def __init__(self, relay: "AlertRelay", url: str):
+        self.relay = relay
+        self.url = url
+        self.lanes = {urgency: deque() for urgency in URGENCIES}
+        # Queued low-lane cards by coalesce key
+        self.coalescable: Dict[str, _Message] = {}
+        # Messages taken for the request being sent
+        self.inflight = 0
+        # Lark's limit for the webhook, and the share of it each lane may use
+        self.bucket = TokenBucket(relay.rate, relay.burst)
+        self.lane_buckets = {urgency: TokenBucket(relay.rate * share, max(1.0, relay.burst * share))
+                             for urgency, share in LANE_SHARES.items()}
+        self.reserve = max(0, min(HIGH_RESERVE, relay.burst - 1))
+        self.paused_until = 0.0
+        # Last send, the thread exits after TARGET_IDLE_SEC without one
+        self.active = time.monotonic()
+        self.transport = HTTPClientTransport()
+        self.thread = threading.Thread(target=self._run, name=f"relay-{next(_TARGET_IDS)}", daemon=True)
+
+    def backlog(self, urgencies=URGENCIES) -> int:
+        return sum(len(self.lanes[urgency]) for urgency in urgencies)
+
+    def _choose(self) -> tuple:
+        """
+        Lane to send from next, called with the relay lock held
+
+        Returns:
+            (urgency, 0) when a lane may send now, else (None, seconds to wait or None)
+        """
+        now = time.monotonic()
+        if now < self.paused_until:
+            return None, self.paused_until - now if self.backlog() else None
+        waits = []
+        for urgency in URGENCIES:
+            if not self.lanes[urgency]:
+                continue
+            # Lower lanes leave part of the burst for high alerts arriving next
+            needed = 1 if urgency == "high" else 1 + self.reserve
+            wait = max(self.bucket.delay(needed), self.lane_buckets[urgency].delay())
+            if wait == 0:
+                return urgency, 0
+            waits.append(wait)
+        return None, min(waits) if waits else None
+
+    def _next_body(self, lane: deque) -> tuple:
+        """Take the next request body, merging queued text messages while there is a backlog"""
+        first = self._pop(lane)
+        if not lane:
+            return first.body, [first]
+        # submit() only queues payloads _parse_payload() accepts
+        payload = _parse_payload(first.body)
+        if payload is None or payload["msg_type"] != "text":
+            return first.body, [first]
+
+        texts = [payload["content"]["text"]]
+        # Look ahead only as far as one batch could reach
+        peeked = text_size(texts[0])
+        for candidate in lane:
+            if peeked > MAX_BATCH_BYTES:
+                break
+            next_payload = _parse_payload(candidate.body)
+            if next_payload is None or next_payload["msg_type"] != "text":
+                break
+            texts.append(next_payload["content"]["text"])
+            peeked += text_size(texts[-1])
+        # The first batch alert_packer fills, measured as json.dumps writes it
+        capacity = MAX_BATCH_BYTES - json_size(_merged_text([""]))
+        count = len(pack_sizes([text_size(text) for text in texts], capacity, text_size(BATCH_SEPARATOR))[0])
+        taken = [first] + [self._pop(lane) for _ in range(count - 1)]
+        if count == 1:
+            return first.body, taken
+        return json.dumps(_merged_text(texts[:count])).encode('utf-8'), taken
+
+    def _pop(self, lane: deque) -> _Message:
+        message = lane.popleft()
+        if message.coalesce_key is not None and self.coalescable.get(message.coalesce_key) is message:
+            del self.coalescable[message.coalesce_key]
+        return message
+
+    def _run(self):
+        relay = self.relay
+        while True:
+            with relay._condition:
+                while True:
+                    if not relay._running and not self.backlog():
+                        return
+                    urgency, wait = self._choose()
+                    if urgency is not None:
+                        break
+                    if wait is None:
+                        if time.monotonic() - self.active >= TARGET_IDLE_SEC:
+                            # The next submission for this webhook starts a new target
+                            del relay._targets[self.url]
+                            self.transport.close()
+                            return
+                        wait = TARGET_IDLE_SEC
+                    # A new submission wakes us, so a high alert never waits behind this sleep
+                    relay._condition.wait(wait)
+                try:
+                    body, messages = self._next_body(self.lanes[urgency])
+                except Exception as e:
+                    # The message is lost, the webhook's other alerts are not
+                    body, messages = None, []
+                    relay.failed += 1
+                    QUEUE_DEPTH.dec(queue="relay")
+                    error = e
+                else:
+                    self.inflight = len(messages)
+                    self.bucket.take()
+                    self.lane_buckets[urgency].take()
+            if body is None:
+                RELAY_DELIVERIES.inc(result="failed")
+                ALERTS_DROPPED.inc()
+                if not relay.quiet:
+                    print(f"❌ Dropped an alert for {self.url}: {error}")
+                continue
+
+            start = time.perf_counter()
+            try:
+                result = self.transport.post_body(self.url, body)
+            except Exception as e:
+                result = {'success': False, 'error': str(e), 'status_code': None}
+            WEBHOOK_LATENCY.observe(time.perf_counter() - start)
+            WEBHOOK_RESPONSES.inc(status=result['status_code'] or "error")
+            self._settle(result, messages)
+            self.active = time.monotonic()
+
+    def _settle(self, result: Dict[str, Any], messages: List[_Message]):
+        relay = self.relay
+        rate_limited = result['status_code'] == 429 or (
+            result['success'] and isinstance(result['data'], dict) and result['data'].get("code") == LARK_RATE_LIMITED_CODE)
+        if result['success'] and not rate_limited:
+            RELAY_DELIVERIES.inc(result="sent")
+            ALERTS_SENT.inc(len(messages))
+            now = time.monotonic()
+            acked = time.time()
+            for message in messages:
+                RELAY_DELIVERY_LATENCY.observe(now - message.submitted, urgency=message.urgency)
+                # The producer's trace stopped at serialized, right before submitting
+                tracing.STAGE_LATENCY.observe(now - message.submitted, stage="acked")
+                if message.quote_received is not None:
+                    tracing.END_TO_END_LATENCY.observe(acked - message.quote_received)
+            with relay._condition:
+                self.inflight = 0
+                relay.sent += len(messages)
+                relay.batches += 1
+                QUEUE_DEPTH.dec(len(messages), queue="relay")
+            return
+
+        retry = [m for m in messages if m.attempts + 1 < MAX_ATTEMPTS]
+        for message in messages:
+            message.attempts += 1
+        with relay._condition:
+            if rate_limited:
+                # Lark's own limit was hit, empty the bucket so the next send waits
+                self.bucket.tokens = 0
+            self.inflight = 0
+            failed = len(messages) - len(retry)
+            relay.failed += failed
+            QUEUE_DEPTH.dec(failed, queue="relay")
+            # Back to the front of their lane in their original order
+            for message in reversed(retry):
+                self.lanes[message.urgency].appendleft(message)
+            if retry:
+                self.paused_until = time.monotonic() + min(5.0, 0.1 * 2 ** (messages[0].attempts - 1))
+        if retry:
+            RELAY_DELIVERIES.inc(result="retried")
+        if failed:
+            RELAY_DELIVERIES.inc(result="failed")
+            ALERTS_DROPPED.inc(failed)
+            if not relay.quiet:
+                error = result['error'] if 'error' in result else result['data']
+                print(f"❌ Dropped {failed} alert(s) for {self.url}: {error}")
+
+
+class AlertRelay:
+    """Accepts alerts over a Unix socket and localhost HTTP and delivers them to Lark"""
+
+    def __init__(self, socket_path: Optional[str] = RELAY_SOCKET, http_port: int = RELAY_HTTP_PORT,
+                 rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                 max_pending: int = DEFAULT_MAX_PENDING, dedup_window: float = DEFAULT_DEDUP_WINDOW,
+                 quiet: bool = False, memory_budget: Optional[MemoryBudget] = None, webhooks: Iterable[str] = ()):
+        """
+        Initialize the relay
+
+        Args:
+            socket_path: Unix socket to listen on, None disables
+            http_port: Localhost HTTP port, 0 disables
+            rate: Messages per second per webhook
+            burst: Messages a webhook may send back to back
+            max_pending: Queued messages per webhook before new ones are shed
+            dedup_window: Seconds a dedup key suppresses repeats
+            quiet: Don't print delivery failures
+            memory_budget: Registers the dedup keys and the low and medium lanes,
+                and sheds new low alerts while it is under pressure
+            webhooks: The only webhooks HTTP submissions may deliver to (any page in a
+                browser can POST to localhost); the Unix socket is limited to this user
+        """
+        self.socket_path = socket_path
+        self.http_port = http_port
+        self.rate = rate
+        self.burst = burst
+        self.max_pending = max_pending
+        self.dedup_window = dedup_window
+        self.quiet = quiet
+        self.webhooks = frozenset(webhooks)
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.evicted = 0
+        self.counts = {name: 0 for name in STATUS_NAMES.values()}
+        self._condition = threading.Condition()
+        self._targets: Dict[str, _Target] = {}
+        # dedup key -> expiry, in insertion (so expiry) order
+        self._recent: "OrderedDict[bytes, float]" = OrderedDict()
+        self._running = False
+        self._servers = []
+        self.memory_budget = memory_budget
+        if memory_budget is not None:
+            memory_budget.register("relay_dedup_keys", _DedupKeys(self), priority=0)
+            memory_budget.register("relay_queued_messages", _QueuedMessages(self), priority=2)
+
+    def submit(self, webhook_url: str, body: bytes, dedup_key: bytes = b"", urgency: str = "medium",
+               quote_received: Optional[float] = None) -> int:
+        """
+        Queue an encoded Lark payload for webhook_url
+
+        Args:
+            webhook_url: Destination webhook
+            body: JSON payload as sent to Lark
+            dedup_key: Repeats of a key within the dedup window are dropped; empty hashes the payload
+            urgency: Lane to queue in, "high", "medium" or "low"
+            quote_received: Unix time the alert's quote arrived, for its end-to-end latency
+
+        Returns:
+            One of the STATUS_* codes, STATUS_BAD_REQUEST for a payload that is not a
+            JSON object with a msg_type (text needs content.text, interactive a card)
+        """
+        if urgency not in LANE_SHARES:
+            urgency = "medium"
+        payload = _parse_payload(body)
+        if payload is None:
+            with self._condition:
+                self.counts[STATUS_NAMES[STATUS_BAD_REQUEST]] += 1
+            RELAY_SUBMISSIONS.inc(status=STATUS_NAMES[STATUS_BAD_REQUEST])
+            return STATUS_BAD_REQUEST
+        key = dedup_key or hashlib.blake2b(webhook_url.encode('utf-8') + body, digest_size=16).digest()
+        coalesce_key = _coalesce_key(payload) if urgency == "low" else None
+        now = time.monotonic()
+        with self._condition:
+            recent = self._recent
+            while recent:
+                oldest, expiry = next(iter(recent.items()))
+                if expiry > now:
+                    break
+                del recent[oldest]
+            target = self._targets.get(webhook_url)
+            if target is None:
+                target = self._targets[webhook_url] = _Target(self, webhook_url)
+                if self._running:
+                    target.thread.start()
+            lane = target.lanes[urgency]
+
+            if key in recent:
+                status = STATUS_DUPLICATE
+            elif coalesce_key is not None and coalesce_key in target.coalescable:
+                # Newer content, same place in the queue
+                target.coalescable[coalesce_key].body = body
+                recent[key] = now + self.dedup_window
+                status = STATUS_COALESCED
+            elif len(lane) >= self.max_pending or (urgency == "low" and (
+                    len(lane) >= LOW_MAX_PENDING or target.backlog(("high", "medium")) >= SHED_LOW_BACKLOG
+                    or (self.memory_budget is not None and self.memory_budget.under_pressure))):
+                status = STATUS_SHED
+            else:
+                recent[key] = now + self.dedup_window
+                message = _Message(body, urgency, coalesce_key, quote_received)
+                lane.append(message)
+                if coalesce_key is not None:
+                    target.coalescable[coalesce_key] = message
+                QUEUE_DEPTH.inc(queue="relay")
+                self._condition.notify_all()
+                status = STATUS_ACCEPTED
+            self.counts[STATUS_NAMES[status]] += 1
+        RELAY_SUBMISSIONS.inc(status=STATUS_NAMES[status])
+        return status
+
+    def pending(self) -> int:
+        """Messages queued or being sent"""
+        with self._condition:
+            return sum(target.backlog() + target.inflight for target in self._targets.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Submission and delivery counts, queued messages per lane and delivery latency per urgency"""
+        with self._condition:
+            stats = dict(self.counts, sent=self.sent, failed=self.failed, batches=self.batches, evicted=self.evicted,
+                         pending=sum(target.backlog() + target.inflight for target in self._targets.values()),
+                         webhooks=len(self._targets))
+            for urgency in URGENCIES:
+                stats[f"pending_{urgency}"] = sum(target.backlog((urgency,)) for target in self._targets.values())
+        for urgency in URGENCIES:
+            if RELAY_DELIVERY_LATENCY.snapshot(urgency=urgency)["count"]:
+                stats[f"latency_{urgency}_p50_s"] = RELAY_DELIVERY_LATENCY.quantile(0.5, urgency=urgency)
+                stats[f"latency_{urgency}_p99_s"] = RELAY_DELIVERY_LATENCY.quantile(0.99, urgency=urgency)
+        return stats
+
+    def start(self) -> "AlertRelay":
+        """Start the delivery threads and listeners"""
+        self._running = True
+        for target in self._targets.values():
+            target.thread.start()
+        if self.socket_path:
+            self._servers.append(_make_unix_server(self))
+        if self.http_port:
+            self._servers.append(_make_http_server(self))
+        for server in self._servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self, drain_timeout: float = 5.0):
+        """Stop listening, deliver what is queued for up to drain_timeout seconds, then stop"""
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        deadline = time.monotonic() + drain_timeout
+        while self.pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._condition:
+            self._running = False
+            for target in self._targets.values():
+                for lane in target.lanes.values():
+                    lane.clear()
+            self._condition.notify_all()
+            targets = list(self._targets.values())
+        for target in targets:
+            if target.thread.is_alive():
+                target.thread.join(timeout=1)
+            target.transport.close()
+
+    def serve_forever(self):
+        import signal
+
+        def stop(signum, frame):
+            raise SystemExit(0)
+
+        signal.signal(signal.SIGTERM, stop)
+        self.start()
+        listening = [f"unix:{self.socket_path}"] if self.socket_path else []
+        if self.http_port:
+            listening.append(f"http://127.0.0.1:{self.http_port}/alerts")
+        print(f"✅ Alert relay listening on {', '.join(listening)}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            print(f"Relay stopped: {self.stats()}")
+
+    def __enter__(self) -> "AlertRelay":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class _DedupKeys:
+    """MemoryBudget view of the dedup keys, an evicted key no longer suppresses its repeats"""
+
+    def __init__(self, relay: AlertRelay):
+        self.relay = relay
+
+    def __len__(self) -> int:
+        return len(self.relay._recent)
+
+    def evict(self, count: int) -> int:
+        with self.relay._condition:
+            recent = self.relay._recent
+            count = min(count, len(recent))
+            for _ in range(count):
+                recent.popitem(last=False)
+            return count
+
+    def sample(self, count: int) -> list:
+        with self.relay._condition:
+            return list(itertools.islice(self.relay._recent.items(), count))
+
+
+class _QueuedMessages:
+    """MemoryBudget view of the low and medium lanes, high alerts are never evicted"""
+
+    LANES = ("low", "medium")
+
+    def __init__(self, relay: AlertRelay):
+        self.relay = relay
+
+    def __len__(self) -> int:
+        with self.relay._condition:
+            return sum(target.backlog(self.LANES) for target in self.relay._targets.values())
+
+    def evict(self, count: int) -> int:
+        """Drop the oldest queued low alerts, then medium ones"""
+        relay = self.relay
+        evicted = 0
+        with relay._condition:
+            for urgency in self.LANES:
+                for target in relay._targets.values():
+                    lane = target.lanes[urgency]
+                    while lane and evicted < count:
+                        target._pop(lane)
+                        evicted += 1
+            relay.evicted += evicted
+            QUEUE_DEPTH.dec(evicted, queue="relay")
+        if evicted:
+            RELAY_DELIVERIES.inc(evicted, result="evicted")
+        return evicted
+
+    def sample(self, count: int) -> list:
+        with self.relay._condition:
+            messages = itertools.chain.from_iterable(target.lanes[urgency] for urgency in self.LANES
+                                                     for target in self.relay._targets.values())
+            return list(itertools.islice(messages, count))
+
+
+def _read_exact(rfile, n: int) -> bytes:
+    data = rfile.read(n)
+    return data if len(data) == n else b""
+
+
+def _make_unix_server(relay: AlertRelay) -> socketserver.BaseServer:
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            targets = {}
+            while True:
+                header = _read_exact(self.rfile, 4)
+                if not header:
+                    return
+                (length,) = _FRAME_HEADER.unpack(header)
+                if length < 3 or length > MAX_FRAME:
+                    return
+                body = _read_exact(self.rfile, length)
+                if not body:
+                    return
+                kind = body[:1]
+                if kind == b"T":
+                    _, target_id = _TARGET_HEADER.unpack_from(body)
+                    targets[target_id] = body[_TARGET_HEADER.size:].decode('utf-8')
+                elif (kind == b"S" and length >= _SUBMIT_HEADER.size) or (
+                        kind == b"R" and length >= _TRACED_HEADER.size):
+                    quote_received = None
+                    if kind == b"S":
+                        _, target_id, urgency, key_length = _SUBMIT_HEADER.unpack_from(body)
+                        start = _SUBMIT_HEADER.size
+                    else:
+                        _, target_id, urgency, key_length, quote_received = _TRACED_HEADER.unpack_from(body)
+                        start = _TRACED_HEADER.size
+                    url = targets.get(target_id)
+                    if url is None or urgency >= len(URGENCIES):
+                        status = STATUS_BAD_REQUEST
+                    else:
+                        status = relay.submit(url, body[start + key_length:], body[start:start + key_length],
+                                              URGENCIES[urgency], quote_received)
+                    self.wfile.write(bytes((status,)))
+                else:
+                    return
+
+    class Server(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+    path = relay.socket_path
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            raise RuntimeError(f"A relay is already listening on {path}")
+        except (FileNotFoundError, ConnectionRefusedError):
+            os.unlink(path)
+        finally:
+            probe.close()
+    old_umask = os.umask(0o077)
+    try:
+        return Server(path, Handler)
+    finally:
+        os.umask(old_umask)
+
+
+def _make_http_server(relay: AlertRelay) -> ThreadingHTTPServer:
+    debug = debug_endpoints(relay.memory_budget)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            path, _, query = self.path.partition("?")
+            endpoint = debug.get(f"POST {path}")
+            if path != "/alerts" and endpoint is None:
+                self._send_json(404, {"error": "not found"})
+                return
+            # A browser sends other content types only after a preflight, which is never answered
+            if self.headers.get_content_type() != "application/json":
+                self._send_json(415, {"status": "bad_request", "error": "Content-Type must be application/json"})
+                return
+            if endpoint is not None:
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._endpoint(endpoint, query)
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                if not isinstance(request, dict):
+                    raise TypeError("request must be a JSON object")
+                url = request["webhook_url"]
+                body = json.dumps(request["payload"]).encode('utf-8')
+                key = request.get("dedup_key", "")
+                if not isinstance(key, str):
+                    raise TypeError("dedup_key must be a string")
+                key = key.encode('utf-8')[:255]
+                urgency = request.get("urgency", "medium")
+                quote_received = request.get("quote_received")
+                if quote_received is not None:
+                    quote_received = float(quote_received)
+            except (ValueError, KeyError, TypeError) as e:
+                self._send_json(400, {"status": "bad_request", "error": str(e)})
+                return
+            if not isinstance(url, str) or url not in relay.webhooks:
+                self._send_json(403, {"status": "forbidden", "error": "webhook_url is not one of the relay's --webhook"})
+                return
+            status = relay.submit(url, body, key, urgency, quote_received)
+            code = {STATUS_ACCEPTED: 202, STATUS_COALESCED: 202, STATUS_DUPLICATE: 200, STATUS_SHED: 503,
+                    STATUS_BAD_REQUEST: 400}[status]
+            self._send_json(code, {"status": STATUS_NAMES[status]})
+
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            endpoint = debug.get(path)
+            if path == "/stats":
+                self._send_json(200, relay.stats())
+            elif endpoint is not None:
+                self._endpoint(endpoint, query)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def _endpoint(self, endpoint, query: str):
+            try:
+                self._send_json(200, endpoint(dict(urllib.parse.parse_qsl(query))))
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+
+        def _send_json(self, status: int, data: Dict[str, Any]):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    return Server(("127.0.0.1", relay.http_port), Handler)
+
+
+class RelayClient(LarkGroupChatClient):
+    """LarkGroupChatClient that hands messages to the local relay instead of calling Lark"""
+
+    def __init__(self, webhook_url: str, socket_path: str = RELAY_SOCKET, fallback: bool = True):
+        """
+        Initialize the client
+
+        Args:
+            webhook_url: Lark webhook the relay should deliver to
+            socket_path: The relay's Unix socket
+            fallback: Send directly to Lark when the relay is not running
+        """
+        super().__init__(webhook_url)
+        self.socket_path = socket_path
+        self.fallback = fallback
+        self._local = threading.local()
+        self._routes: Dict[str, "RelayClient"] = {}
+
+    def for_webhook(self, webhook_url: str) -> "RelayClient":
+        """Client for another webhook through the same relay"""
+        if webhook_url not in self._routes:
+            self._routes[webhook_url] = RelayClient(webhook_url, self.socket_path, self.fallback)
+        return self._routes[webhook_url]
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(5)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            url = self.webhook_url.encode('utf-8')
+            sock.sendall(_FRAME_HEADER.pack(_TARGET_HEADER.size + len(url)) + _TARGET_HEADER.pack(b"T", 0) + url)
+            self._local.sock = sock
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def submit(self, payload: Dict[str, Any], dedup_key: Optional[str] = None,
+               urgency: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a payload at the relay
+
+        Args:
+            payload: Lark message payload
+            dedup_key: Drop repeats of this key within the relay's dedup window
+            urgency: Priority lane, default the urgency of the send_* call in progress
+
+        Returns:
+            Result dict; success with 'queued' set means the relay accepted (or
+            already had) the alert and will deliver it, it is not at Lark yet
+        """
+        urgency = urgency or getattr(self._local, "urgency", None) or "medium"
+        body = json.dumps(payload).encode('utf-8')
+        tracing.mark("serialized")
+        key = (dedup_key or "").encode('utf-8')
+        if len(key) > 255:
+            key = hashlib.blake2b(key, digest_size=16).digest()
+        trace = tracing.current_trace()
+        quote_received = trace.marks.get("quote_received") if trace is not None else None
+        if quote_received is None:
+            frame = (_FRAME_HEADER.pack(_SUBMIT_HEADER.size + len(key) + len(body))
+                     + _SUBMIT_HEADER.pack(b"S", 0, URGENCIES.index(urgency), len(key)) + key + body)
+        else:
+            frame = (_FRAME_HEADER.pack(_TRACED_HEADER.size + len(key) + len(body))
+                     + _TRACED_HEADER.pack(b"R", 0, URGENCIES.index(urgency), len(key), quote_received) + key + body)
+
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(frame)
+                reply = sock.recv(1)
+                if not reply:
+                    raise ConnectionResetError("relay closed the connection")
+                break
+            except OSError as e:
+                self._disconnect()
+                if attempt == 0 and not isinstance(e, (FileNotFoundError, ConnectionRefusedError)):
+                    # The relay restarted since this connection was opened
+                    continue
+                if self.fallback:
+                    return super()._make_request(payload)
+                return {'success': False, 'error': f'Relay unavailable: {str(e)}', 'status_code': None}
+
+        status = reply[0]
+        if status in (STATUS_ACCEPTED, STATUS_DUPLICATE, STATUS_COALESCED):
+            return {'success': True, 'status_code': 202, 'queued': True, 'data': {'relay': STATUS_NAMES[status]}}
+        return {'success': False, 'error': f'Relay rejected the alert: {STATUS_NAMES.get(status, status)}',
+                'status_code': None}
+
+    def _with_urgency(self, urgency: str, send, *args, **kwargs) -> Dict[str, Any]:
+        """Run a send_* method with its messages queued in the urgency lane"""
+        self._local.urgency = urgency
+        try:
+            return send(*args, **kwargs)
+        finally:
+            self._local.urgency = None
+
+    def send_urgent_alert(self, title: str, message: str, mention_all: bool = True) -> Dict[str, Any]:
+        return self._with_urgency("high", super().send_urgent_alert, title, message, mention_all)
+
+    def send_rich_alert_card(self, title: str, details: Dict[str, str], urgency: str = "high",
+                             mention_all: bool = False, alert_id: Optional[str] = None) -> Dict[str, Any]:
+        return self._with_urgency(urgency if urgency in LANE_SHARES else "medium", super().send_rich_alert_card,
+                                  title, details, urgency, mention_all=mention_all, alert_id=alert_id)
+
+    def send_message_with_mentions(self, text: str, user_ids: List[str] = None,
+                                   mention_all: bool = False) -> Dict[str, Any]:
+        return self._with_urgency("high" if mention_all else "medium", super().send_message_with_mentions,
+                                  text, user_ids, mention_all)
+
+    def send_group_summary(self, alerts: List[Dict[str, str]]) -> Dict[str, Any]:
+        return self._with_urgency("low", super().send_group_summary, alerts)
+
+    def _make_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self.submit(payload)
+
+    def close(self):
+        self._disconnect()
+
+
+def run_benchmark(count: int, producers: int = 1) -> Dict[str, Any]:
+    """
+    Submit count alerts through a relay into the mock Lark server
+
+    Returns:
+        Submit latency percentiles, submissions per second and delivery counts
+    """
+    import tempfile
+    from mock_lark_server import MockLarkServer
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "relay.sock")
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    with MockLarkServer() as lark, AlertRelay(socket_path, http_port=0, rate=1000, burst=100,
+                                              max_pending=count + 1, quiet=True) as relay:
+        def produce(n: int, offset: int):
+            client = RelayClient(lark.url, socket_path, fallback=False)
+            local = []
+            for i in range(n):
+                start = time.perf_counter()
+                client.send_text_message(f"benchmark alert {offset + i}")
+                local.append(time.perf_counter() - start)
+            client.close()
+            with lock:
+                latencies.extend(local)
+
+        per_producer = count // producers
+        threads = [threading.Thread(target=produce, args=(per_producer, p * per_producer)) for p in range(producers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        deadline = time.monotonic() + 30
+        while relay.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = relay.stats()
+        requests_received = len(lark.received)
+
+    latencies.sort()
+    return {
+        "submitted": len(latencies),
+        "submit_per_sec": len(latencies) / elapsed,
+        "submit_p50_ms": latencies[len(latencies) // 2] * 1000,
+        "submit_p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "delivered": stats["sent"],
+        "lark_requests": requests_received,
+        "relay": stats
+    }
+
+
+def run_priority_benchmark(seconds: float = 10.0, rate: float = 5.0, lark_latency: float = 0.05) -> Dict[str, Any]:
+    """
+    Flood the relay with medium text and low status cards while sending one high alert per second
+
+    Returns:
+        Relay stats, including delivery latency percentiles per urgency
+    """
+    import tempfile
+    from mock_lark_server import MockLarkServer
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "relay.sock")
+    stop = threading.Event()
+
+    with MockLarkServer(latency=lark_latency) as lark, AlertRelay(socket_path, http_port=0, rate=rate,
+                                                                  quiet=True) as relay:
+        def produce(interval: float, send):
+            client = RelayClient(lark.url, socket_path, fallback=False)
+            i = 0
+            while not stop.is_set():
+                send(client, i)
+                i += 1
+                time.sleep(interval)
+            client.close()
+
+        producers = [
+            (1.0, lambda c, i: c.send_urgent_alert("LİKİDASYON", f"Critical alert {i}")),
+            (0.05, lambda c, i: c.send_text_message(f"Spread update {i}")),
+            (0.01, lambda c, i: c.send_rich_alert_card(f"Risk Sistemi Durumu {i % 5}", {"Güncelleme": str(i)}, "low"))
+        ]
+        threads = [threading.Thread(target=produce, args=args) for args in producers]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        stats = relay.stats()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local relay that delivers alerts to Lark")
+    parser.add_argument("--socket", default=RELAY_SOCKET, help="Unix socket path")
+    parser.add_argument("--http-port", type=int, default=RELAY_HTTP_PORT, help="Localhost HTTP port, 0 disables")
+    parser.add_argument("--webhook", action="append", default=[],
+                        help="Webhook HTTP submissions may deliver to, repeatable (the Unix socket takes any)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Messages per second per webhook")
+    parser.add_argument("--burst", type=float, default=DEFAULT_BURST, help="Back-to-back messages per webhook")
+    parser.add_argument("--dedup-window", type=float, default=DEFAULT_DEDUP_WINDOW, help="Seconds")
+    parser.add_argument("--memory-budget-mb", type=float, default=MEMORY_BUDGET_MB,
+                        help="Dedup keys and queued low/medium alerts, 0 disables")
+    parser.add_argument("--rss-limit-mb", type=float, help="Shed low alerts while the relay's RSS is above this")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Submit N alerts into a mock Lark server")
+    parser.add_argument("--producers", type=int, default=1, help="Producer threads for --benchmark")
+    parser.add_argument("--priority-benchmark", type=float, metavar="SECONDS",
+                        help="Measure per-urgency delivery latency under a flood of low-priority traffic")
+    args = parser.parse_args()
+
+    if args.priority_benchmark:
+        stats = run_priority_benchmark(args.priority_benchmark, args.rate)
+        print(f"Accepted {stats['accepted']}, coalesced {stats['coalesced']}, shed {stats['shed']}, "
+              f"sent {stats['sent']} in {stats['batches']} Lark requests")
+        for urgency in URGENCIES:
+            if f"latency_{urgency}_p50_s" in stats:
+                print(f"{urgency:<8} p50 {stats[f'latency_{urgency}_p50_s'] * 1000:8.0f}ms  "
+                      f"p99 {stats[f'latency_{urgency}_p99_s'] * 1000:8.0f}ms  "
+                      f"still queued {stats[f'pending_{urgency}']}")
+        return
+
+    if args.benchmark:
+        result = run_benchmark(args.benchmark, args.producers)
+        print(f"Submitted {result['submitted']} alerts at {result['submit_per_sec']:,.0f}/s, "
+              f"p50 {result['submit_p50_ms']:.3f}ms, p99 {result['submit_p99_ms']:.3f}ms")
+        print(f"Delivered {result['delivered']} in {result['lark_requests']} Lark requests")
+        return
+
+    try:
+        budget = None
+        if args.memory_budget_mb:
+            rss_limit = int(args.rss_limit_mb * 2**20) if args.rss_limit_mb else None
+            # The relay's structures lock themselves, so checks can run on their own thread
+            budget = MemoryBudget(int(args.memory_budget_mb * 2**20), rss_limit_bytes=rss_limit).start()
+        relay = AlertRelay(args.socket, args.http_port, args.rate, args.burst, dedup_window=args.dedup_window,
+                           memory_budget=budget, webhooks=args.webhook)
+        relay.serve_forever()
+    except (RuntimeError, OSError) as e:
+        print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
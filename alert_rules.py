@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Declarative Alert Rules
+Loads alert conditions from a JSON (or YAML) rules file and compiles them
+into evaluators indexed by pair and by the quote fields they read, so an
+update only evaluates the rules it can affect. The file is re-read when it
+changes on disk.
+
+Rules file layout:
+
+    {
+      "asset_classes": {"majors": ["BTCUSDT", "ETHUSDT"]},
+      "routes": {"desk": "https://open.larksuite.com/open-apis/bot/v2/hook/..."},
+      "rules": [
+        {
+          "name": "major_price_diff",
+          "asset_class": "majors",              # or "pairs": ["XRPUSDT", "*DOGE*"], default all
+          "when": {"price_diff_pct": {">": 0.5}},
+          "message": "Price difference between exchanges is {price_diff_pct:.2f}%",
+          "severity": "high",                   # high, medium, low -> card urgency
+          "mention": "all",                     # all or none
+          "route": "desk"                       # key of "routes", default is the monitor's client
+        }
+      ]
+    }
+"""
+
+import fnmatch
+import itertools
+import json
+import operator
+import os
+import string
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable, Iterable, NamedTuple
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne
+}
+
+SEVERITY_ORDER = {"low": 0, "medium": 1, "high": 2}
+MENTIONS = ("all", "none")
+DEFAULT_ROUTE = "default"
+
+# Values a rule can read for a pair (see quote_fields in exchange_spread_monitor.py)
+FIELDS = frozenset({
+    "binance_bid", "binance_ask", "binance_spread",
+    "gateio_bid", "gateio_ask", "gateio_spread",
+    "price_diff_pct", "volume_usdt", "price_change_24h"
+})
+
+
+class RuleError(ValueError):
+    """Raised for an invalid rules file"""
+
+
+class Rule:
+    """One compiled alert rule"""
+
+    __slots__ = ("name", "fields", "check", "message", "severity", "mention", "route", "pairs", "asset_class")
+
+    def __init__(self, spec: Dict[str, Any]):
+        if not isinstance(spec, dict):
+            raise RuleError(f"Rule must be a mapping, got {type(spec).__name__}")
+        self.name = str(spec.get("name", "unnamed"))
+        when = spec.get("when")
+        if not when:
+            raise RuleError(f"Rule {self.name} has no 'when' conditions")
+        if not isinstance(when, dict):
+            raise RuleError(f"Rule {self.name}: 'when' must map fields to tests")
+
+        conditions = []
+        for field, tests in when.items():
+            if field not in FIELDS:
+                raise RuleError(f"Rule {self.name}: unknown field {field!r}")
+            if not isinstance(tests, dict) or not tests:
+                raise RuleError(f"Rule {self.name}: {field} must map operators to values")
+            for op, value in tests.items():
+                if op not in OPERATORS:
+                    raise RuleError(f"Rule {self.name}: unknown operator {op!r}")
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise RuleError(f"Rule {self.name}: {field} {op} needs a number, got {value!r}")
+                conditions.append((field, OPERATORS[op], float(value)))
+
+        self.fields = frozenset(field for field, _, _ in conditions)
+        self.check = _compile(conditions)
+        self.message = spec.get("message", self.name)
+        if not isinstance(self.message, str):
+            raise RuleError(f"Rule {self.name}: message must be a string")
+        _check_message(self.name, self.message)
+        self.severity = spec.get("severity", "high")
+        if self.severity not in SEVERITY_ORDER:
+            raise RuleError(f"Rule {self.name}: unknown severity {self.severity!r}")
+        self.mention = spec.get("mention", "none")
+        if self.mention not in MENTIONS:
+            raise RuleError(f"Rule {self.name}: mention must be one of {', '.join(MENTIONS)}")
+        self.route = spec.get("route", DEFAULT_ROUTE)
+        self.pairs = spec.get("pairs")
+        if self.pairs is not None and (not isinstance(self.pairs, list)
+                                       or not all(isinstance(pattern, str) for pattern in self.pairs)):
+            raise RuleError(f"Rule {self.name}: pairs must be a list of symbols or patterns")
+        self.asset_class = spec.get("asset_class")
+
+
+def _check_message(name: str, message: str):
+    """A message may only format fields every quote has"""
+    try:
+        placeholders = [field for _, field, _, _ in string.Formatter().parse(message) if field is not None]
+    except ValueError as e:
+        raise RuleError(f"Rule {name}: bad message {message!r}: {e}")
+    for field in placeholders:
+        if field not in FIELDS:
+            raise RuleError(f"Rule {name}: message uses unknown field {{{field}}}")
+
+
+class RuleMatch(NamedTuple):
+    """A rule that fired, with its rendered message"""
+    rule: Rule
+    message: str
+
+
+def _compile(conditions) -> Callable[[Dict[str, float]], bool]:
+    """Turn (field, op, value) conditions into one predicate over a values dict"""
+    if len(conditions) == 1:
+        field, op, threshold = conditions[0]
+        return lambda values: op(values[field], threshold)
+    if len(conditions) == 2:
+        (f1, op1, t1), (f2, op2, t2) = conditions
+        return lambda values: op1(values[f1], t1) and op2(values[f2], t2)
+    conditions = tuple(conditions)
+    return lambda values: all(op(values[f], t) for f, op, t in conditions)
+
+
+class RuleSet:
+    """Compiled rules with per-pair and per-field indexes"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        """
+        Compile a parsed rules file
+
+        Args:
+            spec: Dictionary with "rules" and optional "asset_classes" and "routes"
+        """
+        if not isinstance(spec, dict):
+            raise RuleError(f"Rules file must be a mapping, got {type(spec).__name__}")
+        asset_classes = spec.get("asset_classes", {})
+        if not isinstance(asset_classes, dict) or not all(
+                isinstance(pairs, list) and all(isinstance(pair, str) for pair in pairs)
+                for pairs in asset_classes.values()):
+            raise RuleError("'asset_classes' must map names to lists of pairs")
+        routes = spec.get("routes", {})
+        if not isinstance(routes, dict) or not all(isinstance(url, str) for url in routes.values()):
+            raise RuleError("'routes' must map names to webhook URLs")
+        rule_specs = spec.get("rules", [])
+        if not isinstance(rule_specs, list):
+            raise RuleError("'rules' must be a list")
+        self.asset_classes = {name: set(pairs) for name, pairs in asset_classes.items()}
+        self.routes: Dict[str, str] = dict(routes)
+        self.rules = [Rule(rule_spec) for rule_spec in rule_specs]
+        for rule in self.rules:
+            if rule.asset_class and rule.asset_class not in self.asset_classes:
+                raise RuleError(f"Rule {rule.name}: unknown asset class {rule.asset_class!r}")
+            if rule.route != DEFAULT_ROUTE and rule.route not in self.routes:
+                raise RuleError(f"Rule {rule.name}: unknown route {rule.route!r}")
+        self.fields = frozenset().union(*(rule.fields for rule in self.rules)) if self.rules else frozenset()
+        # pair -> (all rules for the pair, {field: rules reading it})
+        self._pair_index: Dict[str, tuple] = {}
+
+    def _applies(self, rule: Rule, pair: str) -> bool:
+        if rule.asset_class and pair not in self.asset_classes[rule.asset_class]:
+            return False
+        if rule.pairs:
+            return any(fnmatch.fnmatchcase(pair, pattern) for pattern in rule.pairs)
+        return True
+
+    def _index_for(self, pair: str) -> tuple:
+        index = self._pair_index.get(pair)
+        if index is None:
+            rules = [rule for rule in self.rules if self._applies(rule, pair)]
+            by_field: Dict[str, List[Rule]] = {}
+            for rule in rules:
+                for field in rule.fields:
+                    by_field.setdefault(field, []).append(rule)
+            index = self._pair_index[pair] = (rules, by_field)
+        return index
+
+    # MemoryBudget protocol: evicted pair indexes are rebuilt on the pair's next evaluation
+
+    def __len__(self) -> int:
+        return len(self._pair_index)
+
+    def evict(self, count: int) -> int:
+        """Drop the count oldest pair indexes"""
+        evicted = list(itertools.islice(self._pair_index, count))
+        for pair in evicted:
+            self._pair_index.pop(pair, None)
+        return len(evicted)
+
+    def sample(self, count: int) -> list:
+        # The rules are shared by every pair, only the index containers are per pair
+        return [(pair, [None] * len(rules), {field: [None] * len(field_rules) for field, field_rules in by_field.items()})
+                for pair, (rules, by_field) in itertools.islice(self._pair_index.items(), count)]
+
+    def rules_for(self, pair: str, changed: Optional[Iterable[str]] = None) -> List[Rule]:
+        """
+        Rules to evaluate for pair
+
+        Args:
+            pair: Pair symbol
+            changed: Fields that changed since the last evaluation, None means all
+        """
+        rules, by_field = self._index_for(pair)
+        if changed is None:
+            return rules
+        selected = {}
+        for field in changed:
+            for rule in by_field.get(field, ()):
+                selected[id(rule)] = rule
+        # Keep file order so messages come out in a stable order
+        return [rule for rule in rules if id(rule) in selected]
+
+    def evaluate(self, pair: str, values: Dict[str, float],
+                 changed: Optional[Iterable[str]] = None) -> List[RuleMatch]:
+        """
+        Rules that fire for pair given the current field values
+
+        Args:
+            pair: Pair symbol
+            values: Field name to current value
+            changed: Fields that changed since the last evaluation, None means all
+
+        Returns:
+            Matches in rules-file order
+        """
+        matches = []
+        for rule in self.rules_for(pair, changed):
+            try:
+                if rule.check(values):
+                    matches.append(RuleMatch(rule, rule.message.format(**values)))
+            except KeyError:
+                # A field this rule needs is missing from the quote
+                continue
+        return matches
+
+
+def load_rules(path: str) -> RuleSet:
+    """Parse and compile a JSON or YAML rules file"""
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise RuleError("PyYAML is required for YAML rules files (pip install pyyaml)")
+            try:
+                spec = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise RuleError(f"Invalid YAML in {path}: {e}")
+        else:
+            spec = json.load(f)
+    # An empty file is no rules, an empty list is still not a mapping
+    return RuleSet({} if spec is None else spec)
+
+
+class RuleEngine:
+    """A rules file that is recompiled when it changes on disk"""
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        """
+        Load the rules file
+
+        Args:
+            path: JSON or YAML rules file
+            check_interval: Minimum seconds between modification time checks
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime
+        self._last_check = time.monotonic()
+        self.ruleset = load_rules(path)
+
+    def maybe_reload(self) -> bool:
+        """
+        Recompile the rules if the file changed
+
+        Returns:
+            True if new rules were loaded; a broken file keeps the old rules
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        with self._lock:
+            self._last_check = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError as e:
+                print(f"❌ Cannot stat rules file {self.path}: {e}")
+                return False
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            try:
+                self.ruleset = load_rules(self.path)
+            except Exception as e:
+                # Whatever is wrong with the file, the monitor keeps running on the rules it had
+                print(f"❌ Keeping previous rules, failed to load {self.path}: {e}")
+                return False
+        print(f"🔄 Reloaded {len(self.ruleset.rules)} rules from {self.path}")
+        return True
+
+    def evaluate(self, pair: str, values: Dict[str, float],
+                 changed: Optional[Iterable[str]] = None) -> List[RuleMatch]:
+        """Evaluate against the current rules, see RuleSet.evaluate"""
+        return self.ruleset.evaluate(pair, values, changed)
+
+    @property
+    def routes(self) -> Dict[str, str]:
+        return self.ruleset.routes
+
+    # MemoryBudget protocol, for the current rules
+
+    def __len__(self) -> int:
+        return len(self.ruleset)
+
+    def evict(self, count: int) -> int:
+        return self.ruleset.evict(count)
+
+    def sample(self, count: int) -> list:
+        return self.ruleset.sample(count)
+
+
+def threshold_rules(spread_threshold: float, price_diff_threshold_pct: float) -> RuleSet:
+    """The spread monitor's built-in checks expressed as rules"""
+    return RuleSet({
+        "rules": [
+            {
+                "name": "binance_spread",
+                "when": {"binance_spread": {">": spread_threshold}},
+                "message": "Binance spread is high: ${binance_spread:.4f}"
+            },
+            {
+                "name": "gateio_spread",
+                "when": {"gateio_spread": {">": spread_threshold}},
+                "message": "Gate.io spread is high: ${gateio_spread:.4f}"
+            },
+            {
+                "name": "price_diff",
+                "when": {"price_diff_pct": {">": price_diff_threshold_pct}},
+                "message": "Price difference between exchanges is {price_diff_pct:.2f}%"
+            }
+        ]
+    })
+
+
+def highest_severity(matches: List[RuleMatch]) -> str:
+    """Most severe level among matches"""
+    return max((m.rule.severity for m in matches), key=SEVERITY_ORDER.__getitem__, default="low")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Asyncio Lark Group Chat Client
+Same API as LarkGroupChatClient, sent over a pooled aiohttp session so many
+alerts can be in flight from one event loop
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, Any, Optional, List
+
+import aiohttp
+
+import tracing
+from alert_packer import combine_results
+from lark_group_chat import LarkGroupChatClient
+from metrics import WEBHOOK_LATENCY, WEBHOOK_RESPONSES, QUEUE_DEPTH
+
+
+class AsyncLarkGroupChatClient(LarkGroupChatClient):
+    """
+    Asyncio client for sending messages to Lark group chats via webhook API
+
+    Every send_* method of LarkGroupChatClient is available and returns an
+    awaitable, e.g. ``await client.send_urgent_alert(title, message)``.
+    Payloads are built by the synchronous client, only the transport differs.
+    """
+
+    def __init__(self, webhook_url: str, max_connections: int = 100, timeout: float = 30,
+                 session: Optional[aiohttp.ClientSession] = None):
+        """
+        Initialize the async Lark group chat client
+
+        Args:
+            webhook_url: The complete webhook URL from Lark group chat
+            max_connections: Size of the keep-alive connection pool
+            timeout: Total request timeout in seconds
+            session: Existing aiohttp session to reuse (not closed by the client)
+        """
+        super().__init__(webhook_url)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self) -> "AsyncLarkGroupChatClient":
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the pooled session lazily, inside the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        """Close the connection pool if this client created it"""
+        if self._session is not None and self._owns_session and not self._session.closed:
+            await self._session.close()
+
+    def _send_payloads(self, payloads: List[Dict[str, Any]]):
+        """Awaitable sending payloads in order, see LarkGroupChatClient._send_payloads"""
+        if len(payloads) == 1:
+            return self._make_request(payloads[0])
+        return self._send_in_order(payloads)
+
+    async def _send_in_order(self, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+        results = []
+        for payload in payloads:
+            results.append(await self._make_request(payload))
+        return combine_results(results)
+
+    async def _make_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Make the actual HTTP request to Lark API
+
+        Args:
+            payload: The JSON payload to send
+
+        Returns:
+            Response data or error information
+        """
+        session = self._get_session()
+        status_code = None
+        body = json.dumps(payload).encode('utf-8')
+        tracing.mark("serialized")
+        QUEUE_DEPTH.inc(queue="async_lark_inflight")
+        start = time.perf_counter()
+        try:
+            # Per request, a session passed in by the caller has its own default headers
+            async with session.post(self.webhook_url, data=body, headers=self.headers) as response:
+                status_code = response.status
+                tracing.mark("acked")
+                WEBHOOK_LATENCY.observe(time.perf_counter() - start)
+                WEBHOOK_RESPONSES.inc(status=status_code)
+
+                # Check if request was successful
+                response.raise_for_status()
+
+                # Parse response
+                response_data = await response.json(content_type=None)
+
+                return {
+                    'success': True,
+                    'status_code': status_code,
+                    'data': response_data
+                }
+
+        except aiohttp.ClientResponseError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'status_code': e.status
+            }
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if status_code is None:
+                # No HTTP answer at all (timeout, connection refused, ...)
+                WEBHOOK_LATENCY.observe(time.perf_counter() - start)
+                WEBHOOK_RESPONSES.inc(status="error")
+            return {
+                'success': False,
+                'error': str(e) or type(e).__name__,
+                'status_code': status_code
+            }
+        except json.JSONDecodeError as e:
+            return {
+                'success': False,
+                'error': f'Failed to parse JSON response: {str(e)}',
+                'status_code': status_code
+            }
+        finally:
+            QUEUE_DEPTH.dec(queue="async_lark_inflight")
+
+
+async def main():
+    """Demo function sending the group chat examples concurrently"""
+
+    # Replace with your actual webhook URL
+    webhook_url = "https://open.larksuite.com/open-apis/bot/v2/hook/t-g206787iAEON7GKUSM3H7MEYKICF4OTYVUMQFNBX"
+
+    print("=== Async Group Chat Alert Examples ===\n")
+
+    async with AsyncLarkGroupChatClient(webhook_url) as client:
+        alert_details = {
+            "Parite": "BTC/USDT",
+            "Fiyat Değişimi": "+12.5%",
+            "Mevcut Fiyat": "$45,230",
+            "Hacim": "$1.2B",
+            "Risk Seviyesi": "YÜKSEK"
+        }
+        alerts = [
+            {"type": "Price Alert", "message": "BTC +12%", "time": "14:30"},
+            {"type": "Volume Alert", "message": "ETH volume spike", "time": "14:32"},
+            {"type": "Spread Alert", "message": "XRP spread widening", "time": "14:35"}
+        ]
+
+        results = await asyncio.gather(
+            client.send_text_message("📊 Daily trading summary ready for review."),
+            client.send_urgent_alert(
+                "CRITICAL PRICE MOVEMENT",
+                "BTC/USDT has moved +15% in the last 5 minutes. Immediate attention required!"
+            ),
+            client.send_rich_alert_card("Price Surge Detected", alert_details, "high"),
+            client.send_group_summary(alerts)
+        )
+
+    for i, result in enumerate(results, 1):
+        print(f"{i}. Result: {result['success']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
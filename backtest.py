@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Alert Threshold Backtesting
+Replays quotes recorded by tick_recorder.py through the spread monitor's
+alert logic and reports, for each threshold setting, how many alerts would
+have fired, when, and how much they overlapped.
+
+Engines:
+    exact       every evaluation goes through exchange_spread_monitor.send_alert
+                with a RecordingClient in place of LarkGroupChatClient
+    vectorized  the built-in threshold checks evaluated over whole ranges with
+                numpy; same results as exact, far faster
+
+Quotes are evaluated as of each recorded tick (or every --step seconds): the
+latest Binance and Gate.io quote at or before that time.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import exchange_spread_monitor as monitor
+from alert_rules import RuleSet, load_rules, threshold_rules
+from tick_recorder import TickReader, NS_PER_DAY
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+END_OF_TIME_NS = 2**62
+
+
+class RecordingClient:
+    """Stands in for LarkGroupChatClient and keeps the cards that would have been sent"""
+
+    def __init__(self, keep_details: bool = False):
+        """
+        Initialize the sink
+
+        Args:
+            keep_details: Also keep each card's detail fields
+        """
+        self.keep_details = keep_details
+        self.sent: List[Dict[str, Any]] = []
+        # Set by the replay loop before each evaluation
+        self.ts = 0
+        self.index = 0
+
+    def record(self, target: str, title: str, details: Dict[str, Any], urgency: str,
+               mention_all: bool) -> Dict[str, Any]:
+        card = {"ts": self.ts, "index": self.index, "target": target, "title": title,
+                "urgency": urgency, "mention_all": mention_all}
+        if self.keep_details:
+            card["details"] = details
+        self.sent.append(card)
+        return {'success': True, 'status_code': 200, 'data': {"code": 0}}
+
+    def send_rich_alert_card(self, title: str, details: Dict[str, Any], urgency: str = "high",
+                             mention_all: bool = False) -> Dict[str, Any]:
+        return self.record("default", title, details, urgency, mention_all)
+
+    def for_webhook(self, webhook_url: str) -> "_RoutedRecorder":
+        return _RoutedRecorder(self, webhook_url)
+
+
+class _RoutedRecorder:
+    """RecordingClient view for one rule route"""
+
+    def __init__(self, parent: RecordingClient, webhook_url: str):
+        self.parent = parent
+        self.webhook_url = webhook_url
+
+    def send_rich_alert_card(self, title: str, details: Dict[str, Any], urgency: str = "high",
+                             mention_all: bool = False) -> Dict[str, Any]:
+        return self.parent.record(self.webhook_url, title, details, urgency, mention_all)
+
+
+class _MatchRecorder:
+    """Passes through to a RuleSet and remembers which rules fired last"""
+
+    def __init__(self, rules: RuleSet):
+        self.rules = rules
+        self.last = []
+
+    @property
+    def routes(self) -> Dict[str, str]:
+        return self.rules.routes
+
+    def evaluate(self, pair, values, changed=None):
+        self.last = self.rules.evaluate(pair, values, changed)
+        return self.last
+
+
+class _Discard(io.TextIOBase):
+    """stdout replacement that drops send_alert's per-pair prints"""
+
+    def write(self, s):
+        return len(s)
+
+
+def discover_pairs(reader: TickReader, days: List[str]) -> List[Tuple[str, str]]:
+    """Pairs recorded on both exchanges, as (Binance symbol, Gate.io symbol)"""
+    binance, gateio = set(), set()
+    for day in days:
+        binance.update(reader.symbols(day, "Binance"))
+        gateio.update(reader.symbols(day, "Gate.io"))
+    return sorted((gate.replace("_", ""), gate) for gate in gateio if gate.replace("_", "") in binance)
+
+
+def load_series(reader: TickReader, exchange: str, symbol: str,
+                start_ns: int, end_ns: int) -> Optional[Dict[str, Any]]:
+    """All ticks of one symbol in a range as contiguous columns (numpy arrays or lists)"""
+    chunks = list(reader.read_range(exchange, symbol, start_ns, end_ns))
+    if not chunks:
+        return None
+    if np is not None:
+        return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in ("ts", "bid", "ask")}
+    return {name: [v for chunk in chunks for v in chunk[name].tolist()] for name in ("ts", "bid", "ask")}
+
+
+def _as_list(column) -> list:
+    return column.tolist() if hasattr(column, "tolist") else list(column)
+
+
+def _eval_times(bnb_ts, gate_ts, step_ns: Optional[int]):
+    """Evaluation timestamps: every tick of either exchange, or a fixed grid"""
+    if step_ns:
+        return range(min(bnb_ts[0], gate_ts[0]), max(bnb_ts[-1], gate_ts[-1]) + 1, step_ns)
+    return sorted(set(bnb_ts) | set(gate_ts))
+
+
+def _pair_result(pair: str, evaluations: int, fired: List[Tuple[int, int]]) -> Dict[str, Any]:
+    """
+    Group firing evaluations into episodes
+
+    Args:
+        pair: Binance symbol
+        evaluations: Number of evaluations replayed
+        fired: (evaluation index, timestamp ns) of evaluations that alerted
+
+    Returns:
+        Dict with evaluations and episodes as [pair, start_ns, end_ns, alerts]
+    """
+    episodes = []
+    for index, ts in fired:
+        if episodes and index == episodes[-1][4] + 1:
+            episodes[-1][2] = ts
+            episodes[-1][3] += 1
+            episodes[-1][4] = index
+        else:
+            episodes.append([pair, ts, ts, 1, index])
+    return {"evaluations": evaluations, "episodes": [episode[:4] for episode in episodes]}
+
+
+def replay_exact(pair: Tuple[str, str], bnb: Dict[str, Any], gate: Dict[str, Any], rules: RuleSet,
+                 step_ns: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Replay one pair through send_alert
+
+    Args:
+        pair: (Binance symbol, Gate.io symbol)
+        bnb: Binance columns from load_series
+        gate: Gate.io columns from load_series
+        rules: Rules to evaluate
+        step_ns: Evaluate on a fixed grid instead of on every tick
+
+    Returns:
+        Pair result with episodes, alerts and per-rule counts
+    """
+    bnb_sym, gate_sym = pair
+    bnb_ts, bnb_bid, bnb_ask = (_as_list(bnb[c]) for c in ("ts", "bid", "ask"))
+    gate_ts, gate_bid, gate_ask = (_as_list(gate[c]) for c in ("ts", "bid", "ask"))
+    client = RecordingClient()
+    recorder = _MatchRecorder(rules)
+    rule_counts: Dict[str, int] = {}
+    combinations: Dict[str, int] = {}
+    fired = []
+    evaluations = 0
+    bi = gi = -1
+
+    with contextlib.redirect_stdout(_Discard()):
+        for index, t in enumerate(_eval_times(bnb_ts, gate_ts, step_ns)):
+            while bi + 1 < len(bnb_ts) and bnb_ts[bi + 1] <= t:
+                bi += 1
+            while gi + 1 < len(gate_ts) and gate_ts[gi + 1] <= t:
+                gi += 1
+            if bi < 0 or gi < 0:
+                continue
+            evaluations += 1
+            bnb_quote = {"exchange": "Binance", "symbol": bnb_sym, "bid": bnb_bid[bi], "ask": bnb_ask[bi],
+                         "spread": bnb_ask[bi] - bnb_bid[bi]}
+            gate_quote = {"exchange": "Gate.io", "symbol": gate_sym, "bid": gate_bid[gi], "ask": gate_ask[gi],
+                          "spread": gate_ask[gi] - gate_bid[gi]}
+            client.ts, client.index = t, index
+            monitor.send_alert(client, bnb_sym, bnb_quote, gate_quote, recorder)
+            if recorder.last:
+                fired.append((index, t))
+                names = [match.rule.name for match in recorder.last]
+                for name in names:
+                    rule_counts[name] = rule_counts.get(name, 0) + 1
+                key = "+".join(names)
+                combinations[key] = combinations.get(key, 0) + 1
+
+    result = _pair_result(bnb_sym, evaluations, fired)
+    result.update(alerts=len(client.sent), rules=rule_counts, combinations=combinations)
+    return result
+
+
+def align_vectorized(bnb: Dict[str, Any], gate: Dict[str, Any], step_ns: Optional[int] = None) -> Dict[str, Any]:
+    """
+    As-of join of both exchanges at every evaluation time
+
+    Returns:
+        Dict of index, ts, binance_spread, gateio_spread and price_diff_pct arrays
+    """
+    if step_ns:
+        times = np.arange(min(bnb["ts"][0], gate["ts"][0]), max(bnb["ts"][-1], gate["ts"][-1]) + 1,
+                          step_ns, dtype=np.int64)
+    else:
+        times = np.union1d(bnb["ts"], gate["ts"])
+    bi = np.searchsorted(bnb["ts"], times, side="right") - 1
+    gi = np.searchsorted(gate["ts"], times, side="right") - 1
+    valid = (bi >= 0) & (gi >= 0)
+    bi, gi = bi[valid], gi[valid]
+    bnb_bid, bnb_ask = bnb["bid"][bi], bnb["ask"][bi]
+    gate_bid, gate_ask = gate["bid"][gi], gate["ask"][gi]
+    # Same operations, in the same order, as send_alert
+    return {
+        "index": np.nonzero(valid)[0],
+        "ts": times[valid],
+        "binance_spread": bnb_ask - bnb_bid,
+        "gateio_spread": gate_ask - gate_bid,
+        "price_diff_pct": (np.abs(bnb_bid - gate_bid) / ((bnb_bid + gate_bid) / 2)) * 100
+    }
+
+
+def evaluate_vectorized(pair: str, aligned: Dict[str, Any], spread_threshold: float,
+                        price_diff_threshold_pct: float) -> Dict[str, Any]:
+    """Built-in threshold checks over an aligned pair, result shaped like replay_exact"""
+    names = [rule.name for rule in threshold_rules(spread_threshold, price_diff_threshold_pct).rules]
+    code = ((aligned["binance_spread"] > spread_threshold).astype(np.int8)
+            | ((aligned["gateio_spread"] > spread_threshold).astype(np.int8) << 1)
+            | ((aligned["price_diff_pct"] > price_diff_threshold_pct).astype(np.int8) << 2))
+    fired = code > 0
+    index, ts = aligned["index"][fired], aligned["ts"][fired]
+
+    episodes = []
+    if len(index):
+        breaks = np.nonzero(np.diff(index) != 1)[0]
+        starts = np.concatenate(([0], breaks + 1))
+        ends = np.concatenate((breaks, [len(index) - 1]))
+        episodes = [[pair, int(ts[s]), int(ts[e]), int(e - s + 1)] for s, e in zip(starts, ends)]
+
+    rule_counts, combinations = {}, {}
+    for value, count in enumerate(np.bincount(code, minlength=8).tolist()):
+        if value == 0 or not count:
+            continue
+        fired_names = [name for bit, name in enumerate(names) if value & (1 << bit)]
+        for name in fired_names:
+            rule_counts[name] = rule_counts.get(name, 0) + count
+        combinations["+".join(fired_names)] = count
+
+    return {"evaluations": len(aligned["index"]), "episodes": episodes, "alerts": int(fired.sum()),
+            "rules": rule_counts, "combinations": combinations}
+
+
+def summarize(setting: Dict[str, Any], pair_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine pair results of one setting into its report entry"""
+    rules: Dict[str, int] = {}
+    combinations: Dict[str, int] = {}
+    episodes = []
+    for result in pair_results:
+        episodes.extend(result["episodes"])
+        for name, count in result["rules"].items():
+            rules[name] = rules.get(name, 0) + count
+        for name, count in result["combinations"].items():
+            combinations[name] = combinations.get(name, 0) + count
+    episodes.sort(key=lambda episode: episode[1])
+    alerts = sum(result["alerts"] for result in pair_results)
+    return dict(setting,
+                evaluations=sum(result["evaluations"] for result in pair_results),
+                alerts=alerts,
+                episodes=len(episodes),
+                # Alerts repeating a condition that was already alerting on the previous evaluation
+                repeated=alerts - len(episodes),
+                # Evaluations where more than one rule fired
+                overlapping=sum(count for name, count in combinations.items() if "+" in name),
+                rules=rules,
+                combinations=combinations,
+                fire_times=episodes)
+
+
+def _run_settings(task: Tuple) -> List[Dict[str, Any]]:
+    """Process pool entry point: load the pairs once and run several settings"""
+    root, pairs, start_ns, end_ns, step_ns, engine, rules_path, settings = task
+    reader = TickReader(root)
+    loaded = []
+    for bnb_sym, gate_sym in pairs:
+        bnb = load_series(reader, "Binance", bnb_sym, start_ns, end_ns)
+        gate = load_series(reader, "Gate.io", gate_sym, start_ns, end_ns)
+        if bnb is not None and gate is not None:
+            loaded.append(((bnb_sym, gate_sym), bnb, gate))
+
+    if engine == "vectorized":
+        aligned = [(pair[0], align_vectorized(bnb, gate, step_ns)) for pair, bnb, gate in loaded]
+
+    reports = []
+    for setting in settings:
+        if engine == "vectorized":
+            pair_results = [evaluate_vectorized(pair, arrays, setting["spread_threshold"],
+                                                setting["price_diff_threshold_pct"])
+                            for pair, arrays in aligned]
+        else:
+            rules = load_rules(rules_path) if rules_path else threshold_rules(
+                setting["spread_threshold"], setting["price_diff_threshold_pct"])
+            pair_results = [replay_exact(pair, bnb, gate, rules, step_ns) for pair, bnb, gate in loaded]
+        reports.append(summarize(setting, pair_results))
+    return reports
+
+
+def run_backtest(root: str, settings: List[Dict[str, Any]], pairs: Optional[List[Tuple[str, str]]] = None,
+                 start: Optional[str] = None, end: Optional[str] = None, step: Optional[float] = None,
+                 engine: str = "vectorized", rules_path: Optional[str] = None,
+                 workers: int = 1) -> Dict[str, Any]:
+    """
+    Replay recorded ticks for every setting
+
+    Args:
+        root: Tick recorder directory
+        settings: Dicts with spread_threshold and price_diff_threshold_pct
+        pairs: (Binance symbol, Gate.io symbol) pairs, default all recorded on both exchanges
+        start: First day (YYYY-MM-DD), default the first recorded day
+        end: Last day, inclusive, default the last recorded day
+        step: Evaluate every step seconds instead of on every tick
+        engine: "vectorized" or "exact"
+        rules_path: Rules file for the exact engine instead of the threshold settings
+        workers: Processes to spread the settings over
+
+    Returns:
+        Dict with the replayed range, timing and one report per setting
+    """
+    if engine == "vectorized" and np is None:
+        raise RuntimeError("The vectorized engine requires numpy (pip install numpy), use --engine exact")
+    if engine == "vectorized" and rules_path:
+        raise ValueError("Rules files are only supported by the exact engine")
+
+    reader = TickReader(root)
+    days = [d for d in reader.days() if (not start or d >= start) and (not end or d <= end)]
+    if pairs is None:
+        pairs = discover_pairs(reader, days)
+    start_ns = _day_start_ns(start) if start else 0
+    end_ns = _day_start_ns(end) + NS_PER_DAY if end else END_OF_TIME_NS
+    step_ns = int(step * 1e9) if step else None
+
+    workers = max(1, min(workers, len(settings)))
+    chunks = [settings[i::workers] for i in range(workers)]
+    tasks = [(root, pairs, start_ns, end_ns, step_ns, engine, rules_path, chunk) for chunk in chunks]
+
+    started = time.perf_counter()
+    if workers == 1:
+        results = [_run_settings(tasks[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_settings, tasks))
+    elapsed = time.perf_counter() - started
+
+    # Back to the order the settings were given in
+    reports = [None] * len(settings)
+    for i, chunk_reports in enumerate(results):
+        for j, report in enumerate(chunk_reports):
+            reports[i + j * workers] = report
+
+    span = _recorded_span(reader, days, pairs, start_ns, end_ns)
+    return {
+        "engine": engine,
+        "days": days,
+        "pairs": [list(pair) for pair in pairs],
+        "step_seconds": step,
+        "replayed_seconds": span,
+        "elapsed_seconds": elapsed,
+        "speedup": span / elapsed if elapsed > 0 else None,
+        "settings": reports
+    }
+
+
+def _day_start_ns(day: str) -> int:
+    date = datetime.datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+    return int(date.timestamp()) * 10**9
+
+
+def _recorded_span(reader: TickReader, days: List[str], pairs: List[Tuple[str, str]],
+                   start_ns: int, end_ns: int) -> float:
+    """Seconds between the first and last tick replayed"""
+    first, last = None, None
+    for day in days:
+        for exchange, index in (("Binance", 0), ("Gate.io", 1)):
+            for pair in pairs:
+                series = reader.series(day, exchange, pair[index])
+                if series is None:
+                    continue
+                lo, hi = series.index_range(start_ns, end_ns)
+                if hi > lo:
+                    first = series.ts[lo] if first is None else min(first, series.ts[lo])
+                    last = series.ts[hi - 1] if last is None else max(last, series.ts[hi - 1])
+                series.close()
+    return (last - first) / 1e9 if first is not None else 0.0
+
+
+def _format_ts(ts_ns: int) -> str:
+    return datetime.datetime.fromtimestamp(ts_ns / 1e9, tz=datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def print_report(report: Dict[str, Any]):
+    """Print one row per setting"""
+    print(f"Replayed {report['replayed_seconds'] / 3600:.1f}h of {len(report['pairs'])} pairs "
+          f"in {report['elapsed_seconds']:.2f}s ({report['engine']} engine, "
+          f"{report['speedup'] or 0:,.0f}x real time)")
+    print(f"{'setting':<24}{'evals':>10}{'alerts':>10}{'episodes':>10}{'repeated':>10}{'overlap':>10}  first alert")
+    for entry in report["settings"]:
+        if "rules_path" in entry:
+            label = os.path.basename(entry["rules_path"])
+        else:
+            label = f"spread>{entry['spread_threshold']:g} diff>{entry['price_diff_threshold_pct']:g}%"
+        first = f"{entry['fire_times'][0][0]} {_format_ts(entry['fire_times'][0][1])}" if entry["fire_times"] else "-"
+        print(f"{label:<24}{entry['evaluations']:>10}{entry['alerts']:>10}{entry['episodes']:>10}"
+              f"{entry['repeated']:>10}{entry['overlapping']:>10}  {first}")
+
+
+def _floats(text: str) -> List[float]:
+    return [float(value) for value in text.split(",") if value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded ticks to evaluate alert thresholds")
+    parser.add_argument("root", help="Tick recorder directory")
+    parser.add_argument("--spread", default=str(monitor.SPREAD_THRESHOLD),
+                        help="Comma-separated spread thresholds (USD)")
+    parser.add_argument("--diff", default=str(monitor.PRICE_DIFF_THRESHOLD_PCT),
+                        help="Comma-separated price difference thresholds (percent)")
+    parser.add_argument("--pairs", help="Comma-separated BINANCE:GATEIO symbols, default all recorded pairs")
+    parser.add_argument("--start", help="First day, YYYY-MM-DD")
+    parser.add_argument("--end", help="Last day, YYYY-MM-DD, inclusive")
+    parser.add_argument("--step", type=float, help="Evaluate every STEP seconds instead of on every tick")
+    parser.add_argument("--engine", choices=["vectorized", "exact"],
+                        help="Default vectorized when numpy is installed")
+    parser.add_argument("--rules", help="Replay a rules file (exact engine) instead of threshold settings")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for parameter sweeps")
+    parser.add_argument("--output", help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    engine = args.engine or ("vectorized" if np is not None and not args.rules else "exact")
+    if args.rules:
+        settings = [{"rules_path": args.rules}]
+    else:
+        settings = [{"spread_threshold": s, "price_diff_threshold_pct": d}
+                    for s, d in itertools.product(_floats(args.spread), _floats(args.diff))]
+    pairs = [tuple(p.split(":")) for p in args.pairs.split(",")] if args.pairs else None
+
+    try:
+        report = run_backtest(args.root, settings, pairs, args.start, args.end, args.step,
+                              engine, args.rules, args.workers)
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Alert Pipeline Benchmarks
+Measures throughput, send latency, card render CPU and memory of the Lark
+clients and send_alert against a local mock Lark server, and stores the
+results as JSON so runs from different commits can be compared
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, Any, List, Callable, Optional
+
+from lark_group_chat import LarkGroupChatClient
+from mock_lark_server import MockLarkServer
+import exchange_spread_monitor
+
+# Card fields shaped like the ones send_alert produces
+SAMPLE_CARD_DETAILS = {
+    "Binance Bid": "$64,210.15",
+    "Binance Ask": "$64,211.02",
+    "Binance Spread": "$0.8700",
+    "Gate.io Bid": "$64,950.40",
+    "Gate.io Ask": "$64,951.90",
+    "Gate.io Spread": "$1.5000",
+    "Price Diff %": "1.15%",
+    "Volume (Gate.io)": "$182,552,901.12",
+    "24h Change (Gate.io)": "2.31%"
+}
+
+# Quotes that trip every check in send_alert
+SAMPLE_BINANCE_QUOTE = {"exchange": "Binance", "symbol": "BTCUSDT", "bid": 64210.15, "ask": 64211.02, "spread": 0.87}
+SAMPLE_GATEIO_QUOTE = {
+    "exchange": "Gate.io", "symbol": "BTC_USDT", "bid": 64950.40, "ask": 64951.90, "spread": 1.5,
+    "volume_usdt": 182552901.12, "price_change_24h": 2.31
+}
+
+
+class RenderOnlyClient(LarkGroupChatClient):
+    """Client that builds and serializes payloads but never sends them"""
+
+    def __init__(self):
+        super().__init__("http://render-only.invalid")
+        self.bytes_rendered = 0
+
+    def _make_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.bytes_rendered += len(json.dumps(payload).encode('utf-8'))
+        return {'success': True, 'status_code': 200, 'data': {}}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize_latencies(latencies: List[float], wall_time: float, failures: int) -> Dict[str, Any]:
+    """Turn per-send latencies (seconds) into the reported statistics"""
+    return {
+        "sent": len(latencies),
+        "failed": failures,
+        "wall_time_s": round(wall_time, 4),
+        "alerts_per_sec": round(len(latencies) / wall_time, 2) if wall_time else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0
+    }
+
+
+def measure_memory(fn: Callable[[], Any]) -> Dict[str, Any]:
+    """Run fn under tracemalloc and report peak and retained allocations"""
+    tracemalloc.start()
+    try:
+        fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_kib": round(peak / 1024, 1), "retained_kib": round(current / 1024, 1)}
+
+
+def bench_card_render(iterations: int) -> Dict[str, Any]:
+    """CPU time to build and serialize one rich alert card"""
+    client = RenderOnlyClient()
+    start = time.process_time()
+    for _ in range(iterations):
+        client.send_rich_alert_card("Arbitrage Alert: BTCUSDT", SAMPLE_CARD_DETAILS, "high")
+    cpu = time.process_time() - start
+    return {
+        "iterations": iterations,
+        "cpu_us_per_card": round(cpu / iterations * 1e6, 2),
+        "bytes_per_card": client.bytes_rendered // iterations,
+        "memory": measure_memory(
+            lambda: [client.send_rich_alert_card("Arbitrage Alert", SAMPLE_CARD_DETAILS, "high")
+                     for _ in range(min(iterations, 200))]
+        )
+    }
+
+
+def _timed_sends(send: Callable[[], Dict[str, Any]], iterations: int) -> Dict[str, Any]:
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        result = send()
+        latencies.append(time.perf_counter() - t0)
+        if not result['success']:
+            failures += 1
+    return summarize_latencies(latencies, time.perf_counter() - start, failures)
+
+
+def bench_client_send(url: str, iterations: int) -> Dict[str, Any]:
+    """Sequential send_rich_alert_card throughput and latency"""
+    client = LarkGroupChatClient(url)
+
+    def send():
+        return client.send_rich_alert_card("Arbitrage Alert: BTCUSDT", SAMPLE_CARD_DETAILS, "high")
+
+    result = _timed_sends(send, iterations)
+    result["memory"] = measure_memory(lambda: [send() for _ in range(min(iterations, 50))])
+    return result
+
+
+def bench_send_alert(url: str, iterations: int) -> Dict[str, Any]:
+    """End-to-end exchange_spread_monitor.send_alert, evaluation plus delivery"""
+    client = LarkGroupChatClient(url)
+    sink = io.StringIO()
+
+    def send():
+        with contextlib.redirect_stdout(sink):
+            exchange_spread_monitor.send_alert(client, "BTCUSDT", SAMPLE_BINANCE_QUOTE, SAMPLE_GATEIO_QUOTE)
+        sink.seek(0)
+        sink.truncate()
+        return {'success': True}
+
+    result = _timed_sends(send, iterations)
+    result["memory"] = measure_memory(lambda: [send() for _ in range(min(iterations, 50))])
+    return result
+
+
+def bench_async_client_send(url: str, iterations: int, concurrency: int) -> Dict[str, Any]:
+    """Concurrent sends through AsyncLarkGroupChatClient"""
+    from async_lark_group_chat import AsyncLarkGroupChatClient
+
+    async def run():
+        latencies = []
+        failures = 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async with AsyncLarkGroupChatClient(url, max_connections=concurrency) as client:
+            async def send_one():
+                nonlocal failures
+                async with semaphore:
+                    t0 = time.perf_counter()
+                    result = await client.send_rich_alert_card(
+                        "Arbitrage Alert: BTCUSDT", SAMPLE_CARD_DETAILS, "high")
+                    latencies.append(time.perf_counter() - t0)
+                    if not result['success']:
+                        failures += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(send_one() for _ in range(iterations)))
+            wall = time.perf_counter() - start
+
+        return summarize_latencies(latencies, wall, failures)
+
+    result = asyncio.run(run())
+    result["concurrency"] = concurrency
+    return result
+
+
+def git_commit() -> Optional[str]:
+    """Short hash of the checked out commit, if available"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print relative change of every numeric metric against a baseline run"""
+    print(f"\nComparison against {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for bench, metrics in current["results"].items():
+        old_metrics = baseline.get("results", {}).get(bench, {})
+        for name, value in metrics.items():
+            old = old_metrics.get(name)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                change = (value - old) / old * 100
+                print(f"  {bench}.{name}: {old} -> {value} ({change:+.1f}%)")
+
+
+def run_benchmarks(args) -> Dict[str, Any]:
+    """Run every benchmark against a fresh mock server"""
+    results = {}
+    results["card_render"] = bench_card_render(args.render_iterations)
+
+    with MockLarkServer(latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, rate_limit=args.rate_limit) as server:
+        results["client_send"] = bench_client_send(server.url, args.iterations)
+        results["send_alert"] = bench_send_alert(server.url, args.iterations)
+        try:
+            results["async_client_send"] = bench_async_client_send(
+                server.url, args.iterations, args.concurrency)
+        except ImportError:
+            print("aiohttp not installed, skipping async client benchmark")
+        results["mock_status_counts"] = {str(k): v for k, v in server.status_counts.items()}
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "iterations": args.iterations,
+            "render_iterations": args.render_iterations,
+            "concurrency": args.concurrency,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "rate_limit": args.rate_limit
+        },
+        "results": results
+    }
+
+
+def main():
+    """Run the alert pipeline benchmarks from the command line"""
+    parser = argparse.ArgumentParser(description="Benchmark the Lark alert pipeline against a mock server")
+    parser.add_argument("--iterations", type=int, default=500, help="sends per benchmark")
+    parser.add_argument("--render-iterations", type=int, default=20000, help="cards rendered for the CPU benchmark")
+    parser.add_argument("--concurrency", type=int, default=50, help="in-flight requests for the async client")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="mock server random extra latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of HTTP 500 answers")
+    parser.add_argument("--rate-limit", type=int, default=0, help="mock server requests per second before HTTP 429")
+    parser.add_argument("--quick", action="store_true", help="small iteration counts for CI")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.iterations = min(args.iterations, 50)
+        args.render_iterations = min(args.render_iterations, 1000)
+
+    report = run_benchmarks(args)
+    print(json.dumps(report["results"], indent=2))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(report, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
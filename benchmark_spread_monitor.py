@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Spread Monitor Benchmarks
+Runs exchange_spread_monitor cycles against replayed Binance and Gate.io
+responses and reports cycle wall time, requests and bytes per cycle and
+the CPU time spent evaluating quotes in send_alert
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+from typing import Dict, Any, List
+
+import exchange_spread_monitor
+from lark_group_chat import LarkGroupChatClient
+from mock_exchange_server import MockExchangeServer, synthetic_pairs
+from mock_lark_server import MockLarkServer
+from benchmark_alert_pipeline import percentile, git_commit, compare_results
+
+
+def _pairs_from_fixtures(server: MockExchangeServer, limit: int) -> List[tuple]:
+    """Pairs listed on both venues in a recorded fixture set"""
+    gate_pairs = {t["currency_pair"] for t in server.gateio_tickers}
+    pairs = []
+    for ticker in server.binance_tickers:
+        symbol = ticker["symbol"]
+        if symbol.endswith("USDT") and f"{symbol[:-4]}_USDT" in gate_pairs:
+            pairs.append((symbol, f"{symbol[:-4]}_USDT"))
+    return pairs[:limit]
+
+
+def run_cycles(pairs: List[tuple], exchange: MockExchangeServer, lark_url: str, cycles: int,
+               changed_fraction: float, bulk: bool = True, skip_unchanged: bool = True) -> Dict[str, Any]:
+    """
+    Run monitor cycles over pairs and collect per-cycle measurements
+
+    Args:
+        pairs: (Binance symbol, Gate.io pair) tuples to monitor
+        exchange: Running mock exchange server
+        lark_url: Webhook URL alerts are sent to
+        cycles: Number of cycles to run
+        changed_fraction: Share of pairs whose quotes move between cycles
+        bulk: Quote from one all-symbols request per exchange instead of per pair
+        skip_unchanged: Evaluate only pairs whose quotes moved (QuoteChanges)
+    """
+    client = LarkGroupChatClient(lark_url)
+    changes = exchange_spread_monitor.QuoteChanges() if skip_unchanged else None
+    original_send_alert = exchange_spread_monitor.send_alert
+    eval_cpu = [0.0]
+
+    def timed_send_alert(*args, **kwargs):
+        start = time.process_time()
+        try:
+            return original_send_alert(*args, **kwargs)
+        finally:
+            eval_cpu[0] += time.process_time() - start
+
+    exchange_spread_monitor.BINANCE_API_URL = exchange.url
+    exchange_spread_monitor.GATEIO_API_URL = exchange.url
+    exchange_spread_monitor.send_alert = timed_send_alert
+    exchange_spread_monitor.BULK_QUOTES = bulk
+    # Each universe size starts with an unused request weight budget
+    exchange_spread_monitor.BINANCE_WEIGHT = exchange_spread_monitor.RequestWeight(
+        exchange_spread_monitor.BINANCE_WEIGHT_LIMIT, exchange_spread_monitor.BINANCE_WEIGHT_RESERVE)
+
+    wall_times, cpu_times, requests_per_cycle, bytes_per_cycle, weight_per_cycle = [], [], [], [], []
+    per_venue_requests: Dict[str, int] = {}
+    per_venue_bytes: Dict[str, int] = {}
+    sink = io.StringIO()
+    try:
+        for cycle in range(cycles):
+            if cycle:
+                exchange.advance(changed_fraction)
+            exchange.reset_counters()
+            eval_cpu[0] = 0.0
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(sink):
+                exchange_spread_monitor.check_pairs(client, pairs, changes=changes)
+            wall_times.append(time.perf_counter() - start)
+            cpu_times.append(eval_cpu[0])
+            requests_per_cycle.append(sum(exchange.requests.values()))
+            bytes_per_cycle.append(sum(exchange.bytes_sent.values()))
+            weight_per_cycle.append(exchange.weight_charged)
+            for venue, count in exchange.requests.items():
+                per_venue_requests[venue] = per_venue_requests.get(venue, 0) + count
+            for venue, nbytes in exchange.bytes_sent.items():
+                per_venue_bytes[venue] = per_venue_bytes.get(venue, 0) + nbytes
+            sink.seek(0)
+            sink.truncate()
+    finally:
+        exchange_spread_monitor.send_alert = original_send_alert
+
+    return {
+        "pairs": len(pairs),
+        "cycles": cycles,
+        "cycle_wall_s_p50": round(percentile(wall_times, 50), 4),
+        "cycle_wall_s_max": round(max(wall_times), 4),
+        "requests_per_cycle": sum(requests_per_cycle) / cycles,
+        "bytes_per_cycle": sum(bytes_per_cycle) // cycles,
+        "binance_weight_per_cycle": sum(weight_per_cycle) / cycles,
+        "eval_cpu_ms_per_cycle": round(sum(cpu_times) / cycles * 1000, 3),
+        "eval_cpu_us_per_pair": round(sum(cpu_times) / cycles / len(pairs) * 1e6, 2),
+        "requests_per_cycle_by_venue": {v: n / cycles for v, n in per_venue_requests.items()},
+        "bytes_per_cycle_by_venue": {v: n // cycles for v, n in per_venue_bytes.items()}
+    }
+
+
+def run_benchmarks(args) -> Dict[str, Any]:
+    """Run the monitor at every requested universe size"""
+    results = {}
+    latency = {"binance": args.binance_latency, "gateio": args.gateio_latency}
+    with MockLarkServer() as lark:
+        for size in args.pairs:
+            if args.fixtures:
+                exchange = MockExchangeServer.from_files(args.fixtures, latency=latency)
+                pairs = _pairs_from_fixtures(exchange, size)
+            else:
+                exchange = MockExchangeServer.synthetic(size, diverging_fraction=args.alert_fraction,
+                                                        latency=latency)
+                pairs = synthetic_pairs(size)
+            with exchange:
+                lark.reset()
+                result = run_cycles(pairs, exchange, lark.url, args.cycles, args.changed_fraction,
+                                    bulk=not args.per_pair, skip_unchanged=not args.evaluate_all)
+                result["alerts_per_cycle"] = len(lark.received) / args.cycles
+            results[f"pairs_{len(pairs)}"] = result
+            print(f"{len(pairs)} pairs: {result['cycle_wall_s_p50']}s/cycle, "
+                  f"{result['requests_per_cycle']:.0f} requests, {result['bytes_per_cycle']:,} bytes, "
+                  f"Binance weight {result['binance_weight_per_cycle']:.0f}, "
+                  f"{result['eval_cpu_ms_per_cycle']}ms evaluation CPU")
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "pairs": args.pairs,
+            "cycles": args.cycles,
+            "fixtures": args.fixtures,
+            "alert_fraction": args.alert_fraction,
+            "changed_fraction": args.changed_fraction,
+            "per_pair": args.per_pair,
+            "evaluate_all": args.evaluate_all,
+            "binance_latency": args.binance_latency,
+            "gateio_latency": args.gateio_latency
+        },
+        "results": results
+    }
+
+
+def main():
+    """Run the spread monitor benchmarks from the command line"""
+    parser = argparse.ArgumentParser(description="Benchmark exchange_spread_monitor against replayed exchanges")
+    parser.add_argument("--pairs", default="3,30,300",
+                        help="comma separated universe sizes, e.g. 3,50,500,5000")
+    parser.add_argument("--cycles", type=int, default=3, help="monitor cycles per universe size")
+    parser.add_argument("--fixtures", help="directory with recorded responses (see mock_exchange_server.py --record)")
+    parser.add_argument("--alert-fraction", type=float, default=0.01,
+                        help="share of synthetic pairs priced to trigger a price difference alert")
+    parser.add_argument("--changed-fraction", type=float, default=0.2,
+                        help="share of pairs whose quotes move between cycles")
+    parser.add_argument("--binance-latency", type=float, default=0.0, help="seconds per Binance response")
+    parser.add_argument("--gateio-latency", type=float, default=0.0, help="seconds per Gate.io response")
+    parser.add_argument("--per-pair", action="store_true",
+                        help="fetch quotes per pair instead of one all-symbols request per exchange")
+    parser.add_argument("--evaluate-all", action="store_true",
+                        help="evaluate every pair each cycle instead of only those whose quotes moved")
+    parser.add_argument("--output", default="bench_results_spread_monitor.json",
+                        help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+    args.pairs = [int(n) for n in args.pairs.split(",") if n]
+
+    report = run_benchmarks(args)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(report, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
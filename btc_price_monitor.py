@@ -5,7 +5,8 @@ Uses LarkGroupChatClient for group chat features like mentions and rich cards
 """
 
 import time
-from lark_group_chat import LarkGroupChatClient
+from alert_relay import RelayClient
+from health_collector import HealthCollector
 
 # Lark Group Chat Webhook URL - Replace with your actual webhook URL
 WEBHOOK_URL = "https://open.larksuite.com/open-apis/bot/v2/hook/t-g206787iAEON7GKUSM3H7MEYKICF4OTYVUMQFNBX"
@@ -33,7 +34,8 @@ def send_lark_alert(client, message, mention_all=False):
 def simulate_risk_conditions():
     """Simulate various cryptocurrency risk conditions with group chat features"""
 
-    client = LarkGroupChatClient(WEBHOOK_URL)
+    client = RelayClient(WEBHOOK_URL)
+    health = HealthCollector(interval=1.0).start()
 
     print("🚨 Starting Risk Alert Simulation with Group Chat Features...\n")
 
@@ -93,15 +95,11 @@ def simulate_risk_conditions():
 
     # Scenario 7: System alert with rich card
     print("Scenario 7: System alert with rich card")
-    system_details = {
-        "Sistem Durumu": "Aktif",
+    system_details = health.status_details({
         "Monitör Edilen Pariteler": "47",
-        "Aktif Uyarılar": "12",
-        "Son Güncelleme": "14:45:22",
-        "CPU Kullanımı": "%23",
-        "Bellek Kullanımı": "%67",
-        "Ağ Gecikmesi": "12ms"
-    }
+        "Aktif Uyarılar": "12"
+    })
+    health.close()
     result = client.send_rich_alert_card("Risk Yönetim Sistemi Durumu", system_details, "low")
     if result['success']:
         print("✅ System alert sent successfully!")
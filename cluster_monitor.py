@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Multi-Node Spread Monitor with Leader-Elected Dispatch
+Several monitor instances share one coordination database. Live nodes split
+the pairs with a consistent hash ring and rebalance when a node stops
+heartbeating. Alerts go into a shared outbox keyed per pair and check window,
+so duplicates from overlapping nodes collapse, and only the node holding the
+dispatcher lease delivers them to Lark.
+
+The coordinator is backed by SQLite, which works for nodes on one host or on
+a shared filesystem with working locks.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import exchange_spread_monitor
+from lark_group_chat import LarkGroupChatClient
+from sharded_monitor import HashRing
+from metrics import ALERTS_SENT, QUEUE_DEPTH
+
+DISPATCH_LEASE = "dispatcher"
+MAX_DELIVERY_ATTEMPTS = 5
+DELIVERY_TIMEOUT = 30  # Longest LarkGroupChatClient waits for one POST
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    epoch INTEGER NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    alert_key TEXT PRIMARY KEY,
+    webhook_url TEXT,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    delivered REAL,
+    delivered_by TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (delivered, created);
+"""
+
+
+class SQLiteCoordinator:
+    """Membership, leases and a deduplicating alert outbox in one SQLite file"""
+
+    def __init__(self, path: str, node_id: str, node_ttl: float = 15.0):
+        """
+        Initialize the coordinator
+
+        Args:
+            path: SQLite database shared by all nodes
+            node_id: Unique name of this node
+            node_ttl: Seconds without heartbeat after which a node counts as dead
+        """
+        self.path = path
+        self.node_id = node_id
+        self.node_ttl = node_ttl
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must stay on the thread that opened them
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def heartbeat(self):
+        """Announce that this node is alive"""
+        with self._transaction() as db:
+            db.execute("INSERT INTO nodes (node_id, heartbeat) VALUES (?, ?) "
+                       "ON CONFLICT(node_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                       (self.node_id, time.time()))
+
+    def leave(self):
+        """Drop this node from membership and give up its leases"""
+        with self._transaction() as db:
+            db.execute("DELETE FROM nodes WHERE node_id = ?", (self.node_id,))
+            db.execute("UPDATE leases SET expires = 0 WHERE holder = ?", (self.node_id,))
+
+    def live_nodes(self) -> List[str]:
+        """Nodes that heartbeated within the TTL"""
+        rows = self._connection().execute(
+            "SELECT node_id FROM nodes WHERE heartbeat >= ? ORDER BY node_id",
+            (time.time() - self.node_ttl,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def acquire_lease(self, name: str, ttl: Optional[float] = None) -> Optional[int]:
+        """
+        Take or renew a named lease
+
+        Returns:
+            The lease epoch (fencing token) if this node holds it, else None
+        """
+        ttl = self.node_ttl if ttl is None else ttl
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT holder, epoch, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                db.execute("INSERT INTO leases (name, holder, epoch, expires) VALUES (?, ?, 1, ?)",
+                           (name, self.node_id, now + ttl))
+                return 1
+            holder, epoch, expires = row
+            if holder == self.node_id:
+                db.execute("UPDATE leases SET expires = ? WHERE name = ?", (now + ttl, name))
+                return epoch
+            if expires < now:
+                db.execute("UPDATE leases SET holder = ?, epoch = ?, expires = ? WHERE name = ?",
+                           (self.node_id, epoch + 1, now + ttl, name))
+                return epoch + 1
+            return None
+
+    def lease_holder(self, name: str) -> Optional[str]:
+        """Current unexpired holder of a lease"""
+        row = self._connection().execute(
+            "SELECT holder FROM leases WHERE name = ? AND expires >= ?", (name, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def enqueue_alert(self, alert_key: str, payload: Dict[str, Any], webhook_url: Optional[str] = None) -> bool:
+        """
+        Add an alert to the outbox
+
+        Returns:
+            False if another node already queued the same alert key
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO outbox (alert_key, webhook_url, payload, created) VALUES (?, ?, ?, ?)",
+                (alert_key, webhook_url, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+            return cursor.rowcount == 1
+
+    def pending_alerts(self, limit: int = 100) -> List[Tuple[str, Optional[str], Dict[str, Any]]]:
+        """Undelivered alerts, oldest first"""
+        rows = self._connection().execute(
+            "SELECT alert_key, webhook_url, payload FROM outbox "
+            "WHERE delivered IS NULL AND attempts < ? ORDER BY created LIMIT ?",
+            (MAX_DELIVERY_ATTEMPTS, limit)
+        ).fetchall()
+        return [(key, url, json.loads(payload)) for key, url, payload in rows]
+
+    def pending_count(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM outbox WHERE delivered IS NULL AND attempts < ?", (MAX_DELIVERY_ATTEMPTS,)
+        ).fetchone()[0]
+
+    def record_attempt(self, alert_key: str, delivered: bool, epoch: int) -> bool:
+        """
+        Record a delivery attempt, only while still holding the dispatcher lease
+
+        Returns:
+            False if the lease moved to another node (the epoch is stale)
+        """
+        with self._transaction() as db:
+            row = db.execute("SELECT holder, epoch FROM leases WHERE name = ?", (DISPATCH_LEASE,)).fetchone()
+            if row != (self.node_id, epoch):
+                return False
+            if delivered:
+                db.execute("UPDATE outbox SET attempts = attempts + 1, delivered = ?, delivered_by = ? "
+                           "WHERE alert_key = ? AND delivered IS NULL", (time.time(), self.node_id, alert_key))
+            else:
+                db.execute("UPDATE outbox SET attempts = attempts + 1 WHERE alert_key = ?", (alert_key,))
+            return True
+
+    def prune_outbox(self, older_than: float = 86400.0):
+        """Delete delivered or abandoned alerts older than older_than seconds"""
+        with self._transaction() as db:
+            db.execute("DELETE FROM outbox WHERE created < ? AND (delivered IS NOT NULL OR attempts >= ?)",
+                       (time.time() - older_than, MAX_DELIVERY_ATTEMPTS))
+
+
+class OutboxClient(LarkGroupChatClient):
+    """Builds payloads like LarkGroupChatClient but puts them in the shared outbox"""
+
+    def __init__(self, coordinator: SQLiteCoordinator, webhook_url: Optional[str] = None):
+        super().__init__(webhook_url or "outbox://default")
+        self.coordinator = coordinator
+        self.target = webhook_url
+        self.scope = ""
+        self._sequence = 0
+        self._routed: Dict[str, "OutboxClient"] = {}
+
+    def begin_scope(self, scope: str):
+        """Start keying alerts under scope, e.g. pair and check window"""
+        self.scope = scope
+        self._sequence = 0
+        for client in self._routed.values():
+            client.begin_scope(scope)
+
+    def for_webhook(self, webhook_url: str) -> "OutboxClient":
+        """Client queueing to another webhook, used for rule routes"""
+        if webhook_url not in self._routed:
+            self._routed[webhook_url] = OutboxClient(self.coordinator, webhook_url)
+            self._routed[webhook_url].begin_scope(self.scope)
+        return self._routed[webhook_url]
+
+    def _make_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self._sequence += 1
+        alert_key = f"{self.scope}|{self.target or ''}|{self._sequence}"
+        queued = self.coordinator.enqueue_alert(alert_key, payload, self.target)
+        # Counted as queued here, and as sent by the node that delivers it
+        return {'success': True, 'status_code': None, 'queued': True,
+                'data': {'queued': queued, 'alert_key': alert_key}}
+
+
+class ClusterNode:
+    """One monitor instance taking part in the cluster"""
+
+    def __init__(self, coordinator: SQLiteCoordinator, pairs: List[Tuple[str, str]],
+                 webhook_url: str = exchange_spread_monitor.WEBHOOK_URL, rules_path: Optional[str] = None,
+                 check_interval: float = exchange_spread_monitor.CHECK_INTERVAL_SEC,
+                 heartbeat_interval: Optional[float] = None):
+        """
+        Initialize the node
+
+        Args:
+            coordinator: Shared coordination backend
+            pairs: Full pair universe, the node evaluates its share
+            webhook_url: Default delivery webhook used when leading
+            rules_path: Optional alert rules file (see alert_rules.py)
+            check_interval: Seconds between monitor cycles, also the dedup window
+            heartbeat_interval: Seconds between heartbeats and dispatch rounds
+        """
+        self.coordinator = coordinator
+        self.pairs = list(pairs)
+        self.check_interval = check_interval
+        self.heartbeat_interval = heartbeat_interval or coordinator.node_ttl / 3
+        self.outbox = OutboxClient(coordinator)
+        self.rules = None
+        if rules_path:
+            from alert_rules import RuleEngine
+            self.rules = RuleEngine(rules_path)
+        self._delivery_clients = {None: LarkGroupChatClient(webhook_url)}
+        self._stop = threading.Event()
+        self._keepalive_thread = None
+        # dispatch() runs from the keepalive thread and from run_forever
+        self._dispatch_lock = threading.Lock()
+        QUEUE_DEPTH.set_function(coordinator.pending_count, queue="cluster_outbox")
+
+    def my_pairs(self) -> List[Tuple[str, str]]:
+        """Pairs this node owns among the currently live nodes"""
+        nodes = self.coordinator.live_nodes()
+        if self.coordinator.node_id not in nodes:
+            nodes.append(self.coordinator.node_id)
+        ring = HashRing(nodes)
+        return [pair for pair in self.pairs if ring.node_for(pair[0]) == self.coordinator.node_id]
+
+    def run_cycle(self, quiet: bool = False) -> int:
+        """
+        Evaluate this node's pairs once, queueing alerts to the outbox
+
+        Returns:
+            Number of pairs evaluated
+        """
+        self.coordinator.heartbeat()
+        if self.rules is not None:
+            self.rules.maybe_reload()
+        window = int(time.time() // self.check_interval)
+        pairs = self.my_pairs()
+        output = io.StringIO() if quiet else None
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            book = exchange_spread_monitor.QuoteBook.fetch() if exchange_spread_monitor.BULK_QUOTES else None
+            for bnb_sym, gate_sym in pairs:
+                if book is not None:
+                    bnb_data = book.binance(bnb_sym)
+                    gate_data = book.gateio(gate_sym)
+                else:
+                    bnb_data = exchange_spread_monitor.fetch_binance_price(bnb_sym)
+                    gate_data = exchange_spread_monitor.fetch_gateio_price(gate_sym)
+                self.outbox.begin_scope(f"{bnb_sym}|{window}")
+                exchange_spread_monitor.send_alert(self.outbox, bnb_sym, bnb_data, gate_data, self.rules)
+        return len(pairs)
+
+    def dispatch(self) -> int:
+        """
+        Deliver pending outbox alerts if this node holds the dispatcher lease
+
+        Returns:
+            Number of alerts delivered
+        """
+        with self._dispatch_lock:
+            epoch = self.coordinator.acquire_lease(DISPATCH_LEASE)
+            if epoch is None:
+                return 0
+            delivered = 0
+            for alert_key, webhook_url, payload in self.coordinator.pending_alerts():
+                # Renewed to outlast the send, so no other node can take over while it is in flight
+                if self.coordinator.acquire_lease(DISPATCH_LEASE, self.coordinator.node_ttl + DELIVERY_TIMEOUT) != epoch:
+                    # Lost the lease mid-round, the new leader takes over
+                    break
+                if webhook_url not in self._delivery_clients:
+                    self._delivery_clients[webhook_url] = LarkGroupChatClient(webhook_url)
+                result = self._delivery_clients[webhook_url]._make_request(payload)
+                if not self.coordinator.record_attempt(alert_key, result['success'], epoch):
+                    break
+                if result['success']:
+                    delivered += 1
+                    ALERTS_SENT.inc()
+                else:
+                    print(f"❌ Failed to deliver {alert_key}: {result['error']}")
+            return delivered
+
+    def _keepalive(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.coordinator.heartbeat()
+                self.dispatch()
+            except sqlite3.Error as e:
+                print(f"❌ Coordinator error: {e}")
+
+    def start(self) -> "ClusterNode":
+        """Start heartbeating and dispatching in the background"""
+        self.coordinator.heartbeat()
+        self._keepalive_thread = threading.Thread(target=self._keepalive, name="cluster-keepalive", daemon=True)
+        self._keepalive_thread.start()
+        return self
+
+    def stop(self):
+        """Stop background work and leave the cluster"""
+        self._stop.set()
+        if self._keepalive_thread:
+            self._keepalive_thread.join()
+        self.coordinator.leave()
+
+    def run_forever(self):
+        """Monitor cycles until interrupted"""
+        self.start()
+        try:
+            while True:
+                count = self.run_cycle()
+                self.dispatch()
+                if self.coordinator.lease_holder(DISPATCH_LEASE) == self.coordinator.node_id:
+                    self.coordinator.prune_outbox()
+                print(f"[{self.coordinator.node_id}] Evaluated {count}/{len(self.pairs)} pairs "
+                      f"(leader: {self.coordinator.lease_holder(DISPATCH_LEASE)}). "
+                      f"Waiting {self.check_interval} seconds before next check...")
+                time.sleep(self.check_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+def main():
+    """Run one cluster node"""
+    parser = argparse.ArgumentParser(description="Multi-node spread monitor with leader-elected dispatch")
+    parser.add_argument("--db", default="cluster.db", help="shared SQLite coordination database")
+    parser.add_argument("--node-id", default=f"{socket.gethostname()}-{os.getpid()}", help="unique node name")
+    parser.add_argument("--node-ttl", type=float, default=15.0, help="seconds before a silent node is dead")
+    parser.add_argument("--rules", default=exchange_spread_monitor.RULES_PATH, help="alert rules file")
+    args = parser.parse_args()
+
+    pairs = [("BTCUSDT", "BTC_USDT"), ("ETHUSDT", "ETH_USDT"), ("XRPUSDT", "XRP_USDT")]
+    coordinator = SQLiteCoordinator(args.db, args.node_id, node_ttl=args.node_ttl)
+    ClusterNode(coordinator, pairs, rules_path=args.rules).run_forever()
+
+
+if __name__ == "__main__":
+    main()
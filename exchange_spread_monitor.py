@@ -3,57 +3,347 @@
 Cross-Exchange Spread and Price Difference Monitor with Lark Alerts
 """
 
+import itertools
+import threading
 import time
+from typing import Dict, Any
+
 import requests
+import tracing
+from alert_callbacks import start_escalations
+from alert_relay import RelayClient
+from alert_rules import RuleEngine, DEFAULT_ROUTE, threshold_rules, highest_severity
 from lark_group_chat import LarkGroupChatClient
+from metrics import (Gauge, Counter, FETCH_LATENCY, FETCH_ERRORS, CYCLE_DURATION, ALERTS_RAISED, ALERTS_SENT,
+                     ALERTS_QUEUED, count_delivery, start_metrics_server)
+from health_collector import HealthCollector
+from memory_budget import MemoryBudget, debug_endpoints
+from tick_recorder import TickRecorder
+from trading_summary import TradingSummary, DEFAULT_CHECKPOINT_PATH
+from triangular_arbitrage import ArbitrageGraph, send_opportunities
 
 WEBHOOK_URL = "https://open.larksuite.com/open-apis/bot/v2/hook/5E2YcUz9UFWMOEE7QKt4oMtiQBqeUBLi"
 
 SPREAD_THRESHOLD = 0.5  # USD
 PRICE_DIFF_THRESHOLD_PCT = 1.0  # Percent
 CHECK_INTERVAL_SEC = 300  # 5 minutes
+METRICS_PORT = 9108  # Local /metrics endpoint, 0 disables
+TRACE_LOG_PATH = None  # JSONL file for sampled alert spans, None disables
+TRACE_SAMPLE_RATE = 0.1
+RULES_PATH = None  # JSON/YAML rules file (see alert_rules.py), None uses the thresholds above
+TICK_RECORD_DIR = None  # Directory for recorded quotes (see tick_recorder.py), None disables
+STATUS_CARD_INTERVAL_SEC = 3600  # System health card (see health_collector.py), 0 disables
+SUMMARY_CHECKPOINT_PATH = DEFAULT_CHECKPOINT_PATH  # Daily summary state (see trading_summary.py), None disables
+CARD_CALLBACK_PORT = 0  # Card button callbacks (see alert_callbacks.py), 0 disables acknowledgements and escalation
+CARD_CALLBACK_HOST = "0.0.0.0"  # Lark has to reach it; anything but loopback needs CARD_CALLBACK_TOKEN
+CARD_CALLBACK_TOKEN = None  # Verification token from the bot's settings
+ESCALATION_TIMEOUT_SEC = 600  # Unacknowledged high alerts are sent again with @all after this
+MEMORY_BUDGET_BYTES = 64 * 2**20  # Caches kept across cycles (see memory_budget.py), None disables
+MEMORY_RSS_LIMIT_BYTES = None  # Warn and report pressure above this RSS, None disables
+POSITIONS_PATH = None  # Portfolio for P&L, VaR and limit alerts (see portfolio_risk.py), None disables
+RISK_CHECKPOINT_PATH = "portfolio_risk.json"  # Return history and day's open prices, None disables
+
+BINANCE_API_URL = "https://api.binance.com"
+GATEIO_API_URL = "https://api.gate.io"
+SKIP_UNCHANGED = True  # Evaluate only pairs whose quotes moved since the last cycle (see QuoteChanges)
+TRIANGULAR_ARBITRAGE = False  # Also scan every market in the bulk quotes for cycles (see triangular_arbitrage.py)
+FUNDING_MONITOR = False  # Also check perpetual funding and basis against the bulk quotes (see funding_monitor.py)
+CLUSTER_ALERTS = True  # One market-wide move card for alerts on correlated pairs (see alert_clustering.py)
+BULK_QUOTES = True  # One all-symbols request per exchange and cycle (see QuoteBook), False fetches per pair
+BINANCE_WEIGHT_LIMIT = 6000  # Binance request weight allowed per minute and IP
+BINANCE_WEIGHT_RESERVE = 0.2  # Share of the limit left for other clients on the same IP
+# Request weights of /api/v3/ticker/bookTicker
+BINANCE_WEIGHT_SYMBOL = 2
+BINANCE_WEIGHT_ALL_SYMBOLS = 4
+
+BINANCE_WEIGHT_USED = Gauge("binance_request_weight_used", "Binance request weight used in the current minute")
+QUOTE_FALLBACKS = Counter("exchange_quote_fallbacks_total",
+                          "Quotes missing from the bulk response and fetched per symbol", ["exchange"])
+
+
+class RequestWeight:
+    """Binance request weight used in the current one-minute window"""
+
+    def __init__(self, limit: int, reserve: float = 0.0):
+        """
+        Initialize the budget
+
+        Args:
+            limit: Weight Binance allows per minute
+            reserve: Share of the limit this process leaves unused
+        """
+        self.budget = int(limit * (1 - reserve))
+        self.used = 0
+        self.window = None
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _roll(self, now: float):
+        window = int(now // 60)
+        if window != self.window:
+            self.window, self.used = window, 0
+
+    def try_spend(self, weight: int) -> bool:
+        """Reserve weight for a request, False if it would go over the budget"""
+        now = time.time()
+        with self._lock:
+            self._roll(now)
+            if now < self.blocked_until or self.used + weight > self.budget:
+                return False
+            self.used += weight
+            BINANCE_WEIGHT_USED.set(self.used)
+            return True
+
+    def observe(self, res):
+        """Take the weight Binance reports (X-MBX-USED-WEIGHT-1M) and honour 429/418 backoffs"""
+        now = time.time()
+        with self._lock:
+            self._roll(now)
+            reported = res.headers.get("X-MBX-USED-WEIGHT-1M")
+            if reported is not None:
+                # Other clients on the same IP count too, local spends may not be in it yet
+                self.used = max(self.used, int(reported))
+            if res.status_code in (418, 429):
+                self.blocked_until = now + float(res.headers.get("Retry-After", 60))
+            BINANCE_WEIGHT_USED.set(self.used)
+
+
+BINANCE_WEIGHT = RequestWeight(BINANCE_WEIGHT_LIMIT, BINANCE_WEIGHT_RESERVE)
+
+
+def _binance_quote(ticker, received_at):
+    return {
+        "exchange": "Binance",
+        "symbol": ticker["symbol"],
+        "bid": float(ticker["bidPrice"]),
+        "ask": float(ticker["askPrice"]),
+        "spread": float(ticker["askPrice"]) - float(ticker["bidPrice"]),
+        "received_at": received_at
+    }
+
+
+def _gateio_quote(ticker, received_at):
+    return {
+        "exchange": "Gate.io",
+        "symbol": ticker["currency_pair"],
+        "bid": float(ticker["highest_bid"]),
+        "ask": float(ticker["lowest_ask"]),
+        "spread": float(ticker["lowest_ask"]) - float(ticker["highest_bid"]),
+        "volume_usdt": float(ticker["quote_volume"]),
+        "price_change_24h": float(ticker["change_percentage"]),
+        "received_at": received_at
+    }
+
+
+def _get_binance(url, weight):
+    """GET a Binance URL within the request weight budget"""
+    if not BINANCE_WEIGHT.try_spend(weight):
+        raise RuntimeError("Binance request weight budget exhausted for this minute")
+    with FETCH_LATENCY.time(exchange="binance"):
+        res = requests.get(url, timeout=10)
+    BINANCE_WEIGHT.observe(res)
+    res.raise_for_status()
+    return res.json()
 
 
 def fetch_binance_price(symbol="BTCUSDT"):
-    url = f"https://api.binance.com/api/v3/ticker/bookTicker?symbol={symbol}"
+    url = f"{BINANCE_API_URL}/api/v3/ticker/bookTicker?symbol={symbol}"
     try:
-        res = requests.get(url, timeout=10)
-        res.raise_for_status()
-        data = res.json()
-        return {
-            "exchange": "Binance",
-            "symbol": symbol,
-            "bid": float(data["bidPrice"]),
-            "ask": float(data["askPrice"]),
-            "spread": float(data["askPrice"]) - float(data["bidPrice"])
-        }
+        return _binance_quote(_get_binance(url, BINANCE_WEIGHT_SYMBOL), time.time())
     except Exception as e:
+        FETCH_ERRORS.inc(exchange="binance")
         return {"exchange": "Binance", "error": str(e)}
 
 
 def fetch_gateio_price(symbol="BTC_USDT"):
-    url = "https://api.gate.io/api/v4/spot/tickers"
+    url = f"{GATEIO_API_URL}/api/v4/spot/tickers"
     try:
-        res = requests.get(url, timeout=10)
+        with FETCH_LATENCY.time(exchange="gateio"):
+            res = requests.get(url, timeout=10)
         res.raise_for_status()
         tickers = res.json()
         for ticker in tickers:
             if ticker["currency_pair"] == symbol:
-                return {
-                    "exchange": "Gate.io",
-                    "symbol": symbol,
-                    "bid": float(ticker["highest_bid"]),
-                    "ask": float(ticker["lowest_ask"]),
-                    "spread": float(ticker["lowest_ask"]) - float(ticker["highest_bid"]),
-                    "volume_usdt": float(ticker["quote_volume"]),
-                    "price_change_24h": float(ticker["change_percentage"])
-                }
+                return _gateio_quote(ticker, time.time())
+        FETCH_ERRORS.inc(exchange="gateio")
         return {"exchange": "Gate.io", "error": f"{symbol} not found"}
     except Exception as e:
+        FETCH_ERRORS.inc(exchange="gateio")
         return {"exchange": "Gate.io", "error": str(e)}
 
 
-def send_alert(client, pair, bnb_data, gate_data):
+class QuoteBook:
+    """
+    One cycle of quotes from the all-symbols endpoints, indexed by symbol
+
+    Binance symbols missing from the bulk response (or all of them, if it
+    failed) are fetched per symbol while the request weight budget allows.
+    Gate.io's per-pair fetch downloads the same full ticker list, so a pair
+    missing from it is reported as not found instead of fetched again.
+    """
+
+    def __init__(self):
+        self._binance: Dict[str, Dict[str, Any]] = {}
+        self._gateio: Dict[str, Dict[str, Any]] = {}
+        self.binance_received_at = self.gateio_received_at = None
+        self.gateio_error = None
+
+    @classmethod
+    def fetch(cls) -> "QuoteBook":
+        """Download both all-symbols responses, one request per exchange"""
+        book = cls()
+        try:
+            tickers = _get_binance(f"{BINANCE_API_URL}/api/v3/ticker/bookTicker", BINANCE_WEIGHT_ALL_SYMBOLS)
+            book.binance_received_at = time.time()
+            book._binance = {ticker["symbol"]: ticker for ticker in tickers}
+        except Exception as e:
+            FETCH_ERRORS.inc(exchange="binance")
+            print(f"Bulk Binance bookTicker failed, fetching per symbol: {e}")
+        try:
+            with FETCH_LATENCY.time(exchange="gateio"):
+                res = requests.get(f"{GATEIO_API_URL}/api/v4/spot/tickers", timeout=10)
+            res.raise_for_status()
+            tickers = res.json()
+            book.gateio_received_at = time.time()
+            book._gateio = {ticker["currency_pair"]: ticker for ticker in tickers}
+        except Exception as e:
+            FETCH_ERRORS.inc(exchange="gateio")
+            book.gateio_error = str(e)
+        return book
+
+    def tickers(self):
+        """(exchange, symbol, raw bid, raw ask) for every market in the bulk responses"""
+        for symbol, ticker in self._binance.items():
+            yield "Binance", symbol, ticker["bidPrice"], ticker["askPrice"]
+        for symbol, ticker in self._gateio.items():
+            yield "Gate.io", symbol, ticker["highest_bid"], ticker["lowest_ask"]
+
+    def binance(self, symbol: str) -> Dict[str, Any]:
+        ticker = self._binance.get(symbol)
+        if ticker is None:
+            QUOTE_FALLBACKS.inc(exchange="binance")
+            return fetch_binance_price(symbol)
+        return _binance_quote(ticker, self.binance_received_at)
+
+    def gateio(self, symbol: str) -> Dict[str, Any]:
+        ticker = self._gateio.get(symbol)
+        if ticker is None:
+            FETCH_ERRORS.inc(exchange="gateio")
+            return {"exchange": "Gate.io", "error": self.gateio_error or f"{symbol} not found"}
+        return _gateio_quote(ticker, self.gateio_received_at)
+
+
+# Slots of a quote fingerprint, and the rule fields that depend on each
+FINGERPRINT_FIELDS = (
+    ("binance_bid", "binance_spread", "price_diff_pct"),
+    ("binance_ask", "binance_spread"),
+    ("gateio_bid", "gateio_spread", "price_diff_pct"),
+    ("gateio_ask", "gateio_spread"),
+    ("volume_usdt",),
+    ("price_change_24h",)
+)
+BINANCE_SLOTS = 0b000011
+GATEIO_SLOTS = 0b111100
+ALL_SLOTS = (1 << len(FINGERPRINT_FIELDS)) - 1
+
+
+def quote_fingerprint(bnb_data, gate_data):
+    """The quote values alerts depend on, in FINGERPRINT_FIELDS order"""
+    return (bnb_data["bid"], bnb_data["ask"], gate_data["bid"], gate_data["ask"],
+            gate_data.get("volume_usdt"), gate_data.get("price_change_24h"))
+
+
+class QuoteChanges:
+    """Last-seen quote fingerprint per pair, to skip pairs whose quotes did not move"""
+
+    def __init__(self):
+        self._seen: Dict[str, tuple] = {}
+
+    def compare(self, pair: str, bnb_data: Dict[str, Any], gate_data: Dict[str, Any]) -> int:
+        """
+        Remember the pair's quotes and report what changed
+
+        Returns:
+            Bitmask of FINGERPRINT_FIELDS slots that changed, 0 if none,
+            ALL_SLOTS for a new pair or a quote with an error
+        """
+        if "error" in bnb_data or "error" in gate_data:
+            # Evaluate everything again once both quotes are back
+            self._seen.pop(pair, None)
+            return ALL_SLOTS
+        fingerprint = quote_fingerprint(bnb_data, gate_data)
+        last = self._seen.get(pair)
+        self._seen[pair] = fingerprint
+        if last is None:
+            return ALL_SLOTS
+        if last == fingerprint:
+            return 0
+        mask = 0
+        for slot, (before, after) in enumerate(zip(last, fingerprint)):
+            if before != after:
+                mask |= 1 << slot
+        return mask
+
+    def forget(self, pair: str):
+        """Drop a pair, e.g. after it was removed from the universe"""
+        self._seen.pop(pair, None)
+
+    # MemoryBudget protocol: an evicted pair is evaluated in full on its next quote
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def evict(self, count: int) -> int:
+        """Forget the count longest-known pairs"""
+        evicted = list(itertools.islice(self._seen, count))
+        for pair in evicted:
+            del self._seen[pair]
+        return len(evicted)
+
+    def sample(self, count: int) -> list:
+        return list(itertools.islice(self._seen.items(), count))
+
+
+_threshold_rules = (None, None)
+_route_clients = {}
+
+
+def default_rules():
+    """Rules equivalent to SPREAD_THRESHOLD and PRICE_DIFF_THRESHOLD_PCT, rebuilt if they change"""
+    global _threshold_rules
+    key = (SPREAD_THRESHOLD, PRICE_DIFF_THRESHOLD_PCT)
+    if _threshold_rules[0] != key:
+        _threshold_rules = (key, threshold_rules(*key))
+    return _threshold_rules[1]
+
+
+def quote_fields(bnb_data, gate_data, price_diff_pct):
+    """Values alert rules can read for one pair"""
+    return {
+        "binance_bid": bnb_data["bid"],
+        "binance_ask": bnb_data["ask"],
+        "binance_spread": bnb_data["spread"],
+        "gateio_bid": gate_data["bid"],
+        "gateio_ask": gate_data["ask"],
+        "gateio_spread": gate_data["spread"],
+        "price_diff_pct": price_diff_pct,
+        "volume_usdt": gate_data.get("volume_usdt", 0.0),
+        "price_change_24h": gate_data.get("price_change_24h", 0.0)
+    }
+
+
+def _client_for_route(client, rules, route):
+    if route == DEFAULT_ROUTE:
+        return client
+    url = rules.routes[route]
+    if hasattr(client, "for_webhook"):
+        return client.for_webhook(url)
+    if url not in _route_clients:
+        _route_clients[url] = LarkGroupChatClient(url)
+    return _route_clients[url]
+
+
+def send_alert(client, pair, bnb_data, gate_data, rules=None, summary=None):
     # Calculate price difference percentage
     if "error" in bnb_data or "error" in gate_data:
         print(f"Error in data for {pair}: Binance: {bnb_data.get('error')}, Gate.io: {gate_data.get('error')}")
@@ -63,19 +353,19 @@ def send_alert(client, pair, bnb_data, gate_data):
     avg_price = (bnb_data["bid"] + gate_data["bid"]) / 2
     price_diff_pct = (price_diff / avg_price) * 100
 
-    alerts = []
-
-    if bnb_data["spread"] > SPREAD_THRESHOLD:
-        alerts.append(f"Binance spread is high: ${bnb_data['spread']:.4f}")
-    if gate_data["spread"] > SPREAD_THRESHOLD:
-        alerts.append(f"Gate.io spread is high: ${gate_data['spread']:.4f}")
-    if price_diff_pct > PRICE_DIFF_THRESHOLD_PCT:
-        alerts.append(f"Price difference between exchanges is {price_diff_pct:.2f}%")
+    if rules is None:
+        rules = default_rules()
+    # Every rule, so the card lists each condition still holding, not just those a moved quote touches
+    matches = rules.evaluate(pair, quote_fields(bnb_data, gate_data, price_diff_pct))
+    alerts = [match.message for match in matches]
 
     if not alerts:
         print(f"No alerts for {pair}. Spread and price difference within thresholds.")
         return
 
+    evaluated_at = time.time()
+    received = [d["received_at"] for d in (bnb_data, gate_data) if "received_at" in d]
+
     # Compose alert message
     alert_text = f"🚨 Arbitrage Alert for {pair} 🚨\n\n"
     alert_text += f"Binance Bid: ${bnb_data['bid']:.2f}, Ask: ${bnb_data['ask']:.2f}, Spread: ${bnb_data['spread']:.4f}\n"
@@ -95,20 +385,177 @@ def send_alert(client, pair, bnb_data, gate_data):
         "24h Change (Gate.io)": f"{gate_data.get('price_change_24h', 0):.2f}%"
     }
 
-    result = client.send_rich_alert_card(f"Arbitrage Alert: {pair}", card_details, "high")
-    if result['success']:
-        print(f"✅ Alert sent for {pair}")
-    else:
-        print(f"❌ Failed to send alert for {pair}: {result['error']}")
+    # One card per destination, carrying the strongest severity routed there
+    routed = {}
+    for match in matches:
+        routed.setdefault(match.rule.route, []).append(match)
+
+    for route, route_matches in routed.items():
+        ALERTS_RAISED.inc()
+        trace = tracing.AlertTrace(pair, quote_received=min(received) if received else None, route=route)
+        trace.mark("evaluated", evaluated_at)
+        urgency = highest_severity(route_matches)
+        mention_all = any(match.rule.mention == "all" for match in route_matches)
+
+        trace.mark("enqueued")
+        with tracing.activate(trace):
+            result = _client_for_route(client, rules, route).send_rich_alert_card(
+                f"Arbitrage Alert: {pair}", card_details, urgency, mention_all=mention_all)
+        if summary is not None:
+            summary.record_alert(pair, urgency)
+        if result.get('held'):
+            # Delivered at the end of the cycle (see alert_clustering.py), counted and traced there
+            continue
+        trace.finish(success=result['success'], queued=bool(result.get('queued')))
+        count_delivery(result)
+        if result['success']:
+            print(f"✅ Alert {'queued' if result.get('queued') else 'sent'} for {pair}")
+        else:
+            print(f"❌ Failed to send alert for {pair}: {result['error']}")
+
+
+def _record_tick(write, *args):
+    """Run a TickRecorder call; a full disk must not stop the alerts"""
+    try:
+        write(*args)
+    except OSError as e:
+        print(f"❌ Tick recording failed: {e}")
+
+
+def check_pairs(client, pairs, rules=None, recorder=None, summary=None, changes=None, arbitrage=None, funding=None,
+                risk=None, clusterer=None):
+    """
+    One monitor cycle over pairs
+
+    Args:
+        changes: QuoteChanges; pairs whose quotes did not move since the last cycle are skipped
+        arbitrage: ArbitrageGraph fed every market in the bulk quotes
+        funding: FundingMonitor joined with every market in the bulk quotes
+        risk: PortfolioRisk marked from the bulk quotes, before the summary can roll over
+        clusterer: AlertClusterer; spread alerts are held until the end of the cycle and
+            those on correlated pairs sent as one card
+
+    Returns:
+        Binance symbol -> (Binance quote, Gate.io quote) for the pairs that were
+        evaluated, the dirty set downstream detectors can work from
+    """
+    dirty = {}
+    with CYCLE_DURATION.time():
+        book = QuoteBook.fetch() if BULK_QUOTES else None
+        if arbitrage is not None and book is not None:
+            send_opportunities(client, arbitrage.scan_book(book))
+        if funding is not None and book is not None:
+            from funding_monitor import send_funding_alerts
+            send_funding_alerts(client, funding.scan_book(book))
+        if risk is not None and book is not None:
+            from portfolio_risk import send_limit_breaches
+            send_limit_breaches(client, risk, risk.scan_book(book))
+        alert_client = clusterer.begin_cycle(client) if clusterer is not None else client
+        for bnb_sym, gate_sym in pairs:
+            if book is not None:
+                bnb_data = book.binance(bnb_sym)
+                gate_data = book.gateio(gate_sym)
+            else:
+                bnb_data = fetch_binance_price(bnb_sym)
+                gate_data = fetch_gateio_price(gate_sym)
+            if clusterer is not None:
+                # Every pair's move feeds the correlations, alerting or not
+                clusterer.observe_quotes(bnb_sym, bnb_data, gate_data)
+                alert_client.begin_scope(bnb_sym)
+            mask = changes.compare(bnb_sym, bnb_data, gate_data) if changes is not None else ALL_SLOTS
+            if not mask:
+                continue
+            dirty[bnb_sym] = (bnb_data, gate_data)
+            # Only the side that moved is a new tick
+            if mask & BINANCE_SLOTS:
+                if recorder is not None:
+                    _record_tick(recorder.record, bnb_data)
+                if summary is not None:
+                    summary.record_quote(bnb_data)
+            if mask & GATEIO_SLOTS:
+                if recorder is not None:
+                    _record_tick(recorder.record, gate_data)
+                if summary is not None:
+                    summary.record_quote(gate_data)
+            send_alert(alert_client, bnb_sym, bnb_data, gate_data, rules, summary)
+        if clusterer is not None:
+            clusterer.flush(alert_client)
+        if recorder is not None:
+            _record_tick(recorder.flush)
+        if summary is not None:
+            summary.record_cycle()
+            summary.maybe_checkpoint()
+    return dirty
 
 
 def monitor_pairs(pairs):
-    client = LarkGroupChatClient(WEBHOOK_URL)
+    # Goes through alert_relay.py when it is running, directly to Lark otherwise
+    client = RelayClient(WEBHOOK_URL)
+    rules = RuleEngine(RULES_PATH) if RULES_PATH else None
+    budget = MemoryBudget(MEMORY_BUDGET_BYTES, rss_limit_bytes=MEMORY_RSS_LIMIT_BYTES) if MEMORY_BUDGET_BYTES else None
+    if METRICS_PORT:
+        # /debug/memory and /debug/tracemalloc/* for finding growth without a restart
+        start_metrics_server(METRICS_PORT, endpoints=debug_endpoints(budget))
+        print(f"Metrics available at http://127.0.0.1:{METRICS_PORT}/metrics")
+    if TRACE_LOG_PATH:
+        tracing.configure_span_log(TRACE_LOG_PATH, TRACE_SAMPLE_RATE)
+    if CARD_CALLBACK_PORT:
+        callbacks = start_escalations(client, ESCALATION_TIMEOUT_SEC, CARD_CALLBACK_PORT, host=CARD_CALLBACK_HOST,
+                                      verification_token=CARD_CALLBACK_TOKEN)
+        print(f"Card callbacks accepted at {callbacks.url}")
+        if budget is not None:
+            budget.register("closed_alerts", callbacks.tracker, priority=0)
+    recorder = TickRecorder(TICK_RECORD_DIR) if TICK_RECORD_DIR else None
+    changes = QuoteChanges() if SKIP_UNCHANGED else None
+    arbitrage = ArbitrageGraph() if TRIANGULAR_ARBITRAGE else None
+    funding = None
+    if FUNDING_MONITOR:
+        # Imported only when enabled, it needs numpy
+        from funding_monitor import FundingMonitor
+        funding = FundingMonitor()
+    clusterer = None
+    if CLUSTER_ALERTS:
+        try:
+            from alert_clustering import AlertClusterer
+            clusterer = AlertClusterer()
+        except ImportError as e:
+            # Only the clustering needs numpy, alerts go out one per pair without it
+            print(f"❌ Alert clustering disabled, {e} (pip install numpy)")
+    if budget is not None:
+        if changes is not None:
+            budget.register("quote_fingerprints", changes, priority=0)
+        budget.register("rule_index", rules if rules is not None else default_rules(), priority=1)
+    risk = None
+    if POSITIONS_PATH:
+        # Imported only when enabled, it needs numpy
+        from portfolio_risk import PortfolioRisk, MIN_SCENARIOS, backfill_returns
+        risk = PortfolioRisk.load(POSITIONS_PATH, RISK_CHECKPOINT_PATH, sample_interval=CHECK_INTERVAL_SEC)
+        if risk.snapshot().scenarios < MIN_SCENARIOS:
+            print(f"Backfilled {backfill_returns(risk)} rows of returns for VaR")
+    summary = None
+    if SUMMARY_CHECKPOINT_PATH:
+        # Restarts keep the day's totals; the finished day's card goes out at midnight
+        summary = TradingSummary.load(
+            SUMMARY_CHECKPOINT_PATH, max_gap=3 * CHECK_INTERVAL_SEC,
+            on_rollover=lambda day: summary.publish(
+                client, day, extra=risk.summary_fields(day["day"]) if risk is not None else None))
+    health = HealthCollector()
+    if STATUS_CARD_INTERVAL_SEC:
+        health.start_status_cards(client, STATUS_CARD_INTERVAL_SEC, lambda: {
+            "Monitör Edilen Pariteler": str(len(pairs)),
+            # Alerts queued at the relay are counted in its process once delivered
+            "Gönderilen Uyarılar": f"{ALERTS_SENT.value() + ALERTS_QUEUED.value():.0f}"
+        })
+    else:
+        health.start()
     while True:
-        for bnb_sym, gate_sym in pairs:
-            bnb_data = fetch_binance_price(bnb_sym)
-            gate_data = fetch_gateio_price(gate_sym)
-            send_alert(client, bnb_sym, bnb_data, gate_data)
+        if rules is not None and rules.maybe_reload() and changes is not None:
+            # New rules have to see every pair once
+            changes.evict(len(changes))
+        check_pairs(client, pairs, rules, recorder, summary, changes, arbitrage, funding, risk, clusterer)
+        if budget is not None:
+            # Same thread as check_pairs, the caches take no lock
+            budget.check()
         print(f"Waiting {CHECK_INTERVAL_SEC} seconds before next check...")
         time.sleep(CHECK_INTERVAL_SEC)
 
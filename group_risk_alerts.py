@@ -5,15 +5,20 @@ Uses group chat specific features like mentions and rich formatting
 """
 
 import time
-from lark_group_chat import LarkGroupChatClient
+from alert_relay import RelayClient
+from health_collector import HealthCollector
+from trading_summary import TradingSummary, DEFAULT_CHECKPOINT_PATH
 
 # Your group chat webhook URL
 WEBHOOK_URL = "https://open.larksuite.com/open-apis/bot/v2/hook/t-g206787iAEON7GKUSM3H7MEYKICF4OTYVUMQFNBX"
+# Portfolio behind "Günlük Kar/Zarar" and "Risk Seviyesi" (see portfolio_risk.py), None leaves them out
+POSITIONS_PATH = None
 
 def simulate_group_risk_alerts():
     """Simulate risk alerts specifically designed for group chat"""
     
-    client = LarkGroupChatClient(WEBHOOK_URL)
+    client = RelayClient(WEBHOOK_URL)
+    health = HealthCollector(interval=1.0).start()
     
     print("🚨 Starting Group Chat Risk Alert Simulation...\n")
     
@@ -108,15 +113,11 @@ def simulate_group_risk_alerts():
     
     # Scenario 6: System status update
     print("Scenario 6: System status update")
-    system_details = {
-        "Sistem Durumu": "Aktif",
+    system_details = health.status_details({
         "Monitör Edilen Pariteler": "47",
-        "Aktif Uyarılar": "12",
-        "Son Güncelleme": "14:45:22",
-        "CPU Kullanımı": "%23",
-        "Bellek Kullanımı": "%67",
-        "Ağ Gecikmesi": "12ms"
-    }
+        "Aktif Uyarılar": "12"
+    })
+    health.close()
     result = client.send_rich_alert_card("Risk Sistemi Durumu", system_details, "low")
     print(f"Status: {'✅ Success' if result['success'] else '❌ Failed'}")
     
@@ -131,7 +132,7 @@ def send_custom_group_alert(alert_type: str, message: str, urgency: str = "mediu
         message: Alert message
         urgency: Alert urgency level (high, medium, low)
     """
-    client = LarkGroupChatClient(WEBHOOK_URL)
+    client = RelayClient(WEBHOOK_URL)
     
     if urgency == "high":
         result = client.send_urgent_alert(alert_type, message)
@@ -140,22 +141,27 @@ def send_custom_group_alert(alert_type: str, message: str, urgency: str = "mediu
     
     return result
 
-def send_trading_summary():
-    """Send end-of-day trading summary to group"""
-    
-    client = LarkGroupChatClient(WEBHOOK_URL)
-    
-    summary_details = {
-        "Toplam İşlem Hacmi": "$45.2M",
-        "En Aktif Parite": "BTC/USDT",
-        "Günlük Kar/Zarar": "+$12,450",
-        "Risk Uyarıları": "23",
-        "Kritik Uyarılar": "3",
-        "Sistem Uptime": "%99.8",
-        "Ortalama Spread": "%0.12"
-    }
+def send_trading_summary(summary=None, risk=None):
+    """
+    Send end-of-day trading summary to group
+
+    Args:
+        summary: TradingSummary to report, default the checkpoint written by exchange_spread_monitor.py
+        risk: PortfolioRisk for P&L and risk level, default POSITIONS_PATH marked at current prices
+    """
+    
+    client = RelayClient(WEBHOOK_URL)
+    if summary is None:
+        summary = TradingSummary.load(DEFAULT_CHECKPOINT_PATH)
+    if risk is None and POSITIONS_PATH:
+        from exchange_spread_monitor import QuoteBook, RISK_CHECKPOINT_PATH
+        from portfolio_risk import PortfolioRisk
+
+        # The monitor's checkpoint holds the day's open prices and the return history
+        risk = PortfolioRisk.load(POSITIONS_PATH, RISK_CHECKPOINT_PATH)
+        risk.mark_prices(risk.prices_from_book(QuoteBook.fetch()))
     
-    result = client.send_rich_alert_card("Günlük Trading Özeti", summary_details, "low")
+    result = summary.publish(client, extra=risk.summary_fields() if risk is not None else None)
     
     if result['success']:
         print("✅ Daily summary sent to group chat!")
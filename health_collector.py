@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+System Health Collector
+Samples process and host CPU, memory, event-loop (or thread wake-up) lag and
+the exchange and webhook round-trip times in a background thread, and fills
+the "Risk Sistemi Durumu" status card with them.
+
+Host and process figures come from /proc files that stay open between
+samples and are re-read with pread, so a sample costs a few system calls.
+RTTs are the mean of the FETCH_LATENCY / WEBHOOK_LATENCY observations made
+since the previous sample. The collector measures its own CPU time too.
+"""
+
+import argparse
+import datetime
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Callable
+
+from metrics import Gauge, Counter, FETCH_LATENCY, WEBHOOK_LATENCY
+
+EXCHANGES = ("binance", "gateio")
+
+PROCESS_CPU = Gauge("process_cpu_percent", "CPU used by this process, percent of one core")
+PROCESS_RSS = Gauge("process_resident_memory_bytes", "Resident memory of this process")
+HOST_CPU = Gauge("host_cpu_percent", "CPU used on the host, percent of all cores")
+HOST_MEMORY = Gauge("host_memory_percent", "Memory in use on the host, percent")
+LOOP_LAG = Gauge("event_loop_lag_seconds", "Delay before a scheduled callback (or collector wake-up) ran")
+COLLECTOR_CPU = Counter("health_collector_cpu_seconds_total", "CPU time spent by the health collector itself")
+
+
+class _ProcFile:
+    """A /proc file kept open and re-read from offset 0"""
+
+    def __init__(self, path: str):
+        try:
+            self.fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            self.fd = None
+
+    def read(self) -> Optional[bytes]:
+        if self.fd is None:
+            return None
+        return os.pread(self.fd, 8192, 0)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class HealthCollector:
+    """Background sampler of process, host and pipeline health"""
+
+    def __init__(self, interval: float = 5.0):
+        """
+        Initialize the collector
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self._statm = _ProcFile("/proc/self/statm")
+        self._stat = _ProcFile("/proc/stat")
+        self._meminfo = _ProcFile("/proc/meminfo")
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop = None
+        self._loop_lag: Optional[float] = None
+        self._status_card = None
+        self.samples = 0
+        self.self_cpu = 0.0
+        self.started = time.monotonic()
+        self.latest: Dict[str, Any] = {}
+
+        # Previous readings for deltas
+        self._last_wall = time.monotonic()
+        self._last_cpu = self._process_cpu_time()
+        self._last_host = self._host_cpu_times()
+        self._last_rtt = self._rtt_totals()
+
+    @staticmethod
+    def _process_cpu_time() -> float:
+        times = os.times()
+        return times.user + times.system
+
+    def _host_cpu_times(self) -> Optional[tuple]:
+        """(busy, total) jiffies from the first line of /proc/stat"""
+        data = self._stat.read()
+        if not data:
+            return None
+        fields = [int(v) for v in data[:data.index(b"\n")].split()[1:]]
+        # user nice system idle iowait irq softirq steal
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+        total = sum(fields[:8])
+        return total - idle, total
+
+    def _memory(self) -> tuple:
+        """(process RSS bytes, host memory used percent)"""
+        rss = None
+        statm = self._statm.read()
+        if statm:
+            rss = int(statm.split()[1]) * self.page_size
+        used_pct = None
+        meminfo = self._meminfo.read()
+        if meminfo:
+            values = {}
+            for line in meminfo.split(b"\n", 8)[:8]:
+                name, _, rest = line.partition(b":")
+                if rest:
+                    values[name] = int(rest.split()[0])
+            if b"MemTotal" in values and b"MemAvailable" in values:
+                used_pct = 100.0 * (1 - values[b"MemAvailable"] / values[b"MemTotal"])
+        return rss, used_pct
+
+    @staticmethod
+    def _rtt_totals() -> Dict[str, tuple]:
+        totals = {}
+        for exchange in EXCHANGES:
+            snap = FETCH_LATENCY.snapshot(exchange=exchange)
+            totals[exchange] = (snap["count"], snap["sum"])
+        snap = WEBHOOK_LATENCY.snapshot()
+        totals["webhook"] = (snap["count"], snap["sum"])
+        return totals
+
+    def watch_loop(self, loop):
+        """Measure callback lag on an asyncio loop instead of the collector's own wake-up lag"""
+        self._loop = loop
+
+    def _probe_loop(self):
+        scheduled = time.perf_counter()
+
+        def ran():
+            self._loop_lag = time.perf_counter() - scheduled
+
+        try:
+            self._loop.call_soon_threadsafe(ran)
+        except RuntimeError:
+            # The loop was closed
+            self._loop = None
+
+    def sample(self, wake_lag: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Take one sample
+
+        Args:
+            wake_lag: How late the collector thread woke up, used when no loop is watched
+
+        Returns:
+            The sample, also available as .latest
+        """
+        with self._lock:
+            return self._sample(wake_lag)
+
+    def _sample(self, wake_lag: Optional[float]) -> Dict[str, Any]:
+        cpu_start = time.thread_time()
+        now = time.monotonic()
+        wall = max(now - self._last_wall, 1e-9)
+
+        cpu = self._process_cpu_time()
+        process_cpu = 100.0 * (cpu - self._last_cpu) / wall
+
+        host_cpu = None
+        host = self._host_cpu_times()
+        if host and self._last_host and host[1] > self._last_host[1]:
+            host_cpu = 100.0 * (host[0] - self._last_host[0]) / (host[1] - self._last_host[1])
+
+        rss, memory_pct = self._memory()
+
+        rtt = {}
+        totals = self._rtt_totals()
+        for name, (count, total) in totals.items():
+            last_count, last_total = self._last_rtt.get(name, (0, 0.0))
+            if count > last_count:
+                rtt[name] = (total - last_total) / (count - last_count)
+
+        if self._loop is not None:
+            lag = self._loop_lag
+            self._probe_loop()
+        else:
+            lag = wake_lag
+
+        self._last_wall, self._last_cpu, self._last_host, self._last_rtt = now, cpu, host, totals
+
+        sample = {
+            "time": time.time(),
+            "process_cpu_pct": process_cpu,
+            "host_cpu_pct": host_cpu,
+            "rss_bytes": rss,
+            "host_memory_pct": memory_pct,
+            "loop_lag_s": lag,
+            "exchange_rtt_s": {name: rtt[name] for name in EXCHANGES if name in rtt},
+            "webhook_rtt_s": rtt.get("webhook"),
+            "uptime_s": now - self.started
+        }
+        PROCESS_CPU.set(process_cpu)
+        if rss is not None:
+            PROCESS_RSS.set(rss)
+        if host_cpu is not None:
+            HOST_CPU.set(host_cpu)
+        if memory_pct is not None:
+            HOST_MEMORY.set(memory_pct)
+        if lag is not None:
+            LOOP_LAG.set(lag)
+
+        spent = time.thread_time() - cpu_start
+        COLLECTOR_CPU.inc(spent)
+        self.samples += 1
+        self.self_cpu += spent
+        sample["collector_cpu_pct"] = 100.0 * self.self_cpu / max(now - self.started, 1e-9)
+        self.latest = sample
+        return sample
+
+    def _run(self):
+        deadline = time.monotonic() + self.interval
+        cards_due = None
+        while not self._stop.wait(max(0.0, deadline - time.monotonic())):
+            woke = time.monotonic()
+            self.sample(wake_lag=max(0.0, woke - deadline))
+            deadline += self.interval
+            if deadline < woke:
+                # Fell behind (e.g. suspended), don't burst to catch up
+                deadline = woke + self.interval
+            if self._status_card is not None:
+                client, every, extra = self._status_card
+                if cards_due is None or woke >= cards_due:
+                    cards_due = woke + every
+                    self.publish(client, extra() if extra else None)
+
+    def start(self) -> "HealthCollector":
+        """Sample every interval seconds in a daemon thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="health-collector", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        for proc_file in (self._statm, self._stat, self._meminfo):
+            proc_file.close()
+
+    def start_status_cards(self, client, every: float,
+                           extra: Optional[Callable[[], Dict[str, str]]] = None) -> "HealthCollector":
+        """
+        Publish the status card every `every` seconds from the collector thread
+
+        Args:
+            client: LarkGroupChatClient (or compatible) to send with
+            every: Seconds between cards
+            extra: Returns additional card fields, e.g. monitored pairs
+        """
+        self._status_card = (client, every, extra)
+        return self.start()
+
+    def status_details(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Card fields for the latest sample, taking one if there is none yet"""
+        with self._lock:
+            sample = self.latest
+        if not sample:
+            sample = self.sample()
+
+        def pct(value):
+            return f"%{value:.1f}" if value is not None else "-"
+
+        def ms(value):
+            return f"{value * 1000:.0f}ms" if value is not None else "-"
+
+        details = {"Sistem Durumu": "Aktif"}
+        details.update(extra or {})
+        details["Son Güncelleme"] = datetime.datetime.fromtimestamp(sample["time"]).strftime("%H:%M:%S")
+        details["CPU Kullanımı"] = f"{pct(sample['process_cpu_pct'])} (sunucu {pct(sample['host_cpu_pct'])})"
+        rss = f"{sample['rss_bytes'] / 2**20:.0f}MB" if sample["rss_bytes"] is not None else "-"
+        details["Bellek Kullanımı"] = f"{pct(sample['host_memory_pct'])} (süreç {rss})"
+        details["Ağ Gecikmesi"] = ms(sample["webhook_rtt_s"])
+        exchange_rtt = sample["exchange_rtt_s"]
+        details["Borsa Gecikmesi"] = ", ".join(f"{name} {ms(value)}" for name, value in exchange_rtt.items()) or "-"
+        details["Döngü Gecikmesi"] = ms(sample["loop_lag_s"])
+        details["Toplayıcı Maliyeti"] = f"%{sample['collector_cpu_pct']:.3f} CPU"
+        return details
+
+    def publish(self, client, extra: Optional[Dict[str, str]] = None,
+                title: str = "Risk Sistemi Durumu") -> Dict[str, Any]:
+        """Send the status card as a low-urgency rich card"""
+        result = client.send_rich_alert_card(title, self.status_details(extra), "low")
+        if not result['success']:
+            print(f"❌ Failed to send status card: {result['error']}")
+        return result
+
+
+def measure_overhead(samples: int = 10000) -> Dict[str, float]:
+    """CPU cost of one sample, and the resulting share of a core at common intervals"""
+    collector = HealthCollector()
+    collector.sample()
+    start = time.thread_time()
+    for _ in range(samples):
+        collector.sample()
+    per_sample = (time.thread_time() - start) / samples
+    collector.close()
+    return {
+        "sample_us": per_sample * 1e6,
+        "cpu_pct_at_1s": 100.0 * per_sample / 1.0,
+        "cpu_pct_at_5s": 100.0 * per_sample / 5.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print process and host health samples")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between samples")
+    parser.add_argument("--overhead", action="store_true", help="Measure the cost of one sample")
+    args = parser.parse_args()
+
+    if args.overhead:
+        result = measure_overhead()
+        print(f"One sample costs {result['sample_us']:.1f}µs of CPU: "
+              f"%{result['cpu_pct_at_1s']:.4f} of a core at 1s, %{result['cpu_pct_at_5s']:.4f} at 5s")
+        return
+
+    collector = HealthCollector(args.interval).start()
+    try:
+        while True:
+            time.sleep(args.interval)
+            for key, value in collector.status_details().items():
+                print(f"{key}: {value}")
+            print()
+    except KeyboardInterrupt:
+        collector.close()
+
+
+if __name__ == "__main__":
+    main()
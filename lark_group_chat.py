@@ -7,8 +7,14 @@ Supports group mentions, user mentions, and group-specific formatting
 import requests
 import json
 import sys
+import hashlib
+import time
 from typing import Dict, Any, Optional, List
 
+import tracing
+from alert_packer import MAX_BODY_BYTES, pack_text_messages, pack_card_elements, combine_results
+from metrics import WEBHOOK_LATENCY, WEBHOOK_RESPONSES
+
 
 class LarkGroupChatClient:
     """Enhanced client for sending messages to Lark group chats via webhook API"""
@@ -24,6 +30,8 @@ class LarkGroupChatClient:
         self.headers = {
             'Content-Type': 'application/json'
         }
+        # EscalationTracker from alert_callbacks, told about every card with buttons
+        self.escalations = None
     
     def send_text_message(self, text: str) -> Dict[str, Any]:
         """
@@ -101,7 +109,8 @@ class LarkGroupChatClient:
         
         return self._make_request(payload)
     
-    def send_rich_alert_card(self, title: str, details: Dict[str, str], urgency: str = "high") -> Dict[str, Any]:
+    def send_rich_alert_card(self, title: str, details: Dict[str, str], urgency: str = "high",
+                             mention_all: bool = False, alert_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Send a rich card alert suitable for group chats
         
@@ -109,6 +118,9 @@ class LarkGroupChatClient:
             title: Alert title
             details: Dictionary of detail fields
             urgency: Alert urgency level (high, medium, low)
+            mention_all: Whether to mention all users in the card
+            alert_id: ID the buttons send back to the callback server, one per ongoing condition,
+                derived from the title if omitted
             
         Returns:
             Response from the API
@@ -121,11 +133,20 @@ class LarkGroupChatClient:
         }
         
         # Build card elements
-        elements = []
+        leading = []
+        
+        if mention_all:
+            leading.append({
+                "tag": "div",
+                "text": {
+                    "content": "<at id=all></at>",
+                    "tag": "lark_md"
+                }
+            })
         
         # Title with urgency indicator
         urgency_emoji = "🚨" if urgency == "high" else "⚠️" if urgency == "medium" else "ℹ️"
-        elements.append({
+        leading.append({
             "tag": "div",
             "text": {
                 "content": f"{urgency_emoji} **{title}**",
@@ -134,6 +155,7 @@ class LarkGroupChatClient:
         })
         
         # Add details
+        elements = []
         for key, value in details.items():
             elements.append({
                 "tag": "div",
@@ -146,17 +168,19 @@ class LarkGroupChatClient:
         # Add timestamp
         import datetime
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        elements.append({
+        trailing = [{
             "tag": "div",
             "text": {
                 "content": f"**Zaman:** {timestamp}",
                 "tag": "lark_md"
             }
-        })
+        }]
         
         # Add action buttons for high urgency
         if urgency == "high":
-            elements.append({
+            # Derived from the title, so every card for one ongoing condition shares its escalation
+            alert_id = alert_id or hashlib.blake2b(title.encode('utf-8'), digest_size=8).hexdigest()
+            trailing.append({
                 "tag": "action",
                 "actions": [
                     {
@@ -165,7 +189,8 @@ class LarkGroupChatClient:
                             "content": "Acil Müdahale",
                             "tag": "plain_text"
                         },
-                        "type": "danger"
+                        "type": "danger",
+                        "value": {"alert_id": alert_id, "action": "ack"}
                     },
                     {
                         "tag": "button", 
@@ -173,31 +198,43 @@ class LarkGroupChatClient:
                             "content": "Detayları Gör",
                             "tag": "plain_text"
                         },
-                        "type": "primary"
+                        "type": "primary",
+                        "value": {"alert_id": alert_id, "action": "details"}
                     }
                 ]
             })
+            if self.escalations is not None:
+                # Tracked even if the send fails, an alert nobody saw needs escalating most
+                self.escalations.track(alert_id, title, details)
         
-        card_content = {
-            "config": {
-                "wide_screen_mode": True
-            },
-            "header": {
-                "title": {
-                    "content": f"{urgency_emoji} Risk Management Alert",
-                    "tag": "plain_text"
-                },
-                "template": color_map.get(urgency, "blue")
+        header = {
+            "title": {
+                "content": f"{urgency_emoji} Risk Management Alert",
+                "tag": "plain_text"
             },
-            "elements": elements
+            "template": color_map.get(urgency, "blue")
         }
         
-        payload = {
-            "msg_type": "interactive",
-            "card": card_content
-        }
+        # Escaped JSON is at most 6 bytes per character, so cards well under the limit skip measuring
+        upper_bound = 6 * (len(title) + sum(len(key) + len(str(value)) + 64 for key, value in details.items()))
+        if upper_bound < MAX_BODY_BYTES // 2:
+            card_content = {
+                "config": {
+                    "wide_screen_mode": True
+                },
+                "header": header,
+                "elements": leading + elements + trailing
+            }
+            
+            payload = {
+                "msg_type": "interactive",
+                "card": card_content
+            }
+            
+            return self._make_request(payload)
         
-        return self._make_request(payload)
+        # Too many or too long details for one card, split them across as few as fit
+        return self._send_payloads(pack_card_elements(header, elements, leading, trailing))
     
     def send_group_summary(self, alerts: List[Dict[str, str]]) -> Dict[str, Any]:
         """
@@ -209,27 +246,32 @@ class LarkGroupChatClient:
         Returns:
             Response from the API
         """
-        summary_text = "📊 **Risk Alert Summary**\n\n"
-        
+        entries = []
         for i, alert in enumerate(alerts, 1):
             alert_type = alert.get('type', 'Unknown')
             message = alert.get('message', 'No message')
             time = alert.get('time', 'Unknown time')
             
-            summary_text += f"{i}. **{alert_type}**\n"
-            summary_text += f"   {message}\n"
-            summary_text += f"   ⏰ {time}\n\n"
+            entries.append(f"{i}. **{alert_type}**\n   {message}\n   ⏰ {time}")
         
-        summary_text += f"Total Alerts: {len(alerts)}"
-        
-        payload = {
-            "msg_type": "text",
-            "content": {
-                "text": summary_text
-            }
-        }
+        # As many alerts per message as Lark accepts, split in order when a storm doesn't fit in one
+        payloads = pack_text_messages(entries, title="📊 **Risk Alert Summary**",
+                                      footer=f"Total Alerts: {len(alerts)}")
+        return self._send_payloads(payloads)
+    
+    def _send_payloads(self, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Send payloads in order
         
-        return self._make_request(payload)
+        Args:
+            payloads: From alert_packer
+            
+        Returns:
+            Response from the API, combined with combine_results when there are several
+        """
+        if len(payloads) == 1:
+            return self._make_request(payloads[0])
+        return combine_results([self._make_request(payload) for payload in payloads])
     
     def _make_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -241,13 +283,19 @@ class LarkGroupChatClient:
         Returns:
             Response data or error information
         """
+        body = json.dumps(payload).encode('utf-8')
+        tracing.mark("serialized")
+        start = time.perf_counter()
         try:
             response = requests.post(
                 self.webhook_url,
                 headers=self.headers,
-                json=payload,
+                data=body,
                 timeout=30
             )
+            tracing.mark("acked")
+            WEBHOOK_LATENCY.observe(time.perf_counter() - start)
+            WEBHOOK_RESPONSES.inc(status=response.status_code)
             
             # Check if request was successful
             response.raise_for_status()
@@ -262,6 +310,10 @@ class LarkGroupChatClient:
             }
             
         except requests.exceptions.RequestException as e:
+            if 'response' not in locals():
+                # No HTTP answer at all (timeout, connection refused, ...)
+                WEBHOOK_LATENCY.observe(time.perf_counter() - start)
+                WEBHOOK_RESPONSES.inc(status="error")
             return {
                 'success': False,
                 'error': str(e),
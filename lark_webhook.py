@@ -2,28 +2,48 @@
 """
 Lark (Feishu) Webhook API Client
 Script to send messages to Lark via webhook API
+
+Heavy modules (requests, http.client, ssl) are imported on first use so the
+one-shot CLI starts quickly. With a daemon running (--serve), the CLI hands
+messages over a Unix socket to a process that keeps warm connections.
 """
 
-import requests
 import json
+import os
 import sys
 from typing import Dict, Any, Optional
 
+TRANSPORTS = ("requests", "http.client")
+# Per user, and send_via_daemon() only talks to a socket the user owns
+DEFAULT_DAEMON_SOCKET = os.environ.get("LARK_WEBHOOK_SOCKET") or (
+    os.path.join(os.environ["XDG_RUNTIME_DIR"], "lark_webhook.sock") if os.environ.get("XDG_RUNTIME_DIR")
+    else f"/tmp/lark_webhook-{os.getuid() if hasattr(os, 'getuid') else 0}.sock")
+DAEMON_TIMEOUT = 35  # Seconds to wait for the daemon, longer than its own request timeout
+
 
 class LarkWebhookClient:
     """Client for sending messages to Lark via webhook API"""
     
-    def __init__(self, webhook_url: str):
+    def __init__(self, webhook_url: str, transport: str = "requests", daemon_socket: Optional[str] = None):
         """
         Initialize the Lark webhook client
         
         Args:
             webhook_url: The complete webhook URL from Lark
+            transport: "requests", or "http.client" for the lighter standard library transport
+            daemon_socket: Unix socket of a running daemon to send through; sends
+                directly when no daemon answers
         """
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport {transport!r}, expected one of {TRANSPORTS}")
         self.webhook_url = webhook_url
+        self.transport = transport
+        self.daemon_socket = daemon_socket
         self.headers = {
             'Content-Type': 'application/json'
         }
+        self._session = None
+        self._http = None
     
     def send_text_message(self, text: str) -> Dict[str, Any]:
         """
@@ -96,8 +116,23 @@ class LarkWebhookClient:
         Returns:
             Response data or error information
         """
+        if self.daemon_socket:
+            result = send_via_daemon(self.daemon_socket, self.webhook_url, payload)
+            if result is not None:
+                return result
+        if self.transport == "http.client":
+            if self._http is None:
+                self._http = HTTPClientTransport()
+            return self._http.post(self.webhook_url, payload)
+        return self._post_with_requests(payload)
+
+    def _post_with_requests(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send payload with a requests session, kept for connection reuse"""
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
         try:
-            response = requests.post(
+            response = self._session.post(
                 self.webhook_url,
                 headers=self.headers,
                 json=payload,
@@ -129,30 +164,246 @@ class LarkWebhookClient:
                 'status_code': response.status_code if 'response' in locals() else None
             }
 
+class HTTPClientTransport:
+    """Keep-alive webhook poster on the standard library's http.client"""
+
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+        # (scheme, host:port) -> open connection
+        self._connections = {}
+
+    def post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST payload as JSON to url
+
+        Returns:
+            Result dict shaped like LarkWebhookClient's
+        """
+        return self.post_body(url, json.dumps(payload).encode('utf-8'))
+
+    def post_body(self, url: str, body: bytes) -> Dict[str, Any]:
+        """POST an already encoded JSON body to url"""
+        import http.client
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+
+        for attempt in range(2):
+            connection = self._connections.get(key)
+            reused = connection is not None
+            if connection is None:
+                connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+                connection = self._connections[key] = connection_class(parts.netloc, timeout=self.timeout)
+            try:
+                connection.request("POST", path, body, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                self._drop(key)
+                if reused and attempt == 0:
+                    # The server closed an idle keep-alive connection, retry on a new one
+                    continue
+                return {'success': False, 'error': str(e), 'status_code': None}
+            if response.will_close:
+                self._drop(key)
+            break
+
+        if response.status >= 400:
+            return {
+                'success': False,
+                'error': f'{response.status} {response.reason} for url: {url}',
+                'status_code': response.status
+            }
+        try:
+            return {'success': True, 'status_code': response.status, 'data': json.loads(data)}
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': f'Failed to parse JSON response: {str(e)}',
+                'status_code': response.status
+            }
+
+    def _drop(self, key):
+        connection = self._connections.pop(key, None)
+        if connection is not None:
+            connection.close()
+
+    def close(self):
+        for key in list(self._connections):
+            self._drop(key)
+
+
+def send_via_daemon(socket_path: str, webhook_url: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Hand a payload to a running daemon
+
+    Args:
+        socket_path: The daemon's Unix socket
+        webhook_url: Where the daemon should send it
+        payload: The JSON payload
+
+    Returns:
+        The daemon's result, or None if no daemon of this user is listening
+        or it answered without a readable result
+    """
+    import socket
+
+    request = json.dumps({"webhook_url": webhook_url, "payload": payload}).encode('utf-8') + b"\n"
+    try:
+        owner = os.stat(socket_path).st_uid
+        if owner != os.getuid():
+            # Another user could have bound it first to collect webhook URLs
+            print(f"❌ Not using {socket_path}, it belongs to uid {owner}")
+            return None
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(DAEMON_TIMEOUT)
+            sock.connect(socket_path)
+            sock.sendall(request)
+            reply = b""
+            while not reply.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                reply += chunk
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    except OSError as e:
+        # The daemon took the message, it may or may not have been delivered
+        return {'success': False, 'error': f'Daemon error: {str(e)}', 'status_code': None}
+    try:
+        # Empty or cut short: the caller sends directly, a duplicate is better than a lost alert
+        return json.loads(reply)
+    except ValueError:
+        return None
+
+
+class LarkWebhookDaemon:
+    """Long-lived sender that keeps warm connections for one-shot CLI calls"""
+
+    def __init__(self, socket_path: str = DEFAULT_DAEMON_SOCKET, transport: str = "requests"):
+        """
+        Initialize the daemon
+
+        Args:
+            socket_path: Unix socket to listen on, readable by the current user only
+            transport: Transport used for the webhook requests
+        """
+        import socketserver
+        import threading
+
+        self.socket_path = socket_path
+        self.transport = transport
+        self.sent = 0
+        self._clients: Dict[str, tuple] = {}
+        self._clients_lock = threading.Lock()
+        self._lock_type = threading.Lock
+
+        if os.path.exists(socket_path):
+            if send_via_daemon(socket_path, "", {}) is not None:
+                raise RuntimeError(f"A daemon is already listening on {socket_path}")
+            os.unlink(socket_path)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if not line:
+                    return
+                try:
+                    request = json.loads(line)
+                    result = daemon.send(request["webhook_url"], request["payload"])
+                except (ValueError, KeyError) as e:
+                    result = {'success': False, 'error': f'Bad request: {str(e)}', 'status_code': None}
+                self.wfile.write(json.dumps(result).encode('utf-8') + b"\n")
+
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+        old_umask = os.umask(0o077)
+        try:
+            self._server = Server(socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+
+    def send(self, webhook_url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send through the warm client for webhook_url"""
+        if not webhook_url:
+            # Liveness probe
+            return {'success': True, 'status_code': None, 'data': {"sent": self.sent}}
+        with self._clients_lock:
+            entry = self._clients.get(webhook_url)
+            if entry is None:
+                entry = self._clients[webhook_url] = (LarkWebhookClient(webhook_url, self.transport),
+                                                      self._lock_type())
+        client, lock = entry
+        # Connections are not thread-safe, one request per webhook at a time
+        with lock:
+            result = client._make_request(payload)
+        with self._clients_lock:
+            self.sent += 1
+        return result
+
+    def serve_forever(self):
+        import signal
+
+        def stop(signum, frame):
+            raise SystemExit(0)
+
+        signal.signal(signal.SIGTERM, stop)
+        print(f"✅ Lark webhook daemon listening on {self.socket_path} ({self.transport} transport)")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self._server.server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
 
 def main():
     """Main function to demonstrate usage"""
-    
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Send a text message to a Lark webhook")
+    parser.add_argument("webhook_url", nargs="?", help="Lark webhook URL")
+    parser.add_argument("message", nargs="?", default="request example", help="Text to send")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="requests",
+                        help="HTTP transport, http.client starts faster")
+    parser.add_argument("--daemon", nargs="?", const=DEFAULT_DAEMON_SOCKET, metavar="SOCKET",
+                        help="Send through a running daemon (default socket %(const)s, or $LARK_WEBHOOK_SOCKET); "
+                             "sends directly if none is running")
+    parser.add_argument("--serve", nargs="?", const=DEFAULT_DAEMON_SOCKET, metavar="SOCKET",
+                        help="Run the daemon on SOCKET")
+    args = parser.parse_args()
+
+    if args.serve:
+        try:
+            daemon = LarkWebhookDaemon(args.serve, args.transport)
+        except (RuntimeError, OSError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        daemon.serve_forever()
+        return
+
     # Replace with your actual webhook URL
-    webhook_url = "https://open.larksuite.com/open-apis/bot/v2/hook/****"
-    
-    # Check if webhook URL is provided as command line argument
-    if len(sys.argv) > 1:
-        webhook_url = sys.argv[1]
+    webhook_url = args.webhook_url or "https://open.larksuite.com/open-apis/bot/v2/hook/****"
     
     # Check if webhook URL is still placeholder
     if "****" in webhook_url:
         print("Error: Please replace the webhook URL with your actual Lark webhook URL")
-        print("Usage: python lark_webhook.py <webhook_url> [message]")
+        print("Usage: python lark_webhook.py <webhook_url> [message] [--transport http.client] [--daemon [SOCKET]]")
         sys.exit(1)
     
     # Initialize client
-    client = LarkWebhookClient(webhook_url)
-    
-    # Get message from command line or use default
-    message = "request example"
-    if len(sys.argv) > 2:
-        message = sys.argv[2]
+    client = LarkWebhookClient(webhook_url, args.transport, args.daemon or os.environ.get("LARK_WEBHOOK_SOCKET"))
+    message = args.message
     
     # Send the message
     print(f"Sending message: '{message}'")
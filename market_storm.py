@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Synthetic Market Storm Load Generator
+Turns the simulators' fixed scenarios into streams of quotes, trades and
+liquidations at a chosen rate and burst profile. The events drive the real
+detectors and dispatch path into a local mock Lark server:
+- Quotes go through exchange_spread_monitor.send_alert and the daily summary.
+- Trades feed a volume spike detector, the "Volume Spike Alert" scenario.
+- Liquidations feed a rolling liquidation total, the "Likidasyon" scenario.
+Alerts go through RelayClient and an in-process AlertRelay, as in production.
+
+Events are generated open loop: each has the time it was due, and lag is
+measured from then. A pipeline that falls behind shows up as lag, or as
+drops with --overflow drop, rather than as a slower generator.
+
+    python market_storm.py --rate 10000 --burst-factor 5 --profile crash --duration 30
+"""
+
+import argparse
+import contextlib
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+import exchange_spread_monitor
+from alert_relay import AlertRelay, RelayClient, DEFAULT_RATE, DEFAULT_BURST
+from alert_rules import RuleEngine
+from exchange_spread_monitor import BINANCE_SLOTS, GATEIO_SLOTS, CHANGED_FIELDS
+from lark_group_chat import LarkGroupChatClient
+from mock_lark_server import MockLarkServer
+from trading_summary import TradingSummary
+
+DEFAULT_EVENT_RATE = 5000  # Events per second outside bursts
+DEFAULT_BURST_FACTOR = 5.0  # Peak rate is this multiple of the base rate
+DEFAULT_DURATION_SEC = 10.0
+DEFAULT_PAIRS = 50
+EVENT_MIX = (0.7, 0.25, 0.05)  # Share of quotes, trades and liquidations
+GENERATOR_TICK_SEC = 0.002
+MAX_BACKLOG = 100000  # Events queued between generator and detectors
+SPIKE_PERIOD_SEC = 10.0
+SPIKE_LENGTH_SEC = 2.0
+
+QUOTE = 0
+TRADE = 1
+LIQUIDATION = 2
+EVENT_NAMES = ("quotes", "trades", "liquidations")
+
+# Real markets for the first pairs, synthetic ones after them
+MAJOR_PRICES = {"BTC": 64000.0, "ETH": 3100.0, "SOL": 145.0, "XRP": 0.52, "DOGE": 0.12, "BNB": 580.0}
+
+VOLUME_WINDOW_SEC = 1.0  # Trade volume bucket, seconds
+VOLUME_SPIKE_FACTOR = 3.5  # Bucket volume over the baseline that raises "Volume Spike Alert"
+VOLUME_BASELINE_ALPHA = 0.2  # EWMA weight of the newest bucket
+LIQUIDATION_WINDOW_SEC = 300.0  # "Son 5 dakikada"
+LIQUIDATION_THRESHOLD_USD = 2500000.0
+LIQUIDATION_COOLDOWN_SEC = 60.0
+
+
+def profile_spikes(t: float, duration: float) -> float:
+    """Storm intensity: SPIKE_LENGTH_SEC bursts every SPIKE_PERIOD_SEC"""
+    return 1.0 if t % SPIKE_PERIOD_SEC < SPIKE_LENGTH_SEC else 0.0
+
+
+def profile_crash(t: float, duration: float) -> float:
+    """Storm intensity: calm, a sharp sell-off at 20% of the run, then a slow recovery"""
+    start, peak = 0.2 * duration, 0.3 * duration
+    if t < start:
+        return 0.0
+    if t < peak:
+        return (t - start) / (peak - start)
+    return math.exp(-(t - peak) / (0.15 * duration))
+
+
+PROFILES = {
+    "steady": lambda t, duration: 0.0,
+    "spikes": profile_spikes,
+    "crash": profile_crash
+}
+
+
+class SyntheticMarket:
+    """
+    Random-walk markets for the event streams
+
+    Binance leads and Gate.io follows with a lag. Storm intensity adds
+    volatility, a downward drift, a slower Gate.io, wider spreads, bigger
+    trades and more liquidations.
+    """
+
+    def __init__(self, pairs: int = DEFAULT_PAIRS, mix: Tuple[float, float, float] = EVENT_MIX, seed: int = 0):
+        self.random = np.random.default_rng(seed)
+        bases = list(MAJOR_PRICES)[:pairs] + [f"SYN{i}" for i in range(max(0, pairs - len(MAJOR_PRICES)))]
+        self.symbols = [(f"{base}USDT", f"{base}_USDT") for base in bases]
+        prices = [MAJOR_PRICES.get(base) for base in bases]
+        synthetic = np.exp(self.random.uniform(math.log(0.01), math.log(1000.0), len(bases)))
+        self.binance = np.array([p if p else s for p, s in zip(prices, synthetic)])
+        self.gateio = self.binance.copy()
+        self.mix = np.cumsum(mix) / sum(mix)
+
+    def step(self, dt: float, intensity: float):
+        """Move every market forward by dt seconds"""
+        sigma = 0.0005 + 0.01 * intensity  # per sqrt(second)
+        drift = -0.02 * intensity  # per second
+        shocks = self.random.standard_normal(len(self.binance)) * sigma * math.sqrt(dt) + drift * dt
+        self.binance *= np.exp(shocks)
+        follow = min(1.0, dt / (0.05 + 2.0 * intensity))
+        self.gateio += (self.binance - self.gateio) * follow
+
+    def events(self, count: int, start: float, end: float, intensity: float) -> List[tuple]:
+        """
+        count events due evenly between start and end (perf_counter seconds)
+
+        Returns:
+            Tuples (kind, due, pair, ...):
+            QUOTE (exchange 0 Binance / 1 Gate.io, bid, ask),
+            TRADE (price, notional, buy),
+            LIQUIDATION (notional, long)
+        """
+        rng = self.random
+        kinds = np.searchsorted(self.mix, rng.random(count), side="right").tolist()
+        pairs = rng.integers(0, len(self.symbols), count)
+        due = np.linspace(start, end, count, endpoint=False).tolist()
+        venues = rng.integers(0, 2, count)
+        mids = np.where(venues == 0, self.binance[pairs], self.gateio[pairs])
+        half_spread = mids * (1e-6 + 5e-5 * intensity) * (1.0 + rng.random(count))
+        notionals = rng.lognormal(math.log(2000.0 * (1.0 + 20.0 * intensity)), 1.0, count)
+        sides = (rng.random(count) < 0.5 - 0.4 * intensity).tolist()
+
+        pairs, venues = pairs.tolist(), venues.tolist()
+        bids, asks = (mids - half_spread).tolist(), (mids + half_spread).tolist()
+        prices, notionals = mids.tolist(), notionals.tolist()
+        events = []
+        for i in range(count):
+            kind = kinds[i]
+            if kind == QUOTE:
+                events.append((QUOTE, due[i], pairs[i], venues[i], bids[i], asks[i]))
+            elif kind == TRADE:
+                events.append((TRADE, due[i], pairs[i], prices[i], notionals[i], sides[i]))
+            else:
+                events.append((LIQUIDATION, due[i], pairs[i], notionals[i] * 50, not sides[i]))
+        return events
+
+
+class EventQueue:
+    """Bounded queue of event batches between the generator and the detectors"""
+
+    def __init__(self, capacity: int = MAX_BACKLOG, drop: bool = False):
+        """
+        Args:
+            capacity: Events queued before the generator blocks or drops
+            drop: Drop events that do not fit instead of waiting for room
+        """
+        self.capacity = capacity
+        self.drop = drop
+        self.size = 0
+        self.high_water = 0
+        self.dropped = 0
+        self.blocked_sec = 0.0
+        self.closed = False
+        self._batches = deque()
+        self._condition = threading.Condition()
+
+    def put(self, events: List[tuple]):
+        with self._condition:
+            if self.size + len(events) > self.capacity:
+                if self.drop:
+                    room = max(0, self.capacity - self.size)
+                    self.dropped += len(events) - room
+                    events = events[:room]
+                else:
+                    start = time.perf_counter()
+                    while self.size + len(events) > self.capacity and self.size:
+                        self._condition.wait()
+                    self.blocked_sec += time.perf_counter() - start
+            if events:
+                self._batches.append(events)
+                self.size += len(events)
+                self.high_water = max(self.high_water, self.size)
+                self._condition.notify_all()
+
+    def get(self) -> Optional[List[tuple]]:
+        """Next batch, None once closed and empty"""
+        with self._condition:
+            while not self._batches and not self.closed:
+                self._condition.wait()
+            if not self._batches:
+                return None
+            events = self._batches.popleft()
+            self.size -= len(events)
+            self._condition.notify_all()
+            return events
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class VolumeSpikeDetector:
+    """Trade volume per pair and bucket against an EWMA baseline"""
+
+    def __init__(self, client, window: float = VOLUME_WINDOW_SEC, factor: float = VOLUME_SPIKE_FACTOR):
+        self.client = client
+        self.window = window
+        self.factor = factor
+        self.alerts = 0
+        self._bucket: Dict[str, int] = {}
+        self._volume: Dict[str, float] = {}
+        self._baseline: Dict[str, float] = {}
+        self._alerted: Dict[str, int] = {}
+
+    def add(self, pair: str, notional: float, ts: float):
+        bucket = int(ts // self.window)
+        current = self._bucket.get(pair)
+        if current != bucket:
+            if current is not None:
+                volume = self._volume[pair] if bucket == current + 1 else 0.0
+                baseline = self._baseline.get(pair)
+                self._baseline[pair] = volume if baseline is None else (
+                    baseline + VOLUME_BASELINE_ALPHA * (volume - baseline))
+            self._bucket[pair] = bucket
+            self._volume[pair] = 0.0
+        self._volume[pair] += notional
+
+        baseline = self._baseline.get(pair)
+        if baseline and self._volume[pair] > self.factor * baseline and self._alerted.get(pair) != bucket:
+            self._alerted[pair] = bucket
+            self.alerts += 1
+            volume = self._volume[pair]
+            self.client.send_rich_alert_card("Volume Spike Alert", {
+                "Parite": pair,
+                "Hacim Artışı": f"%{volume / baseline * 100:.0f}",
+                f"{self.window:.0f}s Hacim": f"${volume:,.0f}",
+                "Ortalama Hacim": f"${baseline:,.0f}",
+                "Durum": "Anormal Aktivite Tespit Edildi",
+                "Önerilen Aksiyon": "Manuel İnceleme"
+            }, "high")
+
+
+class LiquidationDetector:
+    """Liquidated notional over a sliding window, across all pairs"""
+
+    def __init__(self, client, window: float = LIQUIDATION_WINDOW_SEC,
+                 threshold: float = LIQUIDATION_THRESHOLD_USD, cooldown: float = LIQUIDATION_COOLDOWN_SEC):
+        self.client = client
+        self.window = window
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.alerts = 0
+        self.total = 0.0
+        self._events = deque()
+        self._last_alert = -math.inf
+
+    def add(self, notional: float, ts: float):
+        self._events.append((ts, notional))
+        self.total += notional
+        while self._events[0][0] <= ts - self.window:
+            self.total -= self._events.popleft()[1]
+        if self.total >= self.threshold and ts - self._last_alert >= self.cooldown:
+            self._last_alert = ts
+            self.alerts += 1
+            self.client.send_urgent_alert(
+                "LİKİDASYON",
+                f"💥 Son {self.window / 60:.0f} dakikada ${self.total / 1e6:,.1f}M değerinde pozisyon tasfiye edildi!")
+
+
+class _TimedSends:
+    """Counts alert submissions and how long each one blocked the detectors"""
+
+    def _make_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = super()._make_request(payload)
+        self.send_latencies.append(time.perf_counter() - start)
+        if not result['success']:
+            self.send_failures += 1
+        return result
+
+
+class TimedRelayClient(_TimedSends, RelayClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.send_latencies: List[float] = []
+        self.send_failures = 0
+
+
+class TimedDirectClient(_TimedSends, LarkGroupChatClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.send_latencies: List[float] = []
+        self.send_failures = 0
+
+
+class StormDetectors:
+    """The detectors one monitor process would run, fed event by event"""
+
+    def __init__(self, client, market: SyntheticMarket, rules=None):
+        self.client = client
+        self.symbols = market.symbols
+        self.rules = rules
+        self.summary = TradingSummary()
+        self.volume = VolumeSpikeDetector(client)
+        self.liquidations = LiquidationDetector(client)
+        self.processed = [0, 0, 0]
+        self.lags: List[float] = []
+        self._quotes: Dict[int, list] = {}
+
+    def process(self, events: List[tuple]):
+        now = time.time
+        perf = time.perf_counter
+        for event in events:
+            kind = event[0]
+            if kind == QUOTE:
+                self._quote(event, now())
+            elif kind == TRADE:
+                self.volume.add(self.symbols[event[2]][0], event[4], event[1])
+            else:
+                self.liquidations.add(event[3], event[1])
+            self.processed[kind] += 1
+            self.lags.append(perf() - event[1])
+
+    def _quote(self, event: tuple, received_at: float):
+        _, _, pair, venue, bid, ask = event
+        bnb_sym, gate_sym = self.symbols[pair]
+        if venue == 0:
+            quote = {"exchange": "Binance", "symbol": bnb_sym, "bid": bid, "ask": ask,
+                     "spread": ask - bid, "received_at": received_at}
+        else:
+            quote = {"exchange": "Gate.io", "symbol": gate_sym, "bid": bid, "ask": ask,
+                     "spread": ask - bid, "received_at": received_at}
+        self.summary.record_quote(quote, received_at)
+        quotes = self._quotes.setdefault(pair, [None, None])
+        quotes[venue] = quote
+        if quotes[0] is not None and quotes[1] is not None:
+            changed = CHANGED_FIELDS[BINANCE_SLOTS if venue == 0 else GATEIO_SLOTS]
+            exchange_spread_monitor.send_alert(self.client, bnb_sym, quotes[0], quotes[1], self.rules,
+                                               self.summary, changed)
+
+    @property
+    def spread_alerts(self) -> int:
+        return self.summary.alerts
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = np.sort(np.asarray(values))
+    result = {f"p{name}_ms": round(float(ordered[min(len(ordered) - 1, int(q * len(ordered)))]) * 1000, 3)
+              for name, q in (("50", 0.5), ("99", 0.99), ("999", 0.999))}
+    result["max_ms"] = round(float(ordered[-1]) * 1000, 3)
+    return result
+
+
+def run_storm(rate: float = DEFAULT_EVENT_RATE, duration: float = DEFAULT_DURATION_SEC, profile: str = "spikes",
+              burst_factor: float = DEFAULT_BURST_FACTOR, pairs: int = DEFAULT_PAIRS,
+              mix: Tuple[float, float, float] = EVENT_MIX, overflow: str = "block", backlog: int = MAX_BACKLOG,
+              relay_rate: float = DEFAULT_RATE, relay_burst: float = DEFAULT_BURST, direct: bool = False,
+              lark_latency: float = 0.0, lark_error_rate: float = 0.0, lark_rate_limit: int = 0,
+              rules_path: Optional[str] = None, drain_timeout: float = 5.0, seed: int = 0) -> Dict[str, Any]:
+    """
+    Run one storm through the detectors into a mock Lark server
+
+    Args:
+        rate: Events per second outside bursts
+        duration: Seconds of events
+        profile: Key of PROFILES
+        burst_factor: Event rate at full storm intensity, as a multiple of rate
+        pairs: Markets to simulate
+        mix: Share of quotes, trades and liquidations
+        overflow: "block" the generator or "drop" events when backlog is full
+        backlog: Events queued between generator and detectors
+        relay_rate: Relay messages per second per webhook
+        relay_burst: Relay back-to-back messages per webhook
+        direct: Send to the mock server synchronously instead of through the relay
+        lark_latency: Mock Lark seconds per response
+        lark_error_rate: Mock Lark fraction of HTTP 500 answers
+        lark_rate_limit: Mock Lark requests per second before HTTP 429
+        rules_path: Alert rules for send_alert, default the monitor's thresholds
+        drain_timeout: Seconds the relay may keep delivering after the run
+        seed: Random seed for the markets
+
+    Returns:
+        Event counts and rates, detection lag percentiles, alerts per
+        detector, alert submit latency, relay and mock Lark statistics
+    """
+    intensity_of = PROFILES[profile]
+    market = SyntheticMarket(pairs, mix, seed)
+    queue = EventQueue(backlog, drop=overflow == "drop")
+    rules = RuleEngine(rules_path) if rules_path else None
+    socket_path = os.path.join(tempfile.mkdtemp(), "relay.sock")
+    generated = [0]
+    peak_rate = [0.0]
+
+    def generate(start: float):
+        emitted = 0.0
+        owed = 0.0
+        last = 0.0
+        while last < duration:
+            time.sleep(GENERATOR_TICK_SEC)
+            now = min(time.perf_counter() - start, duration)
+            dt = now - last
+            intensity = intensity_of((last + now) / 2, duration)
+            event_rate = rate * (1.0 + (burst_factor - 1.0) * intensity)
+            peak_rate[0] = max(peak_rate[0], event_rate)
+            owed += event_rate * dt
+            count = int(owed - emitted)
+            market.step(dt, intensity)
+            if count:
+                queue.put(market.events(count, start + last, start + now, intensity))
+                emitted += count
+            last = now
+        generated[0] = int(emitted)
+        queue.close()
+
+    with MockLarkServer(latency=lark_latency, error_rate=lark_error_rate, rate_limit=lark_rate_limit) as lark:
+        relay = None
+        if direct:
+            client = TimedDirectClient(lark.url)
+        else:
+            relay = AlertRelay(socket_path, http_port=0, rate=relay_rate, burst=relay_burst, quiet=True).start()
+            client = TimedRelayClient(lark.url, socket_path, fallback=False)
+        detectors = StormDetectors(client, market, rules)
+
+        start = time.perf_counter()
+        generator = threading.Thread(target=generate, args=(start,), daemon=True)
+        # send_alert prints every evaluation, far too much output at these rates
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+            generator.start()
+            while True:
+                events = queue.get()
+                if events is None:
+                    break
+                detectors.process(events)
+            elapsed = time.perf_counter() - start
+            generator.join()
+            relay_stats = None
+            if relay is not None:
+                client.close()
+                at_end = relay.stats()
+                relay.stop(drain_timeout)
+                relay_stats = relay.stats()
+                relay_stats["pending_at_end"] = at_end["pending"]
+                # stop() discards whatever the drain timeout did not deliver
+                drained = relay_stats["sent"] + relay_stats["failed"] - at_end["sent"] - at_end["failed"]
+                relay_stats["discarded"] = max(0, at_end["pending"] - drained)
+        lark_received = len(lark.received)
+        lark_status = {str(status): count for status, count in lark.status_counts.items()}
+
+    processed = sum(detectors.processed)
+    return {
+        "profile": profile,
+        "target_rate": rate,
+        "peak_target_rate": peak_rate[0],
+        "duration_s": duration,
+        "generated": generated[0],
+        "processed": processed,
+        "processed_by_kind": dict(zip(EVENT_NAMES, detectors.processed)),
+        "dropped": queue.dropped,
+        "events_per_sec": round(processed / elapsed, 1),
+        "backlog_high_water": queue.high_water,
+        "generator_blocked_s": round(queue.blocked_sec, 3),
+        "lag": _percentiles(detectors.lags),
+        "alerts": {"spread": detectors.spread_alerts, "volume_spike": detectors.volume.alerts,
+                   "liquidation": detectors.liquidations.alerts},
+        "alert_submit": dict(_percentiles(client.send_latencies), sent=len(client.send_latencies),
+                             failed=client.send_failures),
+        "relay": relay_stats,
+        "lark_requests": lark_received,
+        "lark_status_counts": lark_status
+    }
+
+
+def print_report(result: Dict[str, Any]):
+    """Human-readable summary of a run_storm result"""
+    lag = result["lag"]
+    print(f"Profile {result['profile']}: target {result['target_rate']:,.0f}/s, "
+          f"peak {result['peak_target_rate']:,.0f}/s for {result['duration_s']}s")
+    print(f"Events: generated {result['generated']:,}, processed {result['processed']:,} "
+          f"({result['events_per_sec']:,.0f}/s), dropped {result['dropped']:,}")
+    print(f"  by kind: {result['processed_by_kind']}")
+    print(f"Backlog high water {result['backlog_high_water']:,}, generator blocked {result['generator_blocked_s']}s")
+    if lag:
+        print(f"Detection lag: p50 {lag['p50_ms']}ms, p99 {lag['p99_ms']}ms, "
+              f"p99.9 {lag['p999_ms']}ms, max {lag['max_ms']}ms")
+    print(f"Alerts raised: {result['alerts']}")
+    submit = result["alert_submit"]
+    if submit.get("sent"):
+        print(f"Alert submit: {submit['sent']:,} sends, {submit['failed']:,} failed, "
+              f"p50 {submit['p50_ms']}ms, p99 {submit['p99_ms']}ms, max {submit['max_ms']}ms")
+    relay = result["relay"]
+    if relay:
+        print(f"Relay: accepted {relay['accepted']:,}, duplicate {relay['duplicate']:,}, "
+              f"coalesced {relay['coalesced']:,}, shed {relay['shed']:,}, sent {relay['sent']:,} "
+              f"in {relay['batches']:,} requests")
+        print(f"  {relay['pending_at_end']:,} queued when the events ended, "
+              f"{relay['discarded']:,} still undelivered after the drain timeout")
+        for urgency in ("high", "medium", "low"):
+            if f"latency_{urgency}_p50_s" in relay:
+                print(f"  {urgency:<6} delivery p50 {relay[f'latency_{urgency}_p50_s'] * 1000:,.0f}ms, "
+                      f"p99 {relay[f'latency_{urgency}_p99_s'] * 1000:,.0f}ms")
+    print(f"Mock Lark: {result['lark_requests']:,} requests, status codes {result['lark_status_counts']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic market storm through the real detectors and relay")
+    parser.add_argument("--rate", type=float, default=DEFAULT_EVENT_RATE, help="events per second outside bursts")
+    parser.add_argument("--burst-factor", type=float, default=DEFAULT_BURST_FACTOR,
+                        help="peak rate as a multiple of --rate")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="spikes")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_SEC, help="seconds")
+    parser.add_argument("--pairs", type=int, default=DEFAULT_PAIRS)
+    parser.add_argument("--mix", default=",".join(str(share) for share in EVENT_MIX),
+                        help="shares of quotes,trades,liquidations")
+    parser.add_argument("--overflow", choices=("block", "drop"), default="block",
+                        help="what the generator does when the backlog is full")
+    parser.add_argument("--backlog", type=int, default=MAX_BACKLOG, help="events queued before --overflow applies")
+    parser.add_argument("--relay-rate", type=float, default=DEFAULT_RATE, help="relay messages per second")
+    parser.add_argument("--relay-burst", type=float, default=DEFAULT_BURST)
+    parser.add_argument("--direct", action="store_true", help="send to the mock server without the relay")
+    parser.add_argument("--lark-latency", type=float, default=0.0, help="mock Lark seconds per response")
+    parser.add_argument("--lark-error-rate", type=float, default=0.0, help="mock Lark fraction of HTTP 500")
+    parser.add_argument("--lark-rate-limit", type=int, default=0, help="mock Lark requests per second before 429")
+    parser.add_argument("--rules", help="alert rules file for send_alert")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mix = tuple(float(share) for share in args.mix.split(","))
+    if len(mix) != 3:
+        parser.error("--mix needs three shares")
+    result = run_storm(args.rate, args.duration, args.profile, args.burst_factor, args.pairs, mix,
+                       args.overflow, args.backlog, args.relay_rate, args.relay_burst, args.direct,
+                       args.lark_latency, args.lark_error_rate, args.lark_rate_limit, args.rules,
+                       seed=args.seed)
+    print_report(result)
+
+
+if __name__ == "__main__":
+    main()
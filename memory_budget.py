@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Memory Budget and Diagnostics
+Keeps long-running monitors at a flat footprint. Caches, histories and
+queues register with a MemoryBudget. Each one reports its item count and
+can evict its least valuable items. When their estimated total goes over
+the budget, structures are evicted in priority order down to the low-water
+mark, and producers can check under_pressure to shed new work.
+
+A registered structure implements:
+    __len__()        items held
+    evict(count)     drop up to count items, oldest or least valuable first; returns how many
+    sample(count)    up to count items, used to estimate bytes per item
+
+Memory nobody registered is found with MemoryDiagnostics, which takes
+tracemalloc snapshots on demand and diffs them, served on the metrics
+port under /debug/ (see debug_endpoints).
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+from metrics import Counter, Gauge
+
+DEFAULT_BUDGET_BYTES = 256 * 2**20  # Registered structures, estimated
+LOW_WATER = 0.8  # Evictions bring the total down to this share of the budget
+CHECK_INTERVAL_SEC = 30.0
+SAMPLE_ITEMS = 32  # Items sampled per structure and check to estimate their size
+TRACEMALLOC_FRAMES = 10
+DEFAULT_TOP = 25
+
+MEMORY_ESTIMATED = Gauge("memory_budget_estimated_bytes", "Estimated bytes held by a registered structure",
+                         ["structure"])
+MEMORY_EVICTIONS = Counter("memory_budget_evictions_total", "Items evicted to stay under the memory budget",
+                           ["structure"])
+MEMORY_PRESSURE = Gauge("memory_budget_pressure", "1 while over the memory budget or RSS limit")
+
+
+def deep_sizeof(obj: Any, _seen: Optional[set] = None) -> int:
+    """Bytes of obj and the containers, strings and numbers it references"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, _seen) + deep_sizeof(value, _seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, _seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), _seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, slot), _seen) for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
+
+
+def process_rss() -> Optional[int]:
+    """Resident memory of this process in bytes, None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _load_malloc_trim() -> Optional[Callable[[int], int]]:
+    name = ctypes.util.find_library("c")
+    try:
+        return ctypes.CDLL(name).malloc_trim if name else None
+    except (OSError, AttributeError):
+        return None
+
+
+_malloc_trim = _load_malloc_trim()
+
+
+def release_free_memory():
+    """Hand freed heap pages back to the OS (glibc only), so RSS drops after evictions"""
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+
+class _Entry:
+    def __init__(self, name: str, managed, priority: int, min_items: int):
+        self.name = name
+        self.managed = managed
+        self.priority = priority
+        self.min_items = min_items
+        self.items = 0
+        self.item_bytes = 0.0
+        self.evicted = 0
+
+    def measure(self) -> float:
+        self.items = len(self.managed)
+        if self.items:
+            sample = self.managed.sample(SAMPLE_ITEMS)
+            if sample:
+                self.item_bytes = sum(deep_sizeof(item) for item in sample) / len(sample)
+        MEMORY_ESTIMATED.set(self.bytes, structure=self.name)
+        return self.bytes
+
+    @property
+    def bytes(self) -> float:
+        return self.items * self.item_bytes
+
+
+class MemoryBudget:
+    """Evicts registered structures to keep their estimated total under a budget"""
+
+    def __init__(self, limit_bytes: int = DEFAULT_BUDGET_BYTES, low_water: float = LOW_WATER,
+                 rss_limit_bytes: Optional[int] = None):
+        """
+        Initialize the budget
+
+        Args:
+            limit_bytes: Estimated bytes all registered structures may hold
+            low_water: Share of limit_bytes evictions bring the total down to
+            rss_limit_bytes: Process RSS above which under_pressure is set even
+                if the registered structures are within budget, None disables
+        """
+        self.limit_bytes = limit_bytes
+        self.low_water = low_water
+        self.rss_limit_bytes = rss_limit_bytes
+        self.checks = 0
+        self.last_rss: Optional[int] = None
+        self._entries: Dict[str, _Entry] = {}
+        self._pressure = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, managed, priority: int = 0, min_items: int = 0):
+        """
+        Track a structure
+
+        Args:
+            name: Label in stats and metrics, unique
+            managed: Object with __len__, evict(count) and sample(count)
+            priority: Lower priorities are evicted first
+            min_items: Never evict below this many items
+        """
+        with self._lock:
+            if name in self._entries:
+                raise ValueError(f"{name} is already registered")
+            self._entries[name] = _Entry(name, managed, priority, min_items)
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._entries.pop(name, None)
+
+    @property
+    def under_pressure(self) -> bool:
+        """True while the last check left the budget (or RSS limit) exceeded, e.g. nothing left to evict"""
+        return self._pressure
+
+    def check(self) -> int:
+        """
+        Measure every structure and evict while over the budget
+
+        Call it from the thread that uses unlocked structures, e.g. once per
+        monitor cycle, or start() a thread when they lock themselves.
+
+        Returns:
+            Number of items evicted
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+            total = sum(entry.measure() for entry in entries)
+            evicted = 0
+            if total > self.limit_bytes:
+                excess = total - self.low_water * self.limit_bytes
+                # Cheapest to lose first, and the biggest among equals
+                for entry in sorted(entries, key=lambda e: (e.priority, -e.bytes)):
+                    if excess <= 0:
+                        break
+                    removable = entry.items - entry.min_items
+                    if removable <= 0 or entry.item_bytes <= 0:
+                        continue
+                    count = entry.managed.evict(min(removable, math.ceil(excess / entry.item_bytes)))
+                    entry.evicted += count
+                    evicted += count
+                    excess -= count * entry.item_bytes
+                    MEMORY_EVICTIONS.inc(count, structure=entry.name)
+                    entry.measure()
+                if evicted:
+                    release_free_memory()
+                total = sum(entry.bytes for entry in entries)
+            self.checks += 1
+            self.last_rss = process_rss()
+            over_rss = self.rss_limit_bytes is not None and self.last_rss is not None and \
+                self.last_rss > self.rss_limit_bytes
+            pressure = total > self.limit_bytes or over_rss
+            if over_rss and not self._pressure:
+                held = sum(entry.bytes for entry in entries)
+                print(f"❌ RSS {self.last_rss / 2**20:.0f}MB is over {self.rss_limit_bytes / 2**20:.0f}MB "
+                      f"while registered structures hold {held / 2**20:.1f}MB, "
+                      f"see /debug/tracemalloc/diff for where it goes")
+            self._pressure = pressure
+            MEMORY_PRESSURE.set(1 if pressure else 0)
+        return evicted
+
+    def usage(self) -> Dict[str, Dict[str, Any]]:
+        """Items, estimated bytes and evictions per structure, as of the last check"""
+        with self._lock:
+            return {entry.name: {"items": entry.items, "bytes": round(entry.bytes), "item_bytes": round(entry.item_bytes),
+                                 "priority": entry.priority, "evicted": entry.evicted}
+                    for entry in self._entries.values()}
+
+    def stats(self) -> Dict[str, Any]:
+        """Budget, totals and per-structure usage"""
+        usage = self.usage()
+        return {
+            "limit_bytes": self.limit_bytes,
+            "estimated_bytes": sum(entry["bytes"] for entry in usage.values()),
+            "rss_bytes": self.last_rss,
+            "rss_limit_bytes": self.rss_limit_bytes,
+            "under_pressure": self._pressure,
+            "checks": self.checks,
+            "structures": usage
+        }
+
+    def start(self, interval: float = CHECK_INTERVAL_SEC) -> "MemoryBudget":
+        """Check from a background thread every interval seconds"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"❌ Memory budget check failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+class MemoryDiagnostics:
+    """On-demand tracemalloc snapshots, diffed against a baseline"""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+
+    def start(self, frames: int = TRACEMALLOC_FRAMES) -> Dict[str, Any]:
+        """Start tracing allocations and take the baseline"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._baseline = self._snapshot()
+            self._baseline_at = time.time()
+            return {"tracing": True, "frames": tracemalloc.get_traceback_limit(), "baseline_at": self._baseline_at}
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop tracing and drop the snapshots, tracing slows every allocation"""
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+            self._baseline_at = None
+            return {"tracing": False}
+
+    def snapshot(self, top: int = DEFAULT_TOP, key: str = "lineno") -> Dict[str, Any]:
+        """
+        Largest allocation sites now, and make this the new baseline
+
+        Args:
+            top: Sites to return
+            key: "lineno", "filename" or "traceback"
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return {"tracing": False, "error": "tracemalloc is not running, call start first"}
+            snapshot = self._snapshot()
+            self._baseline = snapshot
+            self._baseline_at = time.time()
+            traced, peak = tracemalloc.get_traced_memory()
+            return {
+                "tracing": True,
+                "traced_bytes": traced,
+                "peak_bytes": peak,
+                "top": [_format_stat(stat, key) for stat in snapshot.statistics(key)[:top]]
+            }
+
+    def diff(self, top: int = DEFAULT_TOP, key: str = "lineno", reset: bool = False) -> Dict[str, Any]:
+        """
+        Allocation sites that grew most since the baseline
+
+        Args:
+            top: Sites to return
+            key: "lineno", "filename" or "traceback"
+            reset: Make this snapshot the new baseline
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._baseline is None:
+                return {"tracing": tracemalloc.is_tracing(), "error": "no baseline, call start first"}
+            snapshot = self._snapshot()
+            stats = snapshot.compare_to(self._baseline, key)
+            result = {
+                "tracing": True,
+                "since_s": round(time.time() - self._baseline_at, 1),
+                "growth_bytes": sum(stat.size_diff for stat in stats),
+                "top": [_format_stat(stat, key) for stat in stats[:top]]
+            }
+            if reset:
+                self._baseline = snapshot
+                self._baseline_at = time.time()
+            return result
+
+
+def _format_stat(stat, key: str) -> Dict[str, Any]:
+    if key == "traceback":
+        where = stat.traceback.format()
+    elif key == "filename":
+        where = stat.traceback[0].filename
+    else:
+        where = str(stat.traceback[0])
+    entry = {"where": where, "bytes": stat.size, "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        entry["bytes_diff"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+def debug_endpoints(budget: Optional[MemoryBudget] = None,
+                    diagnostics: Optional[MemoryDiagnostics] = None) -> Dict[str, Callable]:
+    """
+    Routes for start_metrics_server(endpoints=...)
+
+    GET  /debug/memory                budget usage and RSS
+    GET  /debug/tracemalloc/diff      growth since the baseline (?top=25&key=lineno)
+    POST /debug/tracemalloc/start     start tracing (?frames=10) and take the baseline
+    POST /debug/tracemalloc/snapshot  largest allocation sites (?top=25&key=lineno), new baseline
+    POST /debug/tracemalloc/diff      growth since the baseline, &reset=1 makes it the new one
+    POST /debug/tracemalloc/stop      stop tracing
+
+    Routes that change state are keyed "POST <path>". The servers only take
+    them with Content-Type: application/json, which a web page cannot send to
+    localhost without a preflight that is never answered.
+    """
+    diagnostics = diagnostics or MemoryDiagnostics()
+
+    def options(query: Dict[str, str]) -> Tuple[int, str]:
+        key = query.get("key", "lineno")
+        if key not in ("lineno", "filename", "traceback"):
+            raise ValueError(f"unknown key {key!r}")
+        return int(query.get("top", DEFAULT_TOP)), key
+
+    def memory(query):
+        stats = budget.stats() if budget is not None else {"rss_bytes": process_rss()}
+        traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+        stats["tracemalloc_bytes"] = traced[0] if traced else None
+        return stats
+
+    return {
+        "/debug/memory": memory,
+        "/debug/tracemalloc/diff": lambda query: diagnostics.diff(*options(query)),
+        "POST /debug/tracemalloc/start": lambda query: diagnostics.start(int(query.get("frames", TRACEMALLOC_FRAMES))),
+        "POST /debug/tracemalloc/snapshot": lambda query: diagnostics.snapshot(*options(query)),
+        "POST /debug/tracemalloc/diff": lambda query: diagnostics.diff(*options(query),
+                                                                       reset=query.get("reset") in ("1", "true")),
+        "POST /debug/tracemalloc/stop": lambda query: diagnostics.stop()
+    }
+
+
+def soak(cycles: int, pairs: int, limit_bytes: Optional[int]) -> List[Dict[str, Any]]:
+    """
+    Feed ever-new pairs into the monitor's caches and record RSS
+
+    Every cycle brings pairs the caches have never seen, like a universe
+    that keeps listing new symbols.
+
+    Returns:
+        RSS and cached entries at every tenth cycle
+    """
+    from alert_rules import threshold_rules
+    from exchange_spread_monitor import QuoteChanges, quote_fields
+
+    changes = QuoteChanges()
+    rules = threshold_rules(0.5, 1.0)
+    budget = MemoryBudget(limit_bytes) if limit_bytes else None
+    if budget is not None:
+        budget.register("quote_fingerprints", changes, priority=0)
+        budget.register("rule_index", rules, priority=1)
+    trace = []
+    for cycle in range(cycles):
+        for i in range(pairs):
+            pair = f"P{cycle}X{i}USDT"
+            bnb = {"bid": 1.0 + i, "ask": 1.01 + i, "spread": 0.01}
+            gate = {"bid": 1.0 + i, "ask": 1.02 + i, "spread": 0.02, "volume_usdt": 1e6, "price_change_24h": 0.1}
+            changes.compare(pair, bnb, gate)
+            rules.evaluate(pair, quote_fields(bnb, gate, 0.1))
+        if budget is not None:
+            budget.check()
+        if cycle % 10 == 9:
+            trace.append({"cycle": cycle + 1, "rss_mb": round((process_rss() or 0) / 2**20, 1),
+                          "entries": len(changes) + len(rules)})
+    return trace
+
+
+def run_soak(cycles: int = 200, pairs: int = 2000, budget_mb: float = 2.0) -> Dict[str, Any]:
+    """
+    soak() without and with a budget, each in a fresh interpreter so RSS is comparable
+
+    Returns:
+        The two traces, "unbounded" and "bounded"
+    """
+    import json
+    import subprocess
+
+    def run(limit: Optional[int]) -> List[Dict[str, Any]]:
+        code = f"import json, memory_budget; print(json.dumps(memory_budget.soak({cycles}, {pairs}, {limit})))"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    return {"unbounded": run(None), "bounded": run(int(budget_mb * 2**20))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory budget soak test")
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument("--pairs", type=int, default=2000, help="new pairs per cycle")
+    parser.add_argument("--budget-mb", type=float, default=2.0)
+    args = parser.parse_args()
+
+    result = run_soak(args.cycles, args.pairs, args.budget_mb)
+    print(f"{'cycle':>6} {'unbounded RSS':>14} {'entries':>9} {'bounded RSS':>12} {'entries':>9}")
+    for free, capped in zip(result["unbounded"], result["bounded"]):
+        print(f"{free['cycle']:>6} {free['rss_mb']:>12.1f}MB {free['entries']:>9,} "
+              f"{capped['rss_mb']:>10.1f}MB {capped['entries']:>9,}")
+
+
+if __name__ == "__main__":
+    main()
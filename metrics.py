@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style Metrics
+Counters, gauges and histograms cheap enough for the monitor hot path, and
+a local HTTP endpoint serving them in the Prometheus text format
+
+Counters and histograms keep one cell table per thread. A thread only ever
+writes its own table, so updates take no lock; tables are summed when
+/metrics is scraped.
+"""
+
+import bisect
+import json
+import threading
+import urllib.parse
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Sequence, Callable
+
+# Seconds, from a fast local call up to a slow remote one
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric"):
+        """Add a metric, names must be unique"""
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def get(self, name: str) -> Optional["_Metric"]:
+        """Look up a registered metric by name"""
+        for metric in self._metrics:
+            if metric.name == name:
+                return metric
+        return None
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class handling names, labels and per-thread cell tables"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[tuple] = []
+        self._retired: Dict[tuple, Any] = {}
+        self._shards_lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _cells(self) -> Dict[tuple, Any]:
+        """This thread's cell table, created on first use"""
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = {}
+            self._local.cells = cells
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), cells))
+            return cells
+
+    def _merge(self, into: Dict[tuple, Any], cells: Dict[tuple, Any]):
+        raise NotImplementedError
+
+    def _collect(self) -> Dict[tuple, Any]:
+        """Sum every thread's table, folding tables of finished threads away"""
+        with self._shards_lock:
+            alive = []
+            for thread, cells in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, cells))
+                else:
+                    self._merge(self._retired, dict(cells))
+            self._shards = alive
+            total: Dict[tuple, Any] = {}
+            self._merge(total, self._retired)
+            for _, cells in alive:
+                self._merge(total, dict(cells))
+        return total
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        """Add amount to the counter"""
+        key = self._key(labels) if labels or self.labelnames else ()
+        cells = self._cells()
+        cells[key] = cells.get(key, 0) + amount
+
+    def _merge(self, into, cells):
+        for key, value in cells.items():
+            into[key] = into.get(key, 0) + value
+
+    def value(self, **labels) -> float:
+        """Current total for one label set"""
+        return self._collect().get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._collect().items())]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. a queue depth"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self._values: Dict[tuple, float] = {}
+        self._functions: Dict[tuple, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        """Set the gauge"""
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        """Raise the gauge"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        """Lower the gauge"""
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        """Read the gauge from fn at scrape time instead of on the hot path"""
+        self._functions[self._key(labels)] = fn
+
+    def value(self, **labels) -> float:
+        """Current value for one label set"""
+        key = self._key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        values = dict(self._values)
+        for key, fn in list(self._functions.items()):
+            try:
+                values[key] = fn()
+            except Exception:
+                continue
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        """Record one observation"""
+        key = self._key(labels) if labels or self.labelnames else ()
+        cells = self._cells()
+        cell = cells.get(key)
+        if cell is None:
+            # Bucket counts, then +Inf count, then sum
+            cell = cells[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _merge(self, into, cells):
+        for key, cell in cells.items():
+            total = into.get(key)
+            if total is None:
+                into[key] = list(cell)
+            else:
+                for i, value in enumerate(cell):
+                    total[i] += value
+
+    def snapshot(self, **labels) -> Dict[str, Any]:
+        """Count, sum and per-bucket (non-cumulative) counts for one label set"""
+        cell = self._collect().get(self._key(labels))
+        if cell is None:
+            return {"count": 0, "sum": 0.0, "buckets": {}}
+        bounds = list(self.buckets) + [float("inf")]
+        return {
+            "count": sum(cell[:-1]),
+            "sum": cell[-1],
+            "buckets": dict(zip(bounds, cell[:-1]))
+        }
+
+    def quantile(self, q: float, **labels) -> float:
+        """Approximate quantile, the upper bound of the bucket holding it"""
+        snap = self.snapshot(**labels)
+        if not snap["count"]:
+            return 0.0
+        rank = q * snap["count"]
+        seen = 0
+        for bound, count in snap["buckets"].items():
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = []
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for key, cell in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, cell[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(cell[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# Metrics shared by the monitors and clients
+FETCH_LATENCY = Histogram("exchange_fetch_seconds", "Exchange REST fetch latency", ["exchange"])
+FETCH_ERRORS = Counter("exchange_fetch_errors_total", "Failed exchange fetches", ["exchange"])
+CYCLE_DURATION = Histogram("monitor_cycle_seconds", "Duration of one monitor cycle over all pairs")
+ALERTS_RAISED = Counter("alerts_raised_total", "Alerts produced by detectors")
+ALERTS_SENT = Counter("alerts_sent_total", "Alerts delivered to Lark")
+ALERTS_DROPPED = Counter("alerts_dropped_total", "Alerts that could not be delivered")
+ALERTS_QUEUED = Counter("alerts_queued_total", "Alerts handed to a relay, dispatcher or outbox, which counts their delivery")
+WEBHOOK_LATENCY = Histogram("lark_webhook_seconds", "Lark webhook request latency")
+WEBHOOK_RESPONSES = Counter("lark_webhook_responses_total", "Lark webhook responses by HTTP status", ["status"])
+QUEUE_DEPTH = Gauge("alert_queue_depth", "Alerts waiting to be delivered", ["queue"])
+
+
+def count_delivery(result: Dict[str, Any], alerts: int = 1):
+    """
+    Count alerts by the result of sending them
+
+    Alerts queued at the relay (alert_relay.py), a sharded monitor's
+    dispatcher or the cluster outbox are not delivered yet; whoever delivers
+    them counts them as sent or dropped once Lark answers.
+    """
+    if not result['success']:
+        ALERTS_DROPPED.inc(alerts)
+    elif result.get('queued'):
+        ALERTS_QUEUED.inc(alerts)
+    else:
+        ALERTS_SENT.inc(alerts)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves GET /metrics, and the server's extra endpoints as JSON"""
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path != "/metrics":
+            self._endpoint(path, query)
+            return
+        self._send(200, self.server.registry.render().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+
+    def do_POST(self):
+        path, _, query = self.path.partition("?")
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        # Any web page can send a simple POST to localhost, a JSON one needs a preflight first
+        if self.headers.get_content_type() != "application/json":
+            self._send(415, b'{"error": "Content-Type must be application/json"}', 'application/json')
+            return
+        self._endpoint(f"POST {path}", query)
+
+    def _endpoint(self, route: str, query: str):
+        endpoint = self.server.endpoints.get(route)
+        if endpoint is None:
+            self.send_error(404)
+            return
+        try:
+            status, data = 200, endpoint(dict(urllib.parse.parse_qsl(query)))
+        except ValueError as e:
+            status, data = 400, {"error": str(e)}
+        self._send(status, json.dumps(data).encode('utf-8'), 'application/json')
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = 9108, host: str = "127.0.0.1", registry: Registry = REGISTRY,
+                         endpoints: Optional[Dict[str, Callable[[Dict[str, str]], Any]]] = None) -> ThreadingHTTPServer:
+    """
+    Serve /metrics from a background thread
+
+    Args:
+        port: Port to listen on (0 picks a free port)
+        host: Interface to bind to, localhost by default
+        registry: Metrics to expose
+        endpoints: Extra GET paths, and "POST <path>" routes taking JSON requests, each
+            called with the query parameters and answered with its result as JSON
+            (e.g. memory_budget.debug_endpoints)
+
+    Returns:
+        The running server, call shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    server.endpoints = endpoints or {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Binance and Gate.io market data endpoints
+Replays recorded bookTicker and spot tickers responses (and the perpetual
+premiumIndex and contracts responses), or synthetic ones for thousands of
+pairs, and counts requests and bytes served per venue
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+BINANCE_FIXTURE = "binance_bookTicker.json"
+GATEIO_FIXTURE = "gateio_tickers.json"
+BINANCE_FUTURES_FIXTURE = "binance_premiumIndex.json"
+GATEIO_FUTURES_FIXTURE = "gateio_futures_contracts.json"
+
+# Symbols that lead a synthetic universe, the rest are generated
+SYNTHETIC_BASES = ["BTC", "ETH", "XRP", "SOL", "DOGE", "ADA", "TRX", "LINK", "AVAX", "DOT"]
+SYNTHETIC_PRICES = {"BTC": 64210.0, "ETH": 3120.0, "XRP": 0.52, "SOL": 145.0, "DOGE": 0.12}
+
+# Binance bookTicker request weights
+WEIGHT_SYMBOL = 2
+WEIGHT_ALL_SYMBOLS = 4
+
+
+def synthetic_pairs(count: int) -> List[tuple]:
+    """(Binance symbol, Gate.io currency pair) tuples for a synthetic universe"""
+    bases = SYNTHETIC_BASES[:count]
+    bases += [f"C{i:04d}" for i in range(count - len(bases))]
+    return [(f"{base}USDT", f"{base}_USDT") for base in bases]
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.8f}"
+
+
+class _ExchangeHandler(BaseHTTPRequestHandler):
+    """Routes the REST paths used by exchange_spread_monitor"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        mock = self.server.mock
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        headers = {}
+        if url.path == "/api/v3/ticker/bookTicker":
+            venue = "binance"
+            status, body, headers = mock.charge_binance_weight(query)
+            if status == 200:
+                status, body = mock.answer_binance_book_ticker(query)
+        elif url.path == "/api/v4/spot/tickers":
+            venue = "gateio"
+            status, body = mock.answer_gateio_tickers(query)
+        elif url.path == "/fapi/v1/premiumIndex":
+            venue = "binance_futures"
+            status, body = mock.answer_futures(mock.binance_premium)
+        elif url.path == "/api/v4/futures/usdt/contracts":
+            venue = "gateio_futures"
+            status, body = mock.answer_futures(mock.gateio_contracts)
+        else:
+            venue = "unknown"
+            status, body = 404, b'{"msg": "not found"}'
+
+        delay = mock.latency.get(venue, 0.0)
+        if delay:
+            time.sleep(delay)
+        mock.count(venue, len(body))
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ExchangeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class MockExchangeServer:
+    """Threaded local HTTP server replaying Binance and Gate.io market data"""
+
+    def __init__(self, binance_tickers: List[Dict[str, Any]], gateio_tickers: List[Dict[str, Any]],
+                 host: str = "127.0.0.1", port: int = 0, latency: Optional[Dict[str, float]] = None,
+                 seed: int = 0, binance_weight_limit: Optional[int] = None,
+                 binance_premium: Optional[List[Dict[str, Any]]] = None,
+                 gateio_contracts: Optional[List[Dict[str, Any]]] = None):
+        """
+        Initialize the mock exchange server
+
+        Args:
+            binance_tickers: Binance /api/v3/ticker/bookTicker response (all symbols)
+            gateio_tickers: Gate.io /api/v4/spot/tickers response
+            host: Interface to bind to
+            port: Port to bind to (0 picks a free port)
+            latency: Seconds to wait per response, keyed by venue ("binance", "gateio")
+            seed: Seed for advance()
+            binance_weight_limit: Request weight per minute before Binance answers 429, None never limits
+            binance_premium: Binance /fapi/v1/premiumIndex response (all symbols)
+            gateio_contracts: Gate.io /api/v4/futures/usdt/contracts response
+        """
+        self._server = _ExchangeHTTPServer((host, port), _ExchangeHandler)
+        self._server.mock = self
+        self._thread = None
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.latency = latency or {}
+        self.requests: Dict[str, int] = {}
+        self.bytes_sent: Dict[str, int] = {}
+        self.binance_weight_limit = binance_weight_limit
+        self.binance_weight = 0
+        self.weight_charged = 0
+        self._weight_window = None
+        self.binance_premium = binance_premium or []
+        self.gateio_contracts = gateio_contracts or []
+        self._load(binance_tickers, gateio_tickers)
+
+    def _load(self, binance_tickers, gateio_tickers):
+        with self._lock:
+            self.binance_tickers = binance_tickers
+            self.gateio_tickers = gateio_tickers
+            self._binance_index = {t["symbol"]: t for t in binance_tickers}
+            self._gateio_index = {t["currency_pair"]: t for t in gateio_tickers}
+            self._binance_all = json.dumps(binance_tickers).encode('utf-8')
+            self._gateio_all = json.dumps(gateio_tickers).encode('utf-8')
+
+    @classmethod
+    def from_files(cls, directory: str, **kwargs) -> "MockExchangeServer":
+        """Replay responses saved by record_fixtures()"""
+        with open(os.path.join(directory, BINANCE_FIXTURE)) as f:
+            binance_tickers = json.load(f)
+        with open(os.path.join(directory, GATEIO_FIXTURE)) as f:
+            gateio_tickers = json.load(f)
+        # Futures fixtures are optional, older recordings only have spot
+        for filename, key in ((BINANCE_FUTURES_FIXTURE, "binance_premium"), (GATEIO_FUTURES_FIXTURE, "gateio_contracts")):
+            path = os.path.join(directory, filename)
+            if os.path.exists(path) and key not in kwargs:
+                with open(path) as f:
+                    kwargs[key] = json.load(f)
+        return cls(binance_tickers, gateio_tickers, **kwargs)
+
+    @classmethod
+    def synthetic(cls, pair_count: int, diverging_fraction: float = 0.0, seed: int = 0,
+                  stressed_fraction: float = 0.0, **kwargs) -> "MockExchangeServer":
+        """
+        Build responses for a synthetic universe of pair_count pairs
+
+        Every pair also gets a USDT perpetual on both venues, marked close to
+        spot at the default funding rate.
+
+        Args:
+            pair_count: Number of pairs listed on both venues
+            diverging_fraction: Share of pairs whose Gate.io price is 2% off Binance
+            seed: Seed for prices and for advance()
+            stressed_fraction: Share of perpetuals with 0.3% funding and their mark 3% above spot
+        """
+        rng = random.Random(seed)
+        binance_tickers = []
+        gateio_tickers = []
+        binance_premium = []
+        gateio_contracts = []
+        # Own generator, so the spot quotes stay the same as before perpetuals were added
+        futures_rng = random.Random(seed + 1)
+        next_funding_ms = (int(time.time()) // 28800 + 1) * 28800 * 1000
+        for bnb_sym, gate_sym in synthetic_pairs(pair_count):
+            base = gate_sym.split("_")[0]
+            price = SYNTHETIC_PRICES.get(base) or rng.uniform(0.05, 500.0)
+            tick = price * 0.0001
+            gate_price = price * (1.02 if rng.random() < diverging_fraction else 1 + rng.uniform(-0.001, 0.001))
+            binance_tickers.append({
+                "symbol": bnb_sym,
+                "bidPrice": _fmt(price), "bidQty": _fmt(rng.uniform(0.1, 50)),
+                "askPrice": _fmt(price + tick), "askQty": _fmt(rng.uniform(0.1, 50))
+            })
+            gateio_tickers.append({
+                "currency_pair": gate_sym,
+                "last": _fmt(gate_price),
+                "lowest_ask": _fmt(gate_price + tick),
+                "highest_bid": _fmt(gate_price),
+                "change_percentage": f"{rng.uniform(-8, 8):.2f}",
+                "base_volume": _fmt(rng.uniform(1e3, 1e6)),
+                "quote_volume": _fmt(rng.uniform(1e4, 5e8)),
+                "high_24h": _fmt(gate_price * 1.05),
+                "low_24h": _fmt(gate_price * 0.95)
+            })
+            if futures_rng.random() < stressed_fraction:
+                funding, premium = 0.003, 0.03
+            else:
+                funding, premium = 0.0001, futures_rng.uniform(-0.0005, 0.0005)
+            binance_premium.append({
+                "symbol": bnb_sym,
+                "markPrice": _fmt(price * (1 + premium)), "indexPrice": _fmt(price),
+                "estimatedSettlePrice": _fmt(price), "lastFundingRate": f"{funding:.8f}",
+                "interestRate": "0.00010000", "nextFundingTime": next_funding_ms, "time": next_funding_ms - 3600000
+            })
+            gateio_contracts.append({
+                "name": gate_sym, "type": "direct", "quanto_multiplier": "1",
+                "mark_price": _fmt(gate_price * (1 + premium)), "index_price": _fmt(gate_price),
+                "last_price": _fmt(gate_price * (1 + premium)), "funding_rate": f"{funding:.6f}",
+                "funding_interval": 28800, "funding_next_apply": next_funding_ms // 1000, "in_delisting": False
+            })
+        kwargs.setdefault("binance_premium", binance_premium)
+        kwargs.setdefault("gateio_contracts", gateio_contracts)
+        return cls(binance_tickers, gateio_tickers, seed=seed, **kwargs)
+
+    @property
+    def url(self) -> str:
+        """Base URL to use in place of https://api.binance.com / https://api.gate.io"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def charge_binance_weight(self, query: Dict[str, List[str]]):
+        """Account a bookTicker request's weight, answering 429 over the limit"""
+        if "symbol" in query:
+            weight = WEIGHT_SYMBOL
+        elif "symbols" in query:
+            count = len(json.loads(query["symbols"][0]))
+            weight = 2 if count <= 20 else 20 if count <= 100 else 40
+        else:
+            weight = WEIGHT_ALL_SYMBOLS
+        with self._lock:
+            window = int(time.time() // 60)
+            if window != self._weight_window:
+                self._weight_window, self.binance_weight = window, 0
+            self.binance_weight += weight
+            self.weight_charged += weight
+            used = self.binance_weight
+        headers = {"X-MBX-USED-WEIGHT-1M": str(used)}
+        if self.binance_weight_limit is not None and used > self.binance_weight_limit:
+            headers["Retry-After"] = str(60 - int(time.time() % 60))
+            return 429, b'{"code": -1003, "msg": "Too much request weight used."}', headers
+        return 200, b"", headers
+
+    def answer_binance_book_ticker(self, query: Dict[str, List[str]]):
+        """Answer GET /api/v3/ticker/bookTicker"""
+        if "symbol" in query:
+            ticker = self._binance_index.get(query["symbol"][0])
+            if ticker is None:
+                return 400, b'{"code": -1121, "msg": "Invalid symbol."}'
+            return 200, json.dumps(ticker).encode('utf-8')
+        if "symbols" in query:
+            symbols = json.loads(query["symbols"][0])
+            tickers = [self._binance_index[s] for s in symbols if s in self._binance_index]
+            return 200, json.dumps(tickers).encode('utf-8')
+        return 200, self._binance_all
+
+    def answer_gateio_tickers(self, query: Dict[str, List[str]]):
+        """Answer GET /api/v4/spot/tickers"""
+        if "currency_pair" in query:
+            ticker = self._gateio_index.get(query["currency_pair"][0])
+            if ticker is None:
+                return 400, b'{"label": "INVALID_CURRENCY_PAIR", "message": "Invalid currency pair"}'
+            return 200, json.dumps([ticker]).encode('utf-8')
+        return 200, self._gateio_all
+
+    def answer_futures(self, contracts: List[Dict[str, Any]]):
+        """Answer GET /fapi/v1/premiumIndex or /api/v4/futures/usdt/contracts (all contracts only)"""
+        if not contracts:
+            return 404, b'{"msg": "no futures fixture loaded"}'
+        return 200, json.dumps(contracts).encode('utf-8')
+
+    def advance(self, changed_fraction: float = 1.0):
+        """Random-walk the bid/ask of a share of the pairs, like one market tick"""
+        binance_tickers = [dict(t) for t in self.binance_tickers]
+        gateio_tickers = [dict(t) for t in self.gateio_tickers]
+        rng = self._random
+        for bnb, gate in zip(binance_tickers, gateio_tickers):
+            if rng.random() >= changed_fraction:
+                continue
+            step = 1 + rng.uniform(-0.0005, 0.0005)
+            for ticker, bid_key, ask_key in ((bnb, "bidPrice", "askPrice"), (gate, "highest_bid", "lowest_ask")):
+                ticker[bid_key] = _fmt(float(ticker[bid_key]) * step)
+                ticker[ask_key] = _fmt(float(ticker[ask_key]) * step)
+        self._load(binance_tickers, gateio_tickers)
+
+    def count(self, venue: str, nbytes: int):
+        """Account one served request"""
+        with self._lock:
+            self.requests[venue] = self.requests.get(venue, 0) + 1
+            self.bytes_sent[venue] = self.bytes_sent.get(venue, 0) + nbytes
+
+    def reset_counters(self):
+        """Zero the per-venue request, byte and Binance weight counters"""
+        with self._lock:
+            self.requests = {}
+            self.bytes_sent = {}
+            self.weight_charged = 0
+
+    def start(self) -> "MockExchangeServer":
+        """Start serving in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the socket"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "MockExchangeServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def record_fixtures(directory: str):
+    """Save live all-symbols spot and perpetual responses from Binance and Gate.io for replay"""
+    import requests
+
+    os.makedirs(directory, exist_ok=True)
+    sources = [
+        ("https://api.binance.com/api/v3/ticker/bookTicker", BINANCE_FIXTURE),
+        ("https://api.gate.io/api/v4/spot/tickers", GATEIO_FIXTURE),
+        ("https://fapi.binance.com/fapi/v1/premiumIndex", BINANCE_FUTURES_FIXTURE),
+        ("https://api.gate.io/api/v4/futures/usdt/contracts", GATEIO_FUTURES_FIXTURE)
+    ]
+    for url, filename in sources:
+        res = requests.get(url, timeout=30)
+        res.raise_for_status()
+        with open(os.path.join(directory, filename), "w") as f:
+            f.write(res.text)
+        print(f"Saved {url} -> {os.path.join(directory, filename)}")
+
+
+def main():
+    """Record fixtures or serve them in the foreground"""
+    parser = argparse.ArgumentParser(description="Local stand-in for Binance and Gate.io market data")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--fixtures", help="directory with recorded responses to replay")
+    parser.add_argument("--record", help="save live responses into this directory and exit")
+    parser.add_argument("--pairs", type=int, default=3, help="synthetic pair count when no fixtures are given")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.record)
+        return
+
+    if args.fixtures:
+        server = MockExchangeServer.from_files(args.fixtures, port=args.port)
+    else:
+        server = MockExchangeServer.synthetic(args.pairs, port=args.port)
+    print(f"Mock exchange API listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(f"Requests served: {server.requests}, bytes: {server.bytes_sent}")
+
+
+if __name__ == "__main__":
+    main()
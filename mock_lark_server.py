@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Lark webhook API
+Accepts webhook POSTs on localhost and records them, so clients can be
+exercised without sending anything to a real group chat. Latency, server
+errors and rate limiting can be injected for benchmarks.
+
+press_button() plays the other direction: it posts the callback Lark sends
+when someone presses a button on a received card.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+import requests
+
+# Body Lark returns for an accepted webhook message
+LARK_OK_RESPONSE = {
+    "StatusCode": 0,
+    "StatusMessage": "success",
+    "code": 0,
+    "data": {},
+    "msg": "success"
+}
+
+# Bodies returned for injected failures
+LARK_RATE_LIMITED_RESPONSE = {"code": 11232, "msg": "frequency limited"}
+LARK_SERVER_ERROR_RESPONSE = {"code": 500, "msg": "internal error"}
+
+
+class _MockLarkHandler(BaseHTTPRequestHandler):
+    """Request handler that records payloads and answers like Lark"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self._send_json(400, {"code": 9499, "msg": "Bad Request"})
+            return
+
+        mock = self.server.mock
+        status, data = mock.decide()
+        if mock.latency:
+            time.sleep(mock.latency + mock.jitter * mock.random())
+        if status == 200:
+            mock.record(self.path, payload)
+        self._send_json(status, data)
+
+    def _send_json(self, status: int, data: Dict[str, Any]):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep benchmark and demo output clean
+        pass
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Default backlog of 5 drops connects when many clients open at once
+    request_queue_size = 1024
+
+
+class MockLarkServer:
+    """Threaded local HTTP server that mimics the Lark webhook endpoint"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, rate_limit: int = 0,
+                 seed: int = 0):
+        """
+        Initialize the mock server
+
+        Args:
+            host: Interface to bind to
+            port: Port to bind to (0 picks a free port)
+            latency: Seconds to wait before answering each request
+            jitter: Extra random delay of up to this many seconds
+            error_rate: Fraction of requests answered with HTTP 500
+            rate_limit: Requests accepted per second before answering HTTP 429 (0 disables)
+            seed: Seed for the error and jitter random generator
+        """
+        self._server = _MockHTTPServer((host, port), _MockLarkHandler)
+        self._server.mock = self
+        self._thread = None
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._window_start = 0.0
+        self._window_count = 0
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.received: List[Dict[str, Any]] = []
+        self.status_counts: Dict[int, int] = {}
+
+    @property
+    def url(self) -> str:
+        """Webhook URL clients should post to"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/open-apis/bot/v2/hook/mock"
+
+    def random(self) -> float:
+        """Thread-safe draw from the server's random generator"""
+        with self._lock:
+            return self._random.random()
+
+    def decide(self):
+        """
+        Pick the answer for the next request
+
+        Returns:
+            Tuple of HTTP status code and response body
+        """
+        with self._lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start = now
+                    self._window_count = 0
+                self._window_count += 1
+                if self._window_count > self.rate_limit:
+                    status, data = 429, LARK_RATE_LIMITED_RESPONSE
+                    self.status_counts[status] = self.status_counts.get(status, 0) + 1
+                    return status, data
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                status, data = 500, LARK_SERVER_ERROR_RESPONSE
+            else:
+                status, data = 200, LARK_OK_RESPONSE
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            return status, data
+
+    def record(self, path: str, payload: Dict[str, Any]):
+        """Store a received payload"""
+        with self._lock:
+            self.received.append(payload)
+
+    def reset(self):
+        """Forget received payloads and status counts"""
+        with self._lock:
+            self.received.clear()
+            self.status_counts.clear()
+
+    def start(self) -> "MockLarkServer":
+        """Start serving in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the socket"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "MockLarkServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def card_buttons(payload: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Buttons of an interactive card payload by their text"""
+    buttons = {}
+    for element in payload.get("card", {}).get("elements", []):
+        for action in element.get("actions", []):
+            if action.get("tag") == "button":
+                buttons[action["text"]["content"]] = action
+    return buttons
+
+
+def card_action_body(value: Dict[str, Any], user_id: str = "ou_mock", token: Optional[str] = None) -> Dict[str, Any]:
+    """Body of the callback Lark posts for a button press"""
+    return {
+        "open_id": user_id,
+        "user_id": user_id,
+        "open_message_id": "om_mock",
+        "tenant_key": "mock",
+        "token": token,
+        "action": {"tag": "button", "value": value}
+    }
+
+
+def press_button(callback_url: str, payload: Dict[str, Any], text: str, user_id: str = "ou_mock",
+                 token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Press a button on a received card, as Lark would
+
+    Args:
+        callback_url: The bot's card request URL
+        payload: Card payload, e.g. from MockLarkServer.received
+        text: Button text, e.g. "Acil Müdahale"
+        user_id: Who presses it
+        token: Verification token to send
+
+    Returns:
+        Decoded callback response
+    """
+    button = card_buttons(payload)[text]
+    response = requests.post(callback_url, json=card_action_body(button.get("value", {}), user_id, token), timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def main():
+    """Run the mock server in the foreground"""
+    parser = argparse.ArgumentParser(description="Local stand-in for the Lark webhook API")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered with HTTP 500")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per second before HTTP 429")
+    args = parser.parse_args()
+
+    server = MockLarkServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                            error_rate=args.error_rate, rate_limit=args.rate_limit)
+    print(f"Mock Lark webhook listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(f"Received {len(server.received)} messages, status codes: {server.status_counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Sharded Multi-Process Spread Monitor
+Splits the pair universe across worker processes by consistent hashing.
+Each cycle the feeder writes the quote batch into a shared-memory table,
+workers evaluate their own pairs with send_alert, and the alert payloads
+are funnelled to a single dispatcher process that owns the Lark connection.
+"""
+
+import argparse
+import bisect
+import contextlib
+import hashlib
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import exchange_spread_monitor
+from lark_group_chat import LarkGroupChatClient
+from metrics import QUEUE_DEPTH, count_delivery
+
+# Columns of one quote row in the shared table; NaN bid marks a missing quote
+QUOTE_COLUMNS = ("binance_bid", "binance_ask", "gateio_bid", "gateio_ask",
+                 "volume_usdt", "price_change_24h", "received_at")
+ROW_WIDTH = len(QUOTE_COLUMNS)
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to nodes through virtual nodes"""
+
+    def __init__(self, nodes: Sequence[str] = (), replicas: int = 64):
+        """
+        Initialize the ring
+
+        Args:
+            nodes: Node names to place on the ring
+            replicas: Virtual nodes per node, more gives a smoother split
+        """
+        self.replicas = replicas
+        self._ring: List[Tuple[int, str]] = []
+        self._hashes: List[int] = []
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), "big")
+
+    def add_node(self, node: str):
+        """Place a node's virtual nodes on the ring"""
+        for i in range(self.replicas):
+            bisect.insort(self._ring, (self._hash(f"{node}#{i}"), node))
+        self._hashes = [h for h, _ in self._ring]
+
+    def remove_node(self, node: str):
+        """Take a node off the ring, its keys move to the neighbours"""
+        self._ring = [(h, n) for h, n in self._ring if n != node]
+        self._hashes = [h for h, _ in self._ring]
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted({n for _, n in self._ring})
+
+    def node_for(self, key: str) -> str:
+        """Node owning key"""
+        if not self._ring:
+            raise ValueError("Hash ring has no nodes")
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class QuoteTable:
+    """Fixed-size table of quote rows in shared memory"""
+
+    def __init__(self, rows: int, name: Optional[str] = None):
+        """
+        Create a table, or attach to an existing one by name
+
+        Args:
+            rows: Number of pair rows
+            name: Shared memory block to attach to (None creates a new one)
+        """
+        self.rows = rows
+        size = max(1, rows * ROW_WIDTH * 8)
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self._shm = _attach_shared_memory(name)
+            self._owner = False
+        self.name = self._shm.name
+        self._values = self._shm.buf.cast('d')
+        if self._owner:
+            for i in range(rows * ROW_WIDTH):
+                self._values[i] = math.nan
+
+    def write(self, row: int, bnb_data: Dict[str, Any], gate_data: Dict[str, Any]):
+        """Store the quotes of one pair; error results are written as missing"""
+        base = row * ROW_WIDTH
+        values = self._values
+        if "error" in bnb_data or "error" in gate_data:
+            values[base] = math.nan
+            return
+        values[base] = bnb_data["bid"]
+        values[base + 1] = bnb_data["ask"]
+        values[base + 2] = gate_data["bid"]
+        values[base + 3] = gate_data["ask"]
+        values[base + 4] = gate_data.get("volume_usdt", 0.0)
+        values[base + 5] = gate_data.get("price_change_24h", 0.0)
+        values[base + 6] = min(bnb_data.get("received_at", math.nan), gate_data.get("received_at", math.nan))
+
+    def read(self, row: int, bnb_sym: str, gate_sym: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Quote dicts of one pair, shaped like the fetch_* results"""
+        base = row * ROW_WIDTH
+        bnb_bid, bnb_ask, gate_bid, gate_ask, volume, change, received_at = self._values[base:base + ROW_WIDTH]
+        if math.isnan(bnb_bid):
+            error = "no quote in this batch"
+            return {"exchange": "Binance", "error": error}, {"exchange": "Gate.io", "error": error}
+        bnb_data = {"exchange": "Binance", "symbol": bnb_sym, "bid": bnb_bid, "ask": bnb_ask,
+                    "spread": bnb_ask - bnb_bid}
+        gate_data = {"exchange": "Gate.io", "symbol": gate_sym, "bid": gate_bid, "ask": gate_ask,
+                     "spread": gate_ask - gate_bid, "volume_usdt": volume, "price_change_24h": change}
+        if not math.isnan(received_at):
+            bnb_data["received_at"] = gate_data["received_at"] = received_at
+        return bnb_data, gate_data
+
+    def close(self):
+        """Detach, and free the block if this table created it"""
+        self._values.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching always registers with the resource
+        # tracker; spawned workers share the feeder's tracker, which keeps
+        # the block until the feeder unlinks it
+        return shared_memory.SharedMemory(name=name)
+
+
+class QueueingClient(LarkGroupChatClient):
+    """Builds payloads like LarkGroupChatClient but queues them for the dispatcher"""
+
+    def __init__(self, queue, webhook_url: Optional[str] = None):
+        """
+        Initialize the queueing client
+
+        Args:
+            queue: Dispatcher queue
+            webhook_url: Destination webhook, None means the dispatcher's default
+        """
+        super().__init__(webhook_url or "queued://dispatcher")
+        self.queue = queue
+        self.target = webhook_url
+        self._routed: Dict[str, "QueueingClient"] = {}
+
+    def for_webhook(self, webhook_url: str) -> "QueueingClient":
+        """Client queueing to another webhook, used for rule routes"""
+        if webhook_url not in self._routed:
+            self._routed[webhook_url] = QueueingClient(self.queue, webhook_url)
+        return self._routed[webhook_url]
+
+    def _make_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.queue.put((self.target, payload))
+        # Counted as queued here, and as sent or dropped by the dispatcher
+        return {'success': True, 'status_code': None, 'queued': True, 'data': {'queued': True}}
+
+
+def _dispatcher_main(alert_queue, webhook_url: str):
+    """Dispatcher process: the only place that talks to Lark"""
+    clients = {None: LarkGroupChatClient(webhook_url)}
+    while True:
+        item = alert_queue.get()
+        if item is None:
+            break
+        target, payload = item
+        if target not in clients:
+            clients[target] = LarkGroupChatClient(target)
+        result = clients[target]._make_request(payload)
+        count_delivery(result)
+        if not result['success']:
+            print(f"❌ Dispatcher failed to deliver alert: {result['error']}")
+
+
+def _worker_main(table_name: str, rows: int, assigned: List[Tuple[int, str, str]], conn,
+                 alert_queue, rules_path: Optional[str], quiet: bool):
+    """Worker process: evaluate the assigned rows after every published batch"""
+    table = QuoteTable(rows, name=table_name)
+    client = QueueingClient(alert_queue)
+    rules = None
+    if rules_path:
+        from alert_rules import RuleEngine
+        rules = RuleEngine(rules_path)
+    output = open(os.devnull, "w") if quiet else sys.stdout
+    try:
+        while True:
+            cycle = conn.recv()
+            if cycle is None:
+                break
+            if rules is not None:
+                rules.maybe_reload()
+            start = time.process_time()
+            with contextlib.redirect_stdout(output):
+                for row, bnb_sym, gate_sym in assigned:
+                    bnb_data, gate_data = table.read(row, bnb_sym, gate_sym)
+                    exchange_spread_monitor.send_alert(client, bnb_sym, bnb_data, gate_data, rules)
+            conn.send(time.process_time() - start)
+    finally:
+        table.close()
+        if quiet:
+            output.close()
+
+
+class ShardedMonitor:
+    """Feeder side of the sharded monitor, owning the workers and the dispatcher"""
+
+    def __init__(self, pairs: List[Tuple[str, str]], workers: Optional[int] = None,
+                 webhook_url: str = exchange_spread_monitor.WEBHOOK_URL, rules_path: Optional[str] = None,
+                 quiet: bool = False):
+        """
+        Initialize the sharded monitor
+
+        Args:
+            pairs: (Binance symbol, Gate.io pair) tuples to monitor
+            workers: Worker process count, defaults to the CPU count
+            webhook_url: Where the dispatcher delivers alerts
+            rules_path: Optional alert rules file (see alert_rules.py)
+            quiet: Silence the per-pair output of the workers
+        """
+        self.pairs = list(pairs)
+        self.workers = workers or os.cpu_count() or 1
+        self.webhook_url = webhook_url
+        self.rules_path = rules_path
+        self.quiet = quiet
+        self.ring = HashRing([f"worker-{i}" for i in range(self.workers)])
+        self._ctx = multiprocessing.get_context("spawn")
+        self._table = None
+        self._alert_queue = None
+        self._conns = []
+        self._processes = []
+        self._dispatcher = None
+
+    def shards(self) -> Dict[str, List[Tuple[int, str, str]]]:
+        """Rows assigned to each worker"""
+        assignment = {node: [] for node in self.ring.nodes}
+        for row, (bnb_sym, gate_sym) in enumerate(self.pairs):
+            assignment[self.ring.node_for(bnb_sym)].append((row, bnb_sym, gate_sym))
+        return assignment
+
+    def start(self) -> "ShardedMonitor":
+        """Create the shared table and spawn dispatcher and workers"""
+        self._table = QuoteTable(len(self.pairs))
+        self._alert_queue = self._ctx.Queue()
+        QUEUE_DEPTH.set_function(self._alert_queue.qsize, queue="sharded_dispatch")
+        self._dispatcher = self._ctx.Process(target=_dispatcher_main, args=(self._alert_queue, self.webhook_url),
+                                             name="alert-dispatcher", daemon=True)
+        self._dispatcher.start()
+        for node, assigned in self.shards().items():
+            parent_conn, child_conn = self._ctx.Pipe()
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(self._table.name, len(self.pairs), assigned, child_conn, self._alert_queue,
+                      self.rules_path, self.quiet),
+                name=node, daemon=True
+            )
+            process.start()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+        return self
+
+    def publish(self, quotes: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Write one batch of (Binance, Gate.io) quotes, in pair order, to the shared table"""
+        for row, (bnb_data, gate_data) in enumerate(quotes):
+            self._table.write(row, bnb_data, gate_data)
+
+    def run_cycle(self, quotes: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[float]:
+        """
+        Publish a batch and wait until every worker evaluated its shard
+
+        Returns:
+            CPU seconds each worker spent on the batch
+        """
+        self.publish(quotes)
+        for conn in self._conns:
+            conn.send(1)
+        return [conn.recv() for conn in self._conns]
+
+    def stop(self):
+        """Stop workers, drain the dispatcher and free the shared table"""
+        for conn in self._conns:
+            conn.send(None)
+        for process in self._processes:
+            process.join()
+        if self._alert_queue is not None:
+            self._alert_queue.put(None)
+            self._dispatcher.join()
+        if self._table is not None:
+            self._table.close()
+        self._conns, self._processes = [], []
+
+    def __enter__(self) -> "ShardedMonitor":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def fetch_quotes(pairs: List[Tuple[str, str]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """One batch of quotes through the regular fetch functions"""
+    if exchange_spread_monitor.BULK_QUOTES:
+        book = exchange_spread_monitor.QuoteBook.fetch()
+        return [(book.binance(bnb_sym), book.gateio(gate_sym)) for bnb_sym, gate_sym in pairs]
+    return [(exchange_spread_monitor.fetch_binance_price(bnb_sym), exchange_spread_monitor.fetch_gateio_price(gate_sym))
+            for bnb_sym, gate_sym in pairs]
+
+
+def synthetic_quotes(pairs: List[Tuple[str, str]], rng: random.Random,
+                     alert_fraction: float = 0.001) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Random quotes for benchmarking, a share of them diverging enough to alert"""
+    now = time.time()
+    batch = []
+    for bnb_sym, gate_sym in pairs:
+        price = rng.uniform(0.05, 500.0)
+        gate_price = price * (1.02 if rng.random() < alert_fraction else 1.0)
+        tick = price * 0.0001
+        batch.append((
+            {"exchange": "Binance", "symbol": bnb_sym, "bid": price, "ask": price + tick, "spread": tick,
+             "received_at": now},
+            {"exchange": "Gate.io", "symbol": gate_sym, "bid": gate_price, "ask": gate_price + tick, "spread": tick,
+             "volume_usdt": 1e6, "price_change_24h": 0.0, "received_at": now}
+        ))
+    return batch
+
+
+def run_benchmark(pair_count: int, workers: int, cycles: int):
+    """Evaluate synthetic batches and report pair evaluations per second"""
+    from mock_exchange_server import synthetic_pairs
+    from mock_lark_server import MockLarkServer
+
+    pairs = synthetic_pairs(pair_count)
+    rng = random.Random(0)
+    batches = [synthetic_quotes(pairs, rng) for _ in range(cycles)]
+    with MockLarkServer() as lark:
+        with ShardedMonitor(pairs, workers=workers, webhook_url=lark.url, quiet=True) as monitor:
+            monitor.run_cycle(batches[0])  # warm up imports in the workers
+            start = time.perf_counter()
+            for batch in batches:
+                monitor.run_cycle(batch)
+            elapsed = time.perf_counter() - start
+        delivered = len(lark.received)
+    print(f"{workers} workers, {pair_count} pairs: {elapsed / cycles * 1000:.1f} ms/cycle, "
+          f"{pair_count * cycles / elapsed:,.0f} pair evaluations/sec, {delivered} alerts delivered")
+
+
+def main():
+    """Run the sharded monitor, or benchmark it on synthetic quotes"""
+    parser = argparse.ArgumentParser(description="Sharded multi-process spread monitor")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--rules", default=exchange_spread_monitor.RULES_PATH, help="alert rules file")
+    parser.add_argument("--benchmark", type=int, metavar="PAIRS", help="benchmark with this many synthetic pairs")
+    parser.add_argument("--cycles", type=int, default=5, help="benchmark cycles")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.workers, args.cycles)
+        return
+
+    pairs = [("BTCUSDT", "BTC_USDT"), ("ETHUSDT", "ETH_USDT"), ("XRPUSDT", "XRP_USDT")]
+    with ShardedMonitor(pairs, workers=args.workers, rules_path=args.rules) as monitor:
+        while True:
+            monitor.run_cycle(fetch_quotes(pairs))
+            print(f"Waiting {exchange_spread_monitor.CHECK_INTERVAL_SEC} seconds before next check...")
+            time.sleep(exchange_spread_monitor.CHECK_INTERVAL_SEC)
+
+
+if __name__ == "__main__":
+    main()
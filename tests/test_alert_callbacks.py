@@ -0,0 +1,152 @@
+import pytest
+import requests
+
+from alert_callbacks import (TimingWheel, EscalationTracker, CallbackServer, handle_callback, start_escalations,
+                             run_demo, ACTION_ACK)
+from lark_group_chat import LarkGroupChatClient
+from mock_lark_server import MockLarkServer, press_button, card_buttons
+
+
+class Recording:
+    """Stands in for LarkGroupChatClient, keeping the escalations"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_urgent_alert(self, title, message, mention_all=True):
+        self.sent.append((title, message, mention_all))
+        return {'success': True, 'status_code': 200, 'data': {}}
+
+
+def _card_id(payload):
+    return card_buttons(payload)["Acil Müdahale"]["value"]["alert_id"]
+
+
+@pytest.fixture
+def clock():
+    return [1_000_000.0]
+
+
+def test_wheel_expires_on_the_deadline_tick():
+    wheel = TimingWheel(tick=1.0, slots=8, now=0.0)
+    wheel.schedule("a", 2.5, "A", now=0.0)
+    wheel.schedule("b", 1.0, "B", now=0.0)
+    assert wheel.advance(0.9) == []
+    assert wheel.advance(1.0) == [("b", "B")]
+    assert wheel.advance(2.9) == []
+    assert wheel.advance(3.0) == [("a", "A")]
+    assert len(wheel) == 0
+
+
+def test_wheel_keeps_timers_beyond_one_rotation():
+    wheel = TimingWheel(tick=1.0, slots=4, now=0.0)
+    wheel.schedule("far", 10, now=0.0)
+    assert wheel.advance(5.0) == []
+    assert "far" in wheel
+    # A long pause visits each slot once and still finds the timer
+    assert wheel.advance(100.0) == [("far", None)]
+
+
+def test_wheel_cancel_and_reschedule():
+    wheel = TimingWheel(tick=1.0, slots=8, now=0.0)
+    wheel.schedule("a", 1, now=0.0)
+    assert wheel.cancel("a")
+    assert not wheel.cancel("a")
+    wheel.schedule("b", 1, now=0.0)
+    wheel.schedule("b", 5, now=0.0)
+    assert wheel.advance(4.0) == []
+    assert wheel.advance(5.0) == [("b", None)]
+
+
+def test_acknowledged_alert_is_not_escalated(clock):
+    client = Recording()
+    tracker = EscalationTracker(client, timeout=10, tick=1.0, clock=lambda: clock[0])
+    tracker.track("a1", "Spread Uyarısı", {"Parite": "BTC/USDT"})
+    tracker.track("a2", "Spread Uyarısı", {"Parite": "ETH/USDT"})
+    assert tracker.acknowledge("a1", "ou_1")["status"] == "acknowledged"
+
+    clock[0] += 9
+    assert tracker.tick() == []
+    clock[0] += 1
+    assert [alert.alert_id for alert in tracker.tick()] == ["a2"]
+    assert len(client.sent) == 1
+    title, message, mention_all = client.sent[0]
+    assert "ETH/USDT" in message and mention_all
+    assert tracker.stats() == {"tracked": 2, "acknowledged": 1, "escalated": 1, "escalation_failed": 0,
+                               "pending": 0}
+
+
+def test_acknowledge_after_escalation_and_twice(clock):
+    tracker = EscalationTracker(Recording(), timeout=5, tick=1.0, clock=lambda: clock[0])
+    tracker.track("a1", "Spread Uyarısı", {})
+    clock[0] += 5
+    tracker.tick()
+    assert tracker.acknowledge("a1")["status"] == "acknowledged_late"
+    assert tracker.acknowledge("a1")["status"] == "already_acknowledged"
+    assert tracker.acknowledge("missing")["status"] == "unknown"
+
+
+def test_callback_token_is_checked(clock):
+    tracker = EscalationTracker(Recording(), timeout=5, clock=lambda: clock[0])
+    tracker.track("a1", "Spread Uyarısı", {})
+    body = {"action": {"value": {"alert_id": "a1", "action": ACTION_ACK}}, "token": "wrong"}
+    assert handle_callback(tracker, body, "secret")[0] == 401
+    assert tracker.stats()["pending"] == 1
+    assert handle_callback(tracker, dict(body, token="secret"), "secret")[0] == 200
+    assert tracker.stats()["acknowledged"] == 1
+
+
+def test_non_loopback_host_needs_a_token():
+    with pytest.raises(ValueError):
+        CallbackServer(EscalationTracker(Recording()), host="0.0.0.0", port=0)
+
+
+def test_buttons_on_a_sent_card_acknowledge_it():
+    with MockLarkServer() as lark:
+        client = LarkGroupChatClient(lark.url)
+        server = start_escalations(client, timeout=60, port=0, verification_token="secret")
+        try:
+            client.send_rich_alert_card("Spread Uyarısı", {"Parite": "BTC/USDT"})
+            card = lark.received[0]
+            with pytest.raises(requests.HTTPError):
+                press_button(server.url, card, "Acil Müdahale")
+            response = press_button(server.url, card, "Acil Müdahale", token="secret")
+            assert response["toast"]["type"] == "success"
+            response = press_button(server.url, card, "Detayları Gör", token="secret")
+            assert "BTC/USDT" in response["toast"]["content"]
+        finally:
+            server.stop()
+    assert server.tracker.stats()["acknowledged"] == 1
+
+
+def test_demo_escalates_the_unacknowledged():
+    result = run_demo(alerts=4, acknowledged=3, timeout=0.5)
+    assert result["stats"] == {"tracked": 4, "acknowledged": 3, "escalated": 1, "escalation_failed": 0,
+                               "pending": 0}
+    # Four cards and one escalation
+    assert result["received"] == 5
+
+
+def test_repeated_cards_share_one_escalation(clock):
+    client = Recording()
+    tracker = EscalationTracker(client, timeout=300, tick=1.0, clock=lambda: clock[0])
+    with MockLarkServer() as lark:
+        cards = LarkGroupChatClient(lark.url)
+        cards.escalations = tracker
+        for i in range(30):
+            cards.send_rich_alert_card("Arbitrage Alert: BTCUSDT", {"Price Diff %": f"{1 + i / 100:.2f}%"})
+            clock[0] += 10
+        latest = lark.received[-1]
+    assert tracker.stats()["pending"] == 1
+    # The first card's deadline holds, repeats do not push it back
+    clock[0] += 5
+    assert [alert.details["Price Diff %"] for alert in tracker.tick()] == ["1.29%"]
+    assert len(client.sent) == 1
+
+    # Re-armed after the escalation, then closed by acknowledging the latest card
+    tracker.track(_card_id(latest), "Arbitrage Alert: BTCUSDT", {})
+    assert tracker.acknowledge(_card_id(latest))["status"] == "acknowledged"
+    tracker.track(_card_id(latest), "Arbitrage Alert: BTCUSDT", {})
+    clock[0] += 600
+    assert tracker.tick() == []
+    assert len(client.sent) == 1
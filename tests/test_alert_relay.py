@@ -0,0 +1,93 @@
+import json
+import socket
+import time
+
+import pytest
+import requests
+
+import alert_relay
+from alert_relay import AlertRelay, RelayClient, STATUS_ACCEPTED, STATUS_BAD_REQUEST
+from mock_lark_server import MockLarkServer
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def lark():
+    with MockLarkServer() as server:
+        yield server
+
+
+@pytest.mark.parametrize("payload", [
+    {"msg_type": "text"},
+    {"msg_type": "text", "content": "hi"},
+    {"msg_type": "interactive", "card": []},
+    ["not", "an", "object"],
+    "text",
+])
+def test_malformed_payload_is_refused(lark, payload):
+    relay = AlertRelay(None, http_port=0, quiet=True)
+    assert relay.submit(lark.url, json.dumps(payload).encode('utf-8'), urgency="low") == STATUS_BAD_REQUEST
+    assert relay.pending() == 0
+
+
+def test_malformed_payload_does_not_stop_delivery(lark, tmp_path):
+    socket_path = str(tmp_path / "relay.sock")
+    port = _free_port()
+    # One message per second, so the later ones wait in a backlog and get merged
+    with AlertRelay(socket_path, http_port=port, rate=1, burst=1, quiet=True, webhooks=[lark.url]) as relay:
+        codes = []
+        for i in range(4):
+            payload = {"msg_type": "text"} if i == 2 else {"msg_type": "text", "content": {"text": f"alert {i}"}}
+            codes.append(requests.post(f"http://127.0.0.1:{port}/alerts",
+                                       json={"webhook_url": lark.url, "payload": payload}).status_code)
+        assert codes == [202, 202, 400, 202]
+        result = RelayClient(lark.url, socket_path, fallback=False).send_urgent_alert("LİKİDASYON", "critical")
+        assert result['queued']
+        assert _wait(lambda: relay.stats()["sent"] == 4)
+    texts = "\n".join(payload["content"]["text"] for payload in lark.received)
+    assert "alert 3" in texts and "LİKİDASYON" in texts
+
+
+def test_http_accepts_only_configured_json(lark):
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/alerts"
+    alert = {"webhook_url": lark.url, "payload": {"msg_type": "text", "content": {"text": "disk full"}}}
+    with AlertRelay(None, http_port=port, quiet=True, webhooks=[lark.url]):
+        # What a cross-origin page can send without a preflight
+        assert requests.post(url, data=json.dumps(alert), headers={"Content-Type": "text/plain"}).status_code == 415
+        assert requests.post(url, json=dict(alert, webhook_url="http://169.254.169.254/")).status_code == 403
+        assert requests.post(url, json=dict(alert, dedup_key=5)).status_code == 400
+        assert requests.post(url, json=[alert]).status_code == 400
+        assert requests.post(url, json=alert).status_code == 202
+
+
+def test_idle_target_is_pruned(lark, monkeypatch):
+    monkeypatch.setattr(alert_relay, "TARGET_IDLE_SEC", 0.2)
+    with AlertRelay(None, http_port=0, quiet=True) as relay:
+        body = json.dumps({"msg_type": "text", "content": {"text": "once"}}).encode('utf-8')
+        assert relay.submit(lark.url, body) == STATUS_ACCEPTED
+        assert _wait(lambda: relay.stats()["webhooks"] == 0)
+        assert relay.submit(lark.url, body, b"again") == STATUS_ACCEPTED
+        assert _wait(lambda: relay.stats()["sent"] == 2)
+    assert len(lark.received) == 2
+
+
+def test_debug_actions_need_a_json_post(lark):
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/debug/tracemalloc"
+    with AlertRelay(None, http_port=port, quiet=True):
+        assert requests.get(f"{url}/start").status_code == 404
+        assert requests.post(f"{url}/stop", data="x", headers={"Content-Type": "text/plain"}).status_code == 415
+        assert requests.post(f"{url}/stop", json={}).status_code == 200
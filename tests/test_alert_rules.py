@@ -0,0 +1,34 @@
+import json
+import os
+
+from alert_rules import RuleEngine
+
+
+def _write(path, spec, mtime):
+    with open(path, "w") as f:
+        f.write(spec if isinstance(spec, str) else json.dumps(spec))
+    os.utime(path, (mtime, mtime))
+
+
+RULES = {"rules": [{"name": "spread", "when": {"binance_spread": {">": 0.5}}, "message": "spread {binance_spread}"}]}
+
+
+def test_broken_rules_file_keeps_previous_rules(tmp_path):
+    path = str(tmp_path / "rules.json")
+    _write(path, RULES, 1000)
+    engine = RuleEngine(path, check_interval=0)
+    broken = [
+        "{not json",
+        {"asset_classes": {"majors": [{"symbol": "BTCUSDT"}]}, "rules": RULES["rules"]},
+        {"rules": [{"name": "typo", "when": {"binance_sprad": {">": 0.5}}, "message": "x"}]},
+        {"rules": "spread > 0.5"},
+        [],
+    ]
+    for i, spec in enumerate(broken):
+        _write(path, spec, 1001 + i)
+        assert not engine.maybe_reload()
+        assert [rule.name for rule in engine.ruleset.rules] == ["spread"]
+
+    _write(path, dict(RULES, rules=RULES["rules"] * 2), 2000)
+    assert engine.maybe_reload()
+    assert len(engine.ruleset.rules) == 2
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import re
+
+import aiohttp
+
+from alert_packer import MAX_BODY_BYTES
+from async_lark_group_chat import AsyncLarkGroupChatClient
+from mock_lark_server import MockLarkServer
+
+
+def test_concurrent_cards_all_delivered():
+    async def send(url):
+        async with AsyncLarkGroupChatClient(url, max_connections=10) as client:
+            return await asyncio.gather(*(
+                client.send_rich_alert_card(f"Alert {i}", {"Pair": "BTC/USDT"}, "medium") for i in range(50)))
+
+    with MockLarkServer() as lark:
+        results = asyncio.run(send(lark.url))
+        assert all(result['success'] and result['status_code'] == 200 for result in results)
+        bodies = [json.dumps(payload, ensure_ascii=False) for payload in lark.received]
+    assert sorted(int(n) for body in bodies for n in re.findall(r"\*\*Alert (\d+)\*\*", body)) == list(range(50))
+
+
+def test_server_error_is_reported():
+    async def send(url):
+        async with AsyncLarkGroupChatClient(url) as client:
+            return await client.send_text_message("hello")
+
+    with MockLarkServer(error_rate=1.0) as lark:
+        result = asyncio.run(send(lark.url))
+    assert not result['success']
+    assert result['status_code'] == 500
+
+
+def test_connection_refused_is_reported():
+    with MockLarkServer() as lark:
+        url = lark.url
+
+    async def send():
+        async with AsyncLarkGroupChatClient(url, timeout=5) as client:
+            return await client.send_text_message("hello")
+
+    result = asyncio.run(send())
+    assert not result['success']
+    assert result['status_code'] is None
+
+
+def test_large_summary_split_under_body_limit():
+    alerts = [{"type": f"Alert {i}", "message": "x" * 400, "time": "12:00"} for i in range(200)]
+
+    async def send(url):
+        async with AsyncLarkGroupChatClient(url) as client:
+            return await client.send_group_summary(alerts)
+
+    with MockLarkServer() as lark:
+        result = asyncio.run(send(lark.url))
+        received = list(lark.received)
+    assert result['success']
+    assert len(received) > 1
+    assert result['messages'] == len(received)
+    assert all(len(json.dumps(payload).encode('utf-8')) <= MAX_BODY_BYTES for payload in received)
+
+
+def test_callers_session_sends_json():
+    content_types = []
+
+    async def on_request_start(session, context, params):
+        content_types.append(params.headers.get("Content-Type"))
+
+    async def send(url):
+        tracing = aiohttp.TraceConfig()
+        tracing.on_request_start.append(on_request_start)
+        async with aiohttp.ClientSession(trace_configs=[tracing]) as session:
+            return await AsyncLarkGroupChatClient(url, session=session).send_text_message("hello")
+
+    with MockLarkServer() as lark:
+        assert asyncio.run(send(lark.url))['success']
+    assert content_types == ["application/json"]
@@ -0,0 +1,115 @@
+import collections
+import threading
+import time
+
+import pytest
+
+from cluster_monitor import SQLiteCoordinator, ClusterNode, OutboxClient, DISPATCH_LEASE
+from mock_lark_server import MockLarkServer
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "cluster.db")
+
+
+def _queue(coordinator, count, scope="BTCUSDT|1"):
+    client = OutboxClient(coordinator)
+    for i in range(count):
+        client.begin_scope(f"{scope}|{i}")
+        client.send_text_message(f"alert {i}")
+
+
+def _texts(lark):
+    return [payload["content"]["text"] for payload in lark.received]
+
+
+def test_lease_handover_bumps_epoch(db):
+    a = SQLiteCoordinator(db, "a")
+    b = SQLiteCoordinator(db, "b")
+    assert a.acquire_lease(DISPATCH_LEASE) == 1
+    assert b.acquire_lease(DISPATCH_LEASE) is None
+    assert a.acquire_lease(DISPATCH_LEASE) == 1
+
+    a.leave()
+    assert b.acquire_lease(DISPATCH_LEASE) == 2
+    assert a.lease_holder(DISPATCH_LEASE) == "b"
+
+    _queue(b, 1)
+    key = b.pending_alerts()[0][0]
+    # The old leader's epoch no longer marks deliveries
+    assert not a.record_attempt(key, True, 1)
+    assert b.record_attempt(key, True, 2)
+    assert b.pending_count() == 0
+
+
+def test_expired_lease_moves_to_another_node(db):
+    a = SQLiteCoordinator(db, "a", node_ttl=0.2)
+    b = SQLiteCoordinator(db, "b", node_ttl=0.2)
+    assert a.acquire_lease(DISPATCH_LEASE) == 1
+    time.sleep(0.3)
+    assert b.acquire_lease(DISPATCH_LEASE) == 2
+    assert a.acquire_lease(DISPATCH_LEASE) is None
+
+
+def test_same_alert_from_two_nodes_is_queued_once(db):
+    a = SQLiteCoordinator(db, "a")
+    b = SQLiteCoordinator(db, "b")
+    _queue(a, 3)
+    _queue(b, 3)
+    assert a.pending_count() == 3
+
+
+def test_concurrent_dispatch_on_one_node_sends_once(db):
+    coordinator = SQLiteCoordinator(db, "a")
+    _queue(coordinator, 30)
+    with MockLarkServer(latency=0.005) as lark:
+        node = ClusterNode(coordinator, [], webhook_url=lark.url)
+        threads = [threading.Thread(target=node.dispatch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        texts = _texts(lark)
+    assert sorted(texts) == sorted(f"alert {i}" for i in range(30))
+    assert coordinator.pending_count() == 0
+
+
+def test_slow_send_keeps_the_lease(db):
+    # Each POST outlasts node_ttl; without renewal the other node would take over and resend
+    a = SQLiteCoordinator(db, "a", node_ttl=0.2)
+    b = SQLiteCoordinator(db, "b", node_ttl=0.2)
+    _queue(a, 3)
+    with MockLarkServer(latency=0.4) as lark:
+        leader = ClusterNode(a, [], webhook_url=lark.url)
+        other = ClusterNode(b, [], webhook_url=lark.url)
+        thread = threading.Thread(target=leader.dispatch)
+        thread.start()
+        while thread.is_alive():
+            other.dispatch()
+            time.sleep(0.05)
+        thread.join()
+        counts = collections.Counter(_texts(lark))
+    assert counts == collections.Counter(f"alert {i}" for i in range(3))
+
+
+def test_new_leader_delivers_what_the_old_one_left(db):
+    a = SQLiteCoordinator(db, "a")
+    b = SQLiteCoordinator(db, "b")
+    _queue(a, 5)
+    with MockLarkServer() as lark:
+        assert ClusterNode(a, [], webhook_url=lark.url).dispatch() == 5
+        _queue(a, 2, scope="ETHUSDT|1")
+        a.leave()
+        assert ClusterNode(b, [], webhook_url=lark.url).dispatch() == 2
+        texts = _texts(lark)
+    assert len(texts) == 7
+    delivered_by = [row[0] for row in b._connection().execute("SELECT delivered_by FROM outbox ORDER BY created")]
+    assert delivered_by == ["a"] * 5 + ["b"] * 2
+
+
+def test_outbox_results_are_queued(db):
+    client = OutboxClient(SQLiteCoordinator(db, "a"))
+    client.begin_scope("BTCUSDT|1")
+    result = client.send_text_message("alert")
+    assert result['success'] and result['queued']
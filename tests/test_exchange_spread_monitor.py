@@ -0,0 +1,75 @@
+import exchange_spread_monitor
+from exchange_spread_monitor import QuoteChanges, check_pairs
+
+
+class Recording:
+    """The default rules, keeping what each evaluation matched"""
+
+    def __init__(self):
+        self.rules = exchange_spread_monitor.default_rules()
+        self.routes = self.rules.routes
+        self.matched = []
+
+    def evaluate(self, pair, values, changed=None):
+        matches = self.rules.evaluate(pair, values, changed)
+        self.matched.append([match.rule.name for match in matches])
+        return matches
+
+
+class Cards:
+    """Stands in for the Lark client, keeping the cards"""
+
+    def __init__(self):
+        self.cards = []
+
+    def send_rich_alert_card(self, title, details, urgency="high", mention_all=False, alert_id=None):
+        self.cards.append((title, details, urgency))
+        return {'success': True, 'status_code': 200, 'data': {}}
+
+
+def _quote(exchange, bid, ask):
+    quote = {"exchange": exchange, "bid": bid, "ask": ask, "spread": ask - bid, "received_at": 0.0}
+    if exchange == "Gate.io":
+        quote.update(volume_usdt=1e6, price_change_24h=0.0)
+    return quote
+
+
+def test_changed_pair_reports_every_condition_still_holding(monkeypatch, capsys):
+    # Gate.io's spread stays $5 over the threshold while only the Binance side moves
+    binance_bids = iter([100.0, 100.1, 102.5])
+
+    def fetch_binance_price(symbol):
+        bid = next(binance_bids)
+        return _quote("Binance", bid, bid + 0.2)
+
+    monkeypatch.setattr(exchange_spread_monitor, "BULK_QUOTES", False)
+    monkeypatch.setattr(exchange_spread_monitor, "fetch_binance_price", fetch_binance_price)
+    monkeypatch.setattr(exchange_spread_monitor, "fetch_gateio_price", lambda symbol: _quote("Gate.io", 100.0, 105.5))
+    client = Cards()
+    rules = Recording()
+    changes = QuoteChanges()
+    for _ in range(3):
+        check_pairs(client, [("XUSDT", "X_USDT")], rules, changes=changes)
+
+    assert "No alerts for XUSDT" not in capsys.readouterr().out
+    assert len(client.cards) == 3
+    # Cycle 3 adds the price difference to the still-wide Gate.io spread
+    assert rules.matched == [["gateio_spread"], ["gateio_spread"], ["gateio_spread", "price_diff"]]
+
+
+def test_full_disk_does_not_stop_the_cycle(monkeypatch, capsys):
+    class FullDisk:
+        def record(self, quote):
+            raise OSError(28, "No space left on device")
+
+        def flush(self):
+            raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(exchange_spread_monitor, "BULK_QUOTES", False)
+    monkeypatch.setattr(exchange_spread_monitor, "fetch_binance_price", lambda symbol: _quote("Binance", 100.0, 100.2))
+    monkeypatch.setattr(exchange_spread_monitor, "fetch_gateio_price", lambda symbol: _quote("Gate.io", 100.0, 105.5))
+    client = Cards()
+    dirty = check_pairs(client, [("XUSDT", "X_USDT"), ("YUSDT", "Y_USDT")], recorder=FullDisk())
+    assert len(dirty) == 2
+    assert len(client.cards) == 2
+    assert "Tick recording failed" in capsys.readouterr().out
@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+import exchange_spread_monitor
+import funding_monitor
+from funding_monitor import FundingMonitor, PerpTable, expected_alerts, run_demo
+from mock_exchange_server import (MockExchangeServer, BINANCE_FIXTURE, GATEIO_FIXTURE, BINANCE_FUTURES_FIXTURE,
+                                  GATEIO_FUTURES_FIXTURE)
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    """A recording in the layout mock_exchange_server.py --record writes, with the odd rows live data has"""
+    exchange = MockExchangeServer.synthetic(200, stressed_fraction=0.05, seed=7)
+    binance_premium = exchange.binance_premium + [
+        # Priced per 1000 units on the perpetual, per unit on spot
+        {"symbol": "1000PEPEUSDT", "markPrice": "0.01300000", "indexPrice": "0.01200000",
+         "lastFundingRate": "0.00010000", "nextFundingTime": 0},
+        # Dated delivery contract, not a perpetual
+        {"symbol": "BTCUSDT_250627", "markPrice": "70000", "indexPrice": "64210",
+         "lastFundingRate": "0.00500000", "nextFundingTime": 0}
+    ]
+    binance_tickers = exchange.binance_tickers + [
+        {"symbol": "PEPEUSDT", "bidPrice": "0.00001200", "bidQty": "1", "askPrice": "0.00001200", "askQty": "1"}
+    ]
+    gateio_contracts = exchange.gateio_contracts + [
+        {"name": "LUNA_USDT", "mark_price": "1", "funding_rate": "0.01", "funding_interval": 28800,
+         "funding_next_apply": 0, "in_delisting": True}
+    ]
+    for filename, rows in ((BINANCE_FIXTURE, binance_tickers), (GATEIO_FIXTURE, exchange.gateio_tickers),
+                           (BINANCE_FUTURES_FIXTURE, binance_premium), (GATEIO_FUTURES_FIXTURE, gateio_contracts)):
+        with open(os.path.join(tmp_path, filename), "w") as f:
+            json.dump(rows, f)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def exchange(fixtures, monkeypatch):
+    with MockExchangeServer.from_files(fixtures) as server:
+        monkeypatch.setattr(exchange_spread_monitor, "BINANCE_API_URL", server.url)
+        monkeypatch.setattr(exchange_spread_monitor, "GATEIO_API_URL", server.url)
+        monkeypatch.setattr(funding_monitor, "BINANCE_FUTURES_API_URL", server.url)
+        monkeypatch.setattr(funding_monitor, "GATEIO_FUTURES_API_URL", server.url)
+        yield server
+
+
+def _pairs(alerts):
+    return {(alert.venue, alert.symbol) for alert in alerts}
+
+
+def test_scan_matches_per_contract_reference(exchange):
+    monitor = FundingMonitor()
+    alerts = monitor.scan_book(exchange_spread_monitor.QuoteBook.fetch())
+    expected = expected_alerts(exchange, monitor)
+    assert expected
+    assert _pairs(alerts) == expected
+
+
+def test_odd_symbols(exchange):
+    alerts = FundingMonitor().scan_book(exchange_spread_monitor.QuoteBook.fetch())
+    by_pair = {(alert.venue, alert.symbol): alert for alert in alerts}
+    # 0.013 per 1000 PEPE against 0.000012 spot is 8.3% over
+    pepe = by_pair[("Binance", "PEPE_USDT")]
+    assert pepe.conditions == ("basis",)
+    assert pepe.basis_pct == pytest.approx(8.333, abs=0.01)
+    assert pepe.urgency == "high"
+    assert ("Gate.io", "LUNA_USDT") not in by_pair
+    # The delivery contract's 0.5% is not taken for BTC's perpetual funding
+    assert all(alert.funding_pct != pytest.approx(0.5) for alert in alerts)
+
+
+def test_second_scan_only_reports_new_conditions(fixtures):
+    exchange = MockExchangeServer.from_files(fixtures)
+    perps = PerpTable.from_binance(exchange.binance_premium, 0.0)
+    monitor = FundingMonitor()
+    first = monitor.scan(perps)
+    assert first
+    assert monitor.scan(perps) == []
+
+    # A funding jump below the absolute threshold alerts through the change since last cycle
+    rows = [dict(row) for row in exchange.binance_premium]
+    quiet = next(i for i, row in enumerate(rows) if row["symbol"] not in {a.symbol.replace("_", "") for a in first}
+                 and float(row["lastFundingRate"]) == 0.0001)
+    rows[quiet]["lastFundingRate"] = "0.00070000"
+    jumped = monitor.scan(PerpTable.from_binance(rows, 1.0))
+    assert len(jumped) == 1
+    assert jumped[0].conditions == ("funding",)
+    assert jumped[0].funding_change_pct == pytest.approx(0.06)
+
+
+def test_listing_change_keeps_history(fixtures):
+    exchange = MockExchangeServer.from_files(fixtures)
+    rows = exchange.gateio_contracts
+    monitor = FundingMonitor()
+    assert monitor.scan(PerpTable.from_gateio(rows, 0.0))
+    # One contract delisted, the rest reordered: nothing still holding is reported again
+    assert monitor.scan(PerpTable.from_gateio(list(reversed(rows[1:])), 1.0)) == []
+
+
+def test_demo_from_fixtures(fixtures):
+    result = run_demo(fixtures=fixtures)
+    assert result["matches_reference"]
+    assert result["alerts"][0] == result["expected"]
+    assert result["alerts"][1] == 0
@@ -0,0 +1,43 @@
+import os
+import socket
+import threading
+
+from lark_webhook import LarkWebhookClient, send_via_daemon
+from mock_lark_server import MockLarkServer
+
+
+def _daemon(path, reply):
+    """One-shot stand-in daemon answering with reply"""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+
+    def answer():
+        connection, _ = server.accept()
+        with connection, server:
+            connection.recv(65536)
+            connection.sendall(reply)
+
+    threading.Thread(target=answer, daemon=True).start()
+
+
+def test_truncated_reply_falls_back_to_direct_send(tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    _daemon(path, b'{"success": tr')
+    with MockLarkServer() as lark:
+        result = LarkWebhookClient(lark.url, daemon_socket=path).send_text_message("disk full")
+        assert result['success']
+        assert len(lark.received) == 1
+
+
+def test_empty_reply_is_no_result(tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    _daemon(path, b"")
+    assert send_via_daemon(path, "http://127.0.0.1:1/", {}) is None
+
+
+def test_socket_of_another_user_is_not_used(tmp_path, monkeypatch):
+    path = str(tmp_path / "daemon.sock")
+    _daemon(path, b'{"success": true}\n')
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(path).st_uid + 1)
+    assert send_via_daemon(path, "http://127.0.0.1:1/", {}) is None
@@ -0,0 +1,26 @@
+import tracemalloc
+
+import requests
+
+from memory_budget import debug_endpoints
+from metrics import start_metrics_server
+
+
+def test_tracing_starts_only_on_a_json_post():
+    server = start_metrics_server(0, endpoints=debug_endpoints())
+    url = f"http://127.0.0.1:{server.server_address[1]}/debug/tracemalloc"
+    try:
+        # What any web page can send cross-origin
+        assert requests.get(f"{url}/start").status_code == 404
+        assert requests.post(f"{url}/start", data="x", headers={"Content-Type": "text/plain"}).status_code == 415
+        assert not tracemalloc.is_tracing()
+
+        assert requests.post(f"{url}/start", json={}).status_code == 200
+        assert tracemalloc.is_tracing()
+        assert requests.get(f"{url}/diff?top=5").status_code == 200
+        assert requests.post(f"{url}/stop", json={}).status_code == 200
+        assert not tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,54 @@
+import errno
+
+import pytest
+
+from tick_recorder import TickRecorder, TickReader, NS_PER_DAY
+
+DAY = 19000 * NS_PER_DAY
+
+
+def _record(recorder, exchange, symbol, count, start=0):
+    for i in range(start, start + count):
+        recorder.append(exchange, symbol, DAY + i * 10**9, 100.0 + i, 100.5 + i)
+
+
+def test_close_with_slices_alive(tmp_path):
+    recorder = TickRecorder(str(tmp_path))
+    _record(recorder, "Binance", "BTCUSDT", 10)
+    recorder.flush()
+    reader = TickReader(str(tmp_path))
+    series = reader.series("2022-01-08", "Binance", "BTCUSDT")
+    columns = series.slice(DAY + 2 * 10**9, DAY + 5 * 10**9)
+    series.close()
+    assert list(columns["bid"]) == [102.0, 103.0, 104.0]
+
+
+def test_read_range_outlives_its_series(tmp_path):
+    recorder = TickRecorder(str(tmp_path))
+    _record(recorder, "Gate.io", "BTC_USDT", 5)
+    recorder.close()
+    chunks = list(TickReader(str(tmp_path)).read_range("Gate.io", "BTC_USDT", DAY, DAY + NS_PER_DAY))
+    assert [list(chunk["ask"]) for chunk in chunks] == [[100.5, 101.5, 102.5, 103.5, 104.5]]
+
+
+def test_failed_flush_does_not_write_a_series_twice(tmp_path, monkeypatch):
+    recorder = TickRecorder(str(tmp_path))
+    _record(recorder, "Binance", "BTCUSDT", 3)
+    _record(recorder, "Binance", "ETHUSDT", 3)
+    write = recorder._write
+
+    def full_disk(key, buffers):
+        if key[2] == "ETHUSDT":
+            raise OSError(errno.ENOSPC, "No space left on device")
+        write(key, buffers)
+
+    monkeypatch.setattr(recorder, "_write", full_disk)
+    with pytest.raises(OSError):
+        recorder.flush()
+    monkeypatch.setattr(recorder, "_write", write)
+    recorder.flush()
+
+    reader = TickReader(str(tmp_path))
+    for symbol in ("BTCUSDT", "ETHUSDT"):
+        with reader.series("2022-01-08", "Binance", symbol) as series:
+            assert len(series) == 3
@@ -0,0 +1,45 @@
+from triangular_arbitrage import ArbitrageGraph
+
+
+class Book:
+    """Stands in for QuoteBook"""
+
+    def __init__(self, tickers):
+        self._tickers = tickers
+
+    def tickers(self):
+        return iter(self._tickers)
+
+
+# BTC is cheap in ETH on Gate.io: USDT -> BTC -> ETH -> USDT returns about 2%
+PROFITABLE = [
+    ("Binance", "BTCUSDT", "64000", "64001"),
+    ("Binance", "ETHUSDT", "3200", "3200.1"),
+    ("Gate.io", "ETH_BTC", "0.051", "0.051"),
+]
+
+
+def test_halted_market_stops_its_cycles():
+    graph = ArbitrageGraph(fees={})
+    assert graph.scan_book(Book(PROFITABLE))
+    assert graph.current()
+
+    halted = PROFITABLE[:2] + [("Gate.io", "ETH_BTC", "", "")]
+    assert graph.scan_book(Book(halted)) == []
+    assert graph.current() == []
+
+    # Trading again, the cycle alerts again
+    assert graph.scan_book(Book(PROFITABLE))
+    assert graph.current()
+
+
+def test_halted_venue_falls_back_to_the_other_one():
+    graph = ArbitrageGraph(fees={})
+    graph.scan_book(Book(PROFITABLE + [("Binance", "ETHBTC", "0.05", "0.05")]))
+    assert [leg.venue for leg in graph.current()[0].legs if "BTC" in (leg.source, leg.target)
+            and "ETH" in (leg.source, leg.target)] == ["Gate.io"]
+
+    graph.scan_book(Book(PROFITABLE[:2] + [("Gate.io", "ETH_BTC", "0", "0"), ("Binance", "ETHBTC", "0.05", "0.05")]))
+    # Binance's ETH/BTC rate leaves no profit
+    assert graph.current() == []
+    assert graph.edge_count == 6
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Historical Tick Recorder
+Appends every quote the monitor sees to per-day, per-pair columnar files and
+reads them back through memory maps, so time-range slices of millions of
+ticks are found by binary search without loading whole files.
+
+Layout:
+    <root>/<YYYY-MM-DD>/<exchange>/<symbol>/ts.i8    int64 nanoseconds since epoch (UTC)
+                                            bid.f8   float64
+                                            ask.f8   float64
+"""
+
+import bisect
+import datetime
+import functools
+import mmap
+import os
+import sys
+import threading
+from array import array
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Column name, file name, array typecode
+COLUMNS = (("ts", "ts.i8", "q"), ("bid", "bid.f8", "d"), ("ask", "ask.f8", "d"))
+ITEM_SIZE = 8
+NS_PER_DAY = 86400 * 10**9
+
+
+@functools.lru_cache(maxsize=None)
+def exchange_key(exchange: str) -> str:
+    """Directory name for an exchange, e.g. "Gate.io" -> "gateio" """
+    return "".join(ch for ch in exchange.lower() if ch.isalnum())
+
+
+def day_of(ts_ns: int) -> str:
+    """UTC date of a nanosecond timestamp as YYYY-MM-DD"""
+    return datetime.datetime.fromtimestamp(ts_ns / 1e9, tz=datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+class TickRecorder:
+    """Buffers quotes per series and appends them to the column files in batches"""
+
+    def __init__(self, root: str, flush_every: int = 4096):
+        """
+        Initialize the recorder
+
+        Args:
+            root: Directory holding the day directories
+            flush_every: Buffered ticks per series before they are written
+        """
+        self.root = root
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        # (day, exchange, symbol) -> one array per column
+        self._buffers: Dict[Tuple[str, str, str], Tuple[array, ...]] = {}
+        # Start, end and name of the day of the last tick, formatting dates per tick is slow
+        self._day = (0, 0, "")
+        # Series directories whose columns are known to have equal lengths
+        self._aligned = set()
+        self.recorded = 0
+
+    def record(self, quote: Dict[str, Any], ts: Optional[float] = None):
+        """
+        Record one fetch_* style quote; error results are ignored
+
+        Args:
+            quote: Dict with exchange, symbol, bid, ask and optionally received_at
+            ts: Epoch seconds to use instead of received_at
+        """
+        if "error" in quote:
+            return
+        seconds = ts if ts is not None else quote.get("received_at")
+        if seconds is None:
+            return
+        self.append(quote["exchange"], quote["symbol"], int(seconds * 1e9), quote["bid"], quote["ask"])
+
+    def append(self, exchange: str, symbol: str, ts_ns: int, bid: float, ask: float):
+        """Record one tick given as raw values"""
+        start, end, day = self._day
+        if not start <= ts_ns < end:
+            start = ts_ns - ts_ns % NS_PER_DAY
+            day = day_of(start)
+            self._day = (start, start + NS_PER_DAY, day)
+        key = (day, exchange_key(exchange), symbol)
+        with self._lock:
+            buffers = self._buffers.get(key)
+            if buffers is None:
+                buffers = self._buffers[key] = tuple(array(code) for _, _, code in COLUMNS)
+            buffers[0].append(ts_ns)
+            buffers[1].append(bid)
+            buffers[2].append(ask)
+            self.recorded += 1
+            if len(buffers[0]) >= self.flush_every:
+                self._write(key, buffers)
+                del self._buffers[key]
+
+    def _write(self, key: Tuple[str, str, str], buffers: Tuple[array, ...]):
+        directory = os.path.join(self.root, *key)
+        if directory not in self._aligned:
+            os.makedirs(directory, exist_ok=True)
+            align_columns(directory)
+            self._aligned.add(directory)
+        try:
+            # The timestamp column is written last, readers trust its length
+            for (_, filename, _), values in sorted(zip(COLUMNS, buffers), key=lambda c: c[0][0] == "ts"):
+                with open(os.path.join(directory, filename), "ab") as f:
+                    values.tofile(f)
+        except OSError:
+            # A partial write (ENOSPC, ...) leaves the columns uneven, realign before the next one
+            self._aligned.discard(directory)
+            raise
+
+    def flush(self):
+        """Write every buffered tick; after a failed write the series not yet written stay buffered"""
+        with self._lock:
+            for key in list(self._buffers):
+                self._write(key, self._buffers[key])
+                del self._buffers[key]
+
+    def close(self):
+        self.flush()
+
+
+def align_columns(directory: str) -> int:
+    """
+    Truncate a series' column files to their common number of whole items
+
+    A crash or a failed write between column appends leaves some columns
+    longer, or with a partial item. Appending after that would pair values
+    from different ticks, so the recorder aligns a series before its first
+    write.
+
+    Returns:
+        Rows in the series after aligning
+    """
+    sizes = {}
+    for _, filename, _ in COLUMNS:
+        path = os.path.join(directory, filename)
+        sizes[path] = os.path.getsize(path) if os.path.exists(path) else 0
+    length = min(sizes.values()) // ITEM_SIZE
+    for path, size in sizes.items():
+        if size > length * ITEM_SIZE:
+            os.truncate(path, length * ITEM_SIZE)
+    return length
+
+
+class _Column:
+    """One memory-mapped column file"""
+
+    def __init__(self, path: str, typecode: str):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self.length = size // ITEM_SIZE
+        if self.length:
+            self._mmap = mmap.mmap(self._file.fileno(), self.length * ITEM_SIZE, access=mmap.ACCESS_READ)
+            self.values = memoryview(self._mmap).cast(typecode)
+        else:
+            self._mmap = None
+            self.values = memoryview(array(typecode))
+
+    def close(self):
+        self.values.release()
+        self._file.close()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Slices from TickSeries.slice() still use the map, it is unmapped once they are gone
+                pass
+
+
+class TickSeries:
+    """Memory-mapped ticks of one exchange, symbol and day"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._columns = {name: _Column(os.path.join(directory, filename), code) for name, filename, code in COLUMNS}
+        # A crash between column writes can leave the value columns longer
+        self.length = min(column.length for column in self._columns.values())
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def ts(self) -> memoryview:
+        return self._columns["ts"].values[:self.length]
+
+    @property
+    def bid(self) -> memoryview:
+        return self._columns["bid"].values[:self.length]
+
+    @property
+    def ask(self) -> memoryview:
+        return self._columns["ask"].values[:self.length]
+
+    def index_range(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Tuple[int, int]:
+        """Row range [lo, hi) with start_ns <= ts < end_ns, by binary search"""
+        ts = self.ts
+        lo = 0 if start_ns is None else bisect.bisect_left(ts, start_ns)
+        hi = self.length if end_ns is None else bisect.bisect_left(ts, end_ns, lo)
+        return lo, hi
+
+    def slice(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Zero-copy columns for a time range
+
+        Returns:
+            Dict of column name to memoryview, or to numpy array when numpy is installed
+        """
+        lo, hi = self.index_range(start_ns, end_ns)
+        columns = {"ts": self.ts[lo:hi], "bid": self.bid[lo:hi], "ask": self.ask[lo:hi]}
+        if np is not None:
+            columns = {name: np.frombuffer(values, dtype=values.format) for name, values in columns.items()}
+        return columns
+
+    def close(self):
+        for column in self._columns.values():
+            column.close()
+
+    def __enter__(self) -> "TickSeries":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TickReader:
+    """Finds and opens recorded series under a recorder root"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def days(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if len(d) == 10 and d[4] == "-")
+
+    def symbols(self, day: str, exchange: str) -> List[str]:
+        directory = os.path.join(self.root, day, exchange_key(exchange))
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def series(self, day: str, exchange: str, symbol: str) -> Optional[TickSeries]:
+        """Open one day of ticks, None if nothing was recorded"""
+        directory = os.path.join(self.root, day, exchange_key(exchange), symbol)
+        if not os.path.exists(os.path.join(directory, "ts.i8")):
+            return None
+        return TickSeries(directory)
+
+    def read_range(self, exchange: str, symbol: str, start_ns: int, end_ns: int) -> Iterator[Dict[str, Any]]:
+        """Column slices, one per recorded day, covering start_ns <= ts < end_ns"""
+        first, last = day_of(start_ns), day_of(end_ns)
+        for day in self.days():
+            if day < first or day > last:
+                continue
+            series = self.series(day, exchange, symbol)
+            if series is None:
+                continue
+            # The slices stay readable after the series is closed
+            with series:
+                columns = series.slice(start_ns, end_ns)
+            if len(columns["ts"]):
+                yield columns
+
+
+def main():
+    """Print a summary of recorded ticks"""
+    if len(sys.argv) < 2:
+        print("Usage: python tick_recorder.py <root> [exchange symbol]")
+        sys.exit(1)
+
+    reader = TickReader(sys.argv[1])
+    for day in reader.days():
+        exchanges = sorted(os.listdir(os.path.join(reader.root, day)))
+        for exchange in exchanges:
+            for symbol in reader.symbols(day, exchange):
+                if len(sys.argv) > 3 and (exchange != exchange_key(sys.argv[2]) or symbol != sys.argv[3]):
+                    continue
+                with reader.series(day, exchange, symbol) as series:
+                    if not len(series):
+                        continue
+                    first = datetime.datetime.fromtimestamp(series.ts[0] / 1e9, tz=datetime.timezone.utc)
+                    last = datetime.datetime.fromtimestamp(series.ts[-1] / 1e9, tz=datetime.timezone.utc)
+                    print(f"{day} {exchange:<8} {symbol:<12} {len(series):>10} ticks  "
+                          f"{first:%H:%M:%S} - {last:%H:%M:%S}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Detect-to-Deliver Alert Tracing
+Every alert carries the timestamps of the stages it went through, from the
+exchange quote arriving to Lark acknowledging the message. Stage latencies
+go into histograms; a sample of complete traces can be written as JSONL spans.
+
+Stages, in order:
+    quote_received  fetch_* returned the quote
+    evaluated       the detector decided to alert
+    enqueued        the alert was handed to a client or dispatcher
+    serialized      the payload was encoded to JSON
+    acked           Lark answered the webhook request
+"""
+
+import contextvars
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List
+
+from metrics import Histogram
+
+STAGES = ("quote_received", "evaluated", "enqueued", "serialized", "acked")
+
+# Buckets reach down to microseconds, evaluation and serialization are fast
+STAGE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+STAGE_LATENCY = Histogram("alert_stage_seconds", "Time spent reaching each alert stage from the previous one",
+                          ["stage"], buckets=STAGE_BUCKETS)
+END_TO_END_LATENCY = Histogram("alert_end_to_end_seconds", "Time from quote received to Lark ack",
+                               buckets=STAGE_BUCKETS)
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("alert_trace", default=None)
+
+
+class SpanLog:
+    """Appends a sample of finished traces to a JSONL file"""
+
+    def __init__(self, path: str, sample_rate: float = 1.0):
+        """
+        Initialize the span log
+
+        Args:
+            path: JSONL file to append to
+            sample_rate: Fraction of traces written (0..1)
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1)
+
+    def sampled(self) -> bool:
+        """Decide whether a new trace should be written"""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def write(self, span: Dict[str, Any]):
+        """Append one span"""
+        line = json.dumps(span, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_span_log: Optional[SpanLog] = None
+
+
+def configure_span_log(path: Optional[str], sample_rate: float = 0.1) -> Optional[SpanLog]:
+    """
+    Enable (or with path=None disable) the sampled JSONL span log
+
+    Args:
+        path: JSONL file to append spans to
+        sample_rate: Fraction of alerts whose spans are written
+    """
+    global _span_log
+    if _span_log is not None:
+        _span_log.close()
+    _span_log = SpanLog(path, sample_rate) if path else None
+    return _span_log
+
+
+class AlertTrace:
+    """Stage timestamps (epoch seconds) of one alert"""
+
+    __slots__ = ("trace_id", "name", "attrs", "marks", "sampled")
+
+    def __init__(self, name: str, quote_received: Optional[float] = None, **attrs):
+        """
+        Start a trace
+
+        Args:
+            name: What is being alerted on, e.g. the pair
+            quote_received: When the oldest quote behind the alert arrived
+            attrs: Extra fields written with the span
+        """
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.marks: Dict[str, float] = {}
+        self.sampled = _span_log is not None and _span_log.sampled()
+        if quote_received is not None:
+            self.marks["quote_received"] = quote_received
+
+    def mark(self, stage: str, timestamp: Optional[float] = None):
+        """Record that the alert reached stage (first mark wins)"""
+        if stage not in self.marks:
+            self.marks[stage] = time.time() if timestamp is None else timestamp
+
+    def stage_latencies(self) -> Dict[str, float]:
+        """Seconds spent reaching each recorded stage from the previous recorded one"""
+        latencies = {}
+        previous = None
+        for stage in STAGES:
+            if stage in self.marks:
+                if previous is not None:
+                    latencies[stage] = max(0.0, self.marks[stage] - self.marks[previous])
+                previous = stage
+        return latencies
+
+    def finish(self, **attrs):
+        """Record stage histograms and write the span if sampled"""
+        self.attrs.update(attrs)
+        for stage, seconds in self.stage_latencies().items():
+            STAGE_LATENCY.observe(seconds, stage=stage)
+        if "quote_received" in self.marks and "acked" in self.marks:
+            END_TO_END_LATENCY.observe(self.marks["acked"] - self.marks["quote_received"])
+        if self.sampled and _span_log is not None:
+            _span_log.write(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "marks": self.marks,
+            "stages": self.stage_latencies(),
+            "attrs": self.attrs
+        }
+
+
+def current_trace() -> Optional[AlertTrace]:
+    """Trace of the alert being processed in this context, if any"""
+    return _current_trace.get()
+
+
+@contextmanager
+def activate(trace: Optional[AlertTrace]):
+    """Make trace the current one for code called inside the with-block"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def mark(stage: str):
+    """Mark stage on the current trace; a no-op outside a traced alert"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(stage)
+
+
+def summarize_spans(path: str) -> Dict[str, Dict[str, float]]:
+    """Per-stage count, mean, p50 and p99 in milliseconds from a span log"""
+    per_stage: Dict[str, List[float]] = {}
+    with open(path) as f:
+        for line in f:
+            span = json.loads(line)
+            marks = span["marks"]
+            for stage, seconds in span["stages"].items():
+                per_stage.setdefault(stage, []).append(seconds)
+            if "quote_received" in marks and "acked" in marks:
+                per_stage.setdefault("end_to_end", []).append(marks["acked"] - marks["quote_received"])
+
+    summary = {}
+    for stage in list(STAGES) + ["end_to_end"]:
+        values = sorted(per_stage.get(stage, []))
+        if not values:
+            continue
+        summary[stage] = {
+            "count": len(values),
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": values[len(values) // 2] * 1000,
+            "p99_ms": values[min(len(values) - 1, int(len(values) * 0.99))] * 1000
+        }
+    return summary
+
+
+def main():
+    """Print the stage breakdown of a span log"""
+    if len(sys.argv) < 2:
+        print("Usage: python tracing.py <spans.jsonl>")
+        sys.exit(1)
+
+    summary = summarize_spans(sys.argv[1])
+    print(f"{'stage':<16}{'count':>8}{'mean ms':>12}{'p50 ms':>12}{'p99 ms':>12}")
+    for stage, stats in summary.items():
+        print(f"{stage:<16}{stats['count']:>8}{stats['mean_ms']:>12.3f}{stats['p50_ms']:>12.3f}{stats['p99_ms']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Streaming Daily Trading Summary
+Running aggregates for the "Günlük Trading Özeti" card, updated as quotes
+and alerts flow through the monitor. Every aggregate is a fixed set of
+numbers (per pair where the metric is per pair), so the card is built from
+the current state without rescanning anything. The state is checkpointed to
+JSON, so a restarted monitor keeps the day's totals, and it rolls over at
+midnight.
+"""
+
+import datetime
+import json
+import math
+import os
+import sys
+import threading
+import time
+from typing import Dict, Any, Optional, Callable
+
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_PATH = "trading_summary.json"
+DAY_UTC_OFFSET_HOURS = 3  # The trading day ends at midnight Istanbul time
+
+
+class RunningStats:
+    """Count, mean, variance (Welford), min and max of a stream"""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RunningStats":
+        stats = cls()
+        stats.count = data["count"]
+        stats.mean = data["mean"]
+        stats.m2 = data["m2"]
+        stats.min = data["min"] if data["min"] is not None else math.inf
+        stats.max = data["max"] if data["max"] is not None else -math.inf
+        return stats
+
+
+class TradingSummary:
+    """Daily aggregates of quotes, alerts and monitor uptime"""
+
+    def __init__(self, path: Optional[str] = None, utc_offset_hours: float = DAY_UTC_OFFSET_HOURS,
+                 checkpoint_interval: float = 60.0, max_gap: float = 900.0,
+                 on_rollover: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Initialize an empty day
+
+        Args:
+            path: JSON checkpoint file, None keeps the state in memory only
+            utc_offset_hours: Timezone the day boundary is in, e.g. 3 for Istanbul
+            checkpoint_interval: Minimum seconds between maybe_checkpoint() writes
+            max_gap: Longest pause between monitor cycles still counted as up
+            on_rollover: Called with the finished day's summary when a new day starts
+        """
+        self.path = path
+        self.utc_offset = utc_offset_hours * 3600
+        self.checkpoint_interval = checkpoint_interval
+        self.max_gap = max_gap
+        self.on_rollover = on_rollover
+        self._lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+        self.previous: Optional[Dict[str, Any]] = None
+        # Latest spread per exchange and pair, kept across days. Each cycle adds their total to the
+        # day's average, so quotes that did not change don't have to be recorded again.
+        self.current_spread: Dict[str, float] = {}
+        self._current_total = 0.0
+        self._reset(self.day_of(time.time()))
+
+    def _reset(self, day: str):
+        self.day = day
+        self._day_start = datetime.datetime.strptime(day, "%Y-%m-%d").replace(
+            tzinfo=datetime.timezone.utc).timestamp() - self.utc_offset
+        self._day_end = self._day_start + 86400
+        self.spread_pct = RunningStats()
+        self.spread_sum = 0.0
+        self.spread_samples = 0
+        self.quotes = 0
+        self.fetch_errors = 0
+        self.alerts = 0
+        self.alerts_by_urgency: Dict[str, int] = {}
+        self.alerts_by_pair: Dict[str, int] = {}
+        # Latest 24h quote volume per pair, as reported by the exchange
+        self.volume_24h: Dict[str, float] = {}
+        self.up_seconds = 0.0
+        self.first_seen: Optional[float] = None
+        self.last_seen: Optional[float] = None
+
+    def day_of(self, ts: float) -> str:
+        return datetime.datetime.fromtimestamp(ts + self.utc_offset, datetime.timezone.utc).strftime("%Y-%m-%d")
+
+    def _advance(self, ts: float) -> Optional[Dict[str, Any]]:
+        """Roll over to ts's day if it started, called with the lock held; returns the finished day"""
+        if ts < self._day_end:
+            return None
+        day = self.day_of(ts)
+        self.previous = self._summary()
+        self._reset(day)
+        return self.previous
+
+    def _rolled_over(self, finished: Optional[Dict[str, Any]]):
+        """Run on_rollover outside the lock, so a slow send doesn't block recording"""
+        if finished is not None and self.on_rollover is not None:
+            self.on_rollover(finished)
+
+    def record_quote(self, quote: Dict[str, Any], ts: Optional[float] = None):
+        """
+        Add a fetch_* quote, needed only when it differs from the pair's previous quote
+
+        Args:
+            quote: Dict with bid and ask (and optionally volume_usdt), or an error
+            ts: Epoch seconds, default received_at or now
+        """
+        ts = ts or quote.get("received_at") or time.time()
+        with self._lock:
+            finished = self._advance(ts)
+            if "error" in quote:
+                self.fetch_errors += 1
+            else:
+                self.quotes += 1
+                bid, ask = quote["bid"], quote["ask"]
+                if bid > 0 and ask > 0:
+                    spread = (ask - bid) / ((ask + bid) / 2) * 100
+                    self.spread_pct.add(spread)
+                    key = f"{quote['exchange']}:{quote['symbol']}"
+                    self._current_total += spread - self.current_spread.get(key, 0.0)
+                    self.current_spread[key] = spread
+                if "volume_usdt" in quote:
+                    self.volume_24h[quote["symbol"]] = quote["volume_usdt"]
+        self._rolled_over(finished)
+
+    def record_alert(self, pair: str, urgency: str = "high", ts: Optional[float] = None):
+        """Count one alert card"""
+        with self._lock:
+            finished = self._advance(ts or time.time())
+            self.alerts += 1
+            self.alerts_by_urgency[urgency] = self.alerts_by_urgency.get(urgency, 0) + 1
+            self.alerts_by_pair[pair] = self.alerts_by_pair.get(pair, 0) + 1
+        self._rolled_over(finished)
+
+    def record_cycle(self, ts: Optional[float] = None):
+        """
+        Heartbeat of one monitor cycle
+
+        The gaps between cycles are counted as uptime, and every pair's latest
+        spread is added to the day's average spread.
+        """
+        ts = ts or time.time()
+        with self._lock:
+            finished = self._advance(ts)
+            self.spread_sum += self._current_total
+            self.spread_samples += len(self.current_spread)
+            if self.last_seen is not None:
+                self.up_seconds += min(max(0.0, ts - self.last_seen), self.max_gap)
+            if self.first_seen is None:
+                self.first_seen = ts
+            self.last_seen = ts
+        self._rolled_over(finished)
+
+    def _summary(self) -> Dict[str, Any]:
+        observed = (self.last_seen - max(self._day_start, self.first_seen)) if self.first_seen is not None else 0.0
+        busiest = max(self.volume_24h.items(), key=lambda item: item[1], default=None)
+        most_alerted = max(self.alerts_by_pair.items(), key=lambda item: item[1], default=None)
+        return {
+            "day": self.day,
+            "quotes": self.quotes,
+            "fetch_errors": self.fetch_errors,
+            "volume_24h_usdt": sum(self.volume_24h.values()),
+            "most_active_pair": busiest[0] if busiest else None,
+            "most_alerted_pair": most_alerted[0] if most_alerted else None,
+            "alerts": self.alerts,
+            "critical_alerts": self.alerts_by_urgency.get("high", 0),
+            "avg_spread_pct": (self.spread_sum / self.spread_samples if self.spread_samples
+                               else self.spread_pct.mean if self.spread_pct.count else None),
+            "max_spread_pct": self.spread_pct.max if self.spread_pct.count else None,
+            "uptime_pct": 100.0 * min(1.0, self.up_seconds / observed) if observed > 0 else None
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Current day's aggregates"""
+        with self._lock:
+            finished = self._advance(time.time())
+            current = self._summary()
+        self._rolled_over(finished)
+        return current
+
+    def summary_details(self, summary: Optional[Dict[str, Any]] = None,
+                        extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Card fields for a summary
+
+        Args:
+            summary: From summary() or a rollover, default the current day
+            extra: Additional fields appended to the card
+        """
+        s = summary or self.summary()
+
+        def pct(value, digits=2):
+            return f"%{value:.{digits}f}" if value is not None else "-"
+
+        details = {
+            "Gün": s["day"],
+            "Toplam İşlem Hacmi": _money(s["volume_24h_usdt"]),
+            "En Aktif Parite": s["most_active_pair"] or "-",
+            "Risk Uyarıları": str(s["alerts"]),
+            "Kritik Uyarılar": str(s["critical_alerts"]),
+            "Sistem Uptime": pct(s["uptime_pct"], 1),
+            "Ortalama Spread": pct(s["avg_spread_pct"]),
+            "İşlenen Kotasyon": f"{s['quotes']:,}"
+        }
+        details.update(extra or {})
+        return details
+
+    def publish(self, client, summary: Optional[Dict[str, Any]] = None,
+                extra: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Send the daily summary card as a low-urgency rich card"""
+        return client.send_rich_alert_card("Günlük Trading Özeti", self.summary_details(summary, extra), "low")
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "version": CHECKPOINT_VERSION,
+                "day": self.day,
+                "spread_pct": self.spread_pct.to_dict(),
+                "spread_sum": self.spread_sum,
+                "spread_samples": self.spread_samples,
+                "current_spread": self.current_spread,
+                "quotes": self.quotes,
+                "fetch_errors": self.fetch_errors,
+                "alerts": self.alerts,
+                "alerts_by_urgency": self.alerts_by_urgency,
+                "alerts_by_pair": self.alerts_by_pair,
+                "volume_24h": self.volume_24h,
+                "up_seconds": self.up_seconds,
+                "first_seen": self.first_seen,
+                "last_seen": self.last_seen,
+                "previous": self.previous
+            }
+
+    def checkpoint(self):
+        """Write the state to path atomically"""
+        if not self.path:
+            return
+        state = self.to_dict()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+        self._last_checkpoint = time.monotonic()
+
+    def maybe_checkpoint(self) -> bool:
+        """Checkpoint if checkpoint_interval has passed since the last write"""
+        if self.path and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+            return True
+        return False
+
+    def _restore(self, state: Dict[str, Any]):
+        """Take the day's accumulators from a checkpoint"""
+        self.spread_pct = RunningStats.from_dict(state["spread_pct"])
+        self.spread_sum = state.get("spread_sum", 0.0)
+        self.spread_samples = state.get("spread_samples", 0)
+        for field in ("quotes", "fetch_errors", "alerts", "alerts_by_urgency", "alerts_by_pair",
+                      "volume_24h", "up_seconds", "first_seen", "last_seen"):
+            setattr(self, field, state[field])
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "TradingSummary":
+        """
+        Resume from a checkpoint; a missing or unreadable file starts an empty day
+
+        Args:
+            path: JSON checkpoint file, also used for later checkpoints
+            kwargs: Passed to the constructor
+        """
+        summary = cls(path, **kwargs)
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return summary
+        except (OSError, ValueError) as e:
+            print(f"❌ Ignoring unreadable summary checkpoint {path}: {e}")
+            return summary
+        if state.get("version") != CHECKPOINT_VERSION:
+            return summary
+
+        with summary._lock:
+            summary.previous = state.get("previous")
+            summary.current_spread = state.get("current_spread", {})
+            summary._current_total = sum(summary.current_spread.values())
+            if state["day"] == summary.day:
+                summary._restore(state)
+            elif state["day"] < summary.day:
+                # Stopped before midnight, the checkpoint is that day's final state. It is
+                # resumed as is, so the first record rolls it over and on_rollover sends its card.
+                summary._reset(state["day"])
+                summary._restore(state)
+        return summary
+
+
+def _money(value: float) -> str:
+    if value >= 1e9:
+        return f"${value / 1e9:.1f}B"
+    if value >= 1e6:
+        return f"${value / 1e6:.1f}M"
+    if value >= 1e3:
+        return f"${value / 1e3:.1f}K"
+    return f"${value:,.0f}"
+
+
+def main():
+    """Print the summary card fields from a checkpoint"""
+    summary = TradingSummary.load(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CHECKPOINT_PATH)
+    for key, value in summary.summary_details().items():
+        print(f"{key}: {value}")
+    if summary.previous:
+        print(f"\nPrevious day ({summary.previous['day']}):")
+        for key, value in summary.summary_details(summary.previous).items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
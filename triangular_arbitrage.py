@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Triangular and Multi-Leg Arbitrage Detector
+Keeps a currency graph built from live bookTicker quotes. Currencies are
+nodes, and every market adds two directed edges weighted by the log of the
+rate after fees: selling the base at the bid and buying it at the ask. With
+cross-venue scanning each edge takes the better venue, so a cycle can mix
+Binance and Gate.io legs.
+
+Cycles of up to max_legs edges are found once, when the market that
+completes them is first seen, and indexed by the edges they use. A quote
+update then re-scores only the cycles through its two edges instead of
+running Bellman-Ford over the whole graph. A cycle alerts when it becomes
+profitable and again only after it stopped being profitable.
+"""
+
+import argparse
+import math
+import random
+import time
+from typing import Dict, Any, List, Optional, Tuple, NamedTuple
+
+from metrics import ALERTS_RAISED, count_delivery
+
+# Taker fee per trade, by venue
+TAKER_FEES = {"Binance": 0.001, "Gate.io": 0.002}
+DEFAULT_FEE = 0.002
+MIN_PROFIT_PCT = 0.1  # Round-trip profit after fees that raises an alert
+HIGH_PROFIT_PCT = 0.5  # Profit at which the alert is high urgency
+MAX_LEGS = 3
+MAX_ALERTS_PER_SCAN = 5  # One mispriced market can open dozens of cycles at once
+CHECK_INTERVAL_SEC = 10
+
+# Quote assets recognised at the end of Binance symbols, longest first where they overlap
+QUOTE_ASSETS = ("FDUSD", "USDT", "USDC", "TUSD", "BTC", "ETH", "BNB", "TRY", "EUR")
+
+CROSS_VENUE = "*"
+
+
+def split_symbol(symbol: str) -> Optional[Tuple[str, str]]:
+    """(base, quote) for "ETH_BTC" (Gate.io) or "ETHBTC" (Binance), None if unknown"""
+    if "_" in symbol:
+        base, _, quote = symbol.partition("_")
+        return base, quote
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return None
+
+
+class Leg(NamedTuple):
+    venue: str
+    source: str
+    target: str
+    rate: float  # Units of target per unit of source, after fees
+
+
+class Opportunity(NamedTuple):
+    path: Tuple[str, ...]  # Currencies in trade order, returning to path[0]
+    legs: Tuple[Leg, ...]
+    profit_pct: float
+
+    @property
+    def route(self) -> str:
+        return " → ".join(self.path + (self.path[0],))
+
+    @property
+    def cross_venue(self) -> bool:
+        return len({leg.venue for leg in self.legs}) > 1
+
+
+class ArbitrageGraph:
+    """Currency graph with an edge -> cycles index for incremental scoring"""
+
+    def __init__(self, fees: Optional[Dict[str, float]] = None, min_profit_pct: float = MIN_PROFIT_PCT,
+                 max_legs: int = MAX_LEGS, cross_venue: bool = True):
+        """
+        Initialize an empty graph
+
+        Args:
+            fees: Taker fee per venue, default TAKER_FEES
+            min_profit_pct: Profit after fees, in percent, for a cycle to count as an opportunity
+            max_legs: Longest cycle to index, 3 (triangles) or 4
+            cross_venue: Let one cycle use markets on different venues; otherwise each venue is its own graph
+        """
+        if max_legs not in (3, 4):
+            raise ValueError("max_legs must be 3 or 4")
+        self.fees = dict(TAKER_FEES if fees is None else fees)
+        self.threshold = math.log1p(min_profit_pct / 100)
+        self.max_legs = max_legs
+        self.cross_venue = cross_venue
+        # (scope, source, target) -> {venue: log rate}, and the best of them as (log rate, venue);
+        # an edge whose markets are all halted keeps its (empty) rates entry but has no best
+        self._venue_rates: Dict[tuple, Dict[str, float]] = {}
+        self._best: Dict[tuple, Tuple[float, str]] = {}
+        # (scope, currency) -> currencies it has an edge to, and from
+        self._out: Dict[tuple, set] = {}
+        self._in: Dict[tuple, set] = {}
+        self._cycles: List[Tuple[tuple, ...]] = []
+        self._edge_cycles: Dict[tuple, List[int]] = {}
+        # cycle id -> log profit, for cycles currently above the threshold
+        self.profitable: Dict[int, float] = {}
+        # Last raw (bid, ask) and parsed symbol per (venue, symbol), for scan_book()
+        self._raw: Dict[tuple, tuple] = {}
+        self._markets: Dict[tuple, Optional[Tuple[str, str]]] = {}
+        self.updates = 0
+        self.rescored = 0
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._best)
+
+    @property
+    def cycle_count(self) -> int:
+        return len(self._cycles)
+
+    def update(self, venue: str, base: str, quote: str, bid: float, ask: float) -> List[Opportunity]:
+        """
+        Apply one market's best bid and ask
+
+        Returns:
+            Cycles through this market that just became profitable
+        """
+        if bid <= 0 or ask <= 0:
+            # A halted market's last rate must not keep its cycles alive
+            self.remove(venue, base, quote)
+            return []
+        self.updates += 1
+        fee = math.log1p(-self.fees.get(venue, DEFAULT_FEE))
+        scope = CROSS_VENUE if self.cross_venue else venue
+        opportunities = []
+        # Sell base at the bid, buy base with quote at the ask
+        for source, target, rate in ((base, quote, math.log(bid) + fee), (quote, base, fee - math.log(ask))):
+            edge = (scope, source, target)
+            if self._set_rate(edge, venue, rate):
+                opportunities.extend(self._rescore(edge))
+        return opportunities
+
+    def remove(self, venue: str, base: str, quote: str):
+        """Drop one market, e.g. a halted one, and re-score the cycles through it"""
+        scope = CROSS_VENUE if self.cross_venue else venue
+        for source, target in ((base, quote), (quote, base)):
+            edge = (scope, source, target)
+            if self._clear_rate(edge, venue):
+                # Rates only went down, so nothing becomes profitable
+                self._rescore(edge)
+
+    def _set_rate(self, edge: tuple, venue: str, rate: float) -> bool:
+        """Store a venue's rate, True if the edge's best rate changed"""
+        rates = self._venue_rates.get(edge)
+        if rates is None:
+            self._venue_rates[edge] = {venue: rate}
+            self._best[edge] = (rate, venue)
+            self._add_edge(edge)
+            return True
+        rates[venue] = rate
+        best = self._best.get(edge)
+        if best is None:
+            # Every market on the edge was halted, this one is back
+            self._best[edge] = (rate, venue)
+            return True
+        if venue == best[1]:
+            if rate < best[0] and len(rates) > 1:
+                # The best venue got worse, another one may be better now
+                top = max(rates, key=rates.get)
+                self._best[edge] = (rates[top], top)
+            else:
+                self._best[edge] = (rate, venue)
+        elif rate > best[0]:
+            self._best[edge] = (rate, venue)
+        else:
+            return False
+        return self._best[edge] != best
+
+    def _clear_rate(self, edge: tuple, venue: str) -> bool:
+        """Forget a venue's rate, True if the edge's best rate changed"""
+        rates = self._venue_rates.get(edge)
+        if not rates or rates.pop(venue, None) is None:
+            return False
+        if self._best[edge][1] != venue:
+            return False
+        if rates:
+            top = max(rates, key=rates.get)
+            self._best[edge] = (rates[top], top)
+        else:
+            del self._best[edge]
+        return True
+
+    def _add_edge(self, edge: tuple):
+        """Index the cycles this new edge completes"""
+        scope, u, v = edge
+        out, into = self._out, self._in
+        out.setdefault((scope, u), set()).add(v)
+        into.setdefault((scope, v), set()).add(u)
+        empty = set()
+        v_out = out.get((scope, v), empty)
+        u_in = into.get((scope, u), empty)
+        # Set intersections iterate the smaller side, so hubs like USDT stay cheap
+        for w in v_out & u_in:
+            self._add_cycle((edge, (scope, v, w), (scope, w, u)))
+        if self.max_legs >= 4:
+            if len(v_out) <= len(u_in):
+                pairs = ((w, x) for w in v_out for x in out.get((scope, w), empty) & u_in)
+            else:
+                pairs = ((w, x) for x in u_in for w in v_out & into.get((scope, x), empty))
+            for w, x in pairs:
+                if w != u and x != v and w != x:
+                    self._add_cycle((edge, (scope, v, w), (scope, w, x), (scope, x, u)))
+
+    def _add_cycle(self, edges: Tuple[tuple, ...]):
+        cycle_id = len(self._cycles)
+        self._cycles.append(edges)
+        for edge in edges:
+            self._edge_cycles.setdefault(edge, []).append(cycle_id)
+
+    def _rescore(self, edge: tuple) -> List[Opportunity]:
+        best = self._best
+        opportunities = []
+        for cycle_id in self._edge_cycles.get(edge, ()):
+            total = 0.0
+            for cycle_edge in self._cycles[cycle_id]:
+                rate = best.get(cycle_edge)
+                if rate is None:
+                    # No market left on this leg
+                    total = -math.inf
+                    break
+                total += rate[0]
+            self.rescored += 1
+            if total > self.threshold:
+                if cycle_id not in self.profitable:
+                    opportunities.append(self._opportunity(cycle_id, total))
+                self.profitable[cycle_id] = total
+            else:
+                self.profitable.pop(cycle_id, None)
+        return opportunities
+
+    def _opportunity(self, cycle_id: int, total: float) -> Opportunity:
+        edges = self._cycles[cycle_id]
+        legs = tuple(Leg(self._best[edge][1], edge[1], edge[2], math.exp(self._best[edge][0])) for edge in edges)
+        return Opportunity(tuple(edge[1] for edge in edges), legs, math.expm1(total) * 100)
+
+    def current(self) -> List[Opportunity]:
+        """Every cycle that is profitable right now, best first"""
+        ranked = sorted(self.profitable.items(), key=lambda item: item[1], reverse=True)
+        return [self._opportunity(cycle_id, total) for cycle_id, total in ranked]
+
+    def scan_book(self, book) -> List[Opportunity]:
+        """
+        Apply the markets that changed in a QuoteBook
+
+        Args:
+            book: exchange_spread_monitor.QuoteBook (anything with tickers())
+
+        Returns:
+            Cycles that just became profitable
+        """
+        opportunities = []
+        raw, markets = self._raw, self._markets
+        for venue, symbol, bid, ask in book.tickers():
+            key = (venue, symbol)
+            if raw.get(key) == (bid, ask):
+                continue
+            raw[key] = (bid, ask)
+            market = markets.get(key, False)
+            if market is False:
+                market = markets[key] = split_symbol(symbol)
+            if market is None:
+                continue
+            try:
+                bid_price, ask_price = float(bid), float(ask)
+            except (TypeError, ValueError):
+                # Gate.io leaves the book empty for halted markets
+                self.remove(venue, market[0], market[1])
+                continue
+            opportunities.extend(self.update(venue, market[0], market[1], bid_price, ask_price))
+        return opportunities
+
+
+def send_opportunity(client, opportunity: Opportunity) -> Dict[str, Any]:
+    """
+    Send one opportunity as a rich card
+
+    Args:
+        client: LarkGroupChatClient (or compatible)
+        opportunity: From ArbitrageGraph.update() or scan_book()
+    """
+    details = {
+        "Route": opportunity.route,
+        "Profit % (after fees)": f"{opportunity.profit_pct:.3f}%",
+        "Type": "Cross-exchange" if opportunity.cross_venue else f"Intra-exchange ({opportunity.legs[0].venue})"
+    }
+    for number, leg in enumerate(opportunity.legs, 1):
+        details[f"Leg {number}"] = f"{leg.venue}: {leg.source} → {leg.target} @ {leg.rate:.8g}"
+    urgency = "high" if opportunity.profit_pct >= HIGH_PROFIT_PCT else "medium"
+
+    ALERTS_RAISED.inc()
+    result = client.send_rich_alert_card(f"Triangular Arbitrage: {opportunity.route}", details, urgency)
+    count_delivery(result)
+    if result['success']:
+        print(f"✅ Arbitrage alert sent for {opportunity.route}")
+    else:
+        print(f"❌ Failed to send arbitrage alert for {opportunity.route}: {result['error']}")
+    return result
+
+
+def send_opportunities(client, opportunities: List[Opportunity], limit: int = MAX_ALERTS_PER_SCAN) -> int:
+    """
+    Send the most profitable of a scan's new opportunities
+
+    Returns:
+        Number of cards sent successfully
+    """
+    ranked = sorted(opportunities, key=lambda opportunity: opportunity.profit_pct, reverse=True)
+    if len(ranked) > limit:
+        print(f"{len(ranked)} new arbitrage cycles, alerting the top {limit}")
+    return sum(send_opportunity(client, opportunity)['success'] for opportunity in ranked[:limit])
+
+
+def synthetic_markets(bases: int, seed: int = 0) -> List[tuple]:
+    """(venue, base, quote, bid, ask) for bases quoted in USDT, BTC and ETH on two venues, free of arbitrage"""
+    rng = random.Random(seed)
+    usd = {"USDT": 1.0, "BTC": 64000.0, "ETH": 3100.0}
+    usd.update({f"C{i:04d}": rng.uniform(0.05, 500.0) for i in range(bases)})
+    markets = [(venue, "BTC", "USDT") for venue in TAKER_FEES] + [(venue, "ETH", "USDT") for venue in TAKER_FEES]
+    markets += [(venue, "ETH", "BTC") for venue in TAKER_FEES]
+    for i in range(bases):
+        for quote in ("USDT", "BTC", "ETH"):
+            for venue in TAKER_FEES:
+                markets.append((venue, f"C{i:04d}", quote))
+    quotes = []
+    for venue, base, quote in markets:
+        mid = usd[base] / usd[quote]
+        quotes.append((venue, base, quote, mid * (1 - 0.0003), mid * (1 + 0.0003)))
+    return quotes
+
+
+def run_benchmark(bases: int, updates: int, max_legs: int = MAX_LEGS) -> Dict[str, float]:
+    """Build a synthetic graph, then time single-market updates against one Bellman-Ford sweep"""
+    markets = synthetic_markets(bases)
+    graph = ArbitrageGraph(max_legs=max_legs)
+    start = time.perf_counter()
+    for market in markets:
+        graph.update(*market)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(1)
+    found = 0
+    graph.rescored = 0
+    start = time.perf_counter()
+    for _ in range(updates):
+        venue, base, quote, bid, ask = rng.choice(markets)
+        step = 1 + rng.uniform(-0.002, 0.002)
+        found += len(graph.update(venue, base, quote, bid * step, ask * step))
+    update_s = (time.perf_counter() - start) / updates
+
+    # One relaxation pass over every edge; Bellman-Ford needs up to V-1 of them per run
+    distance = {node: 0.0 for _, node in graph._out}
+    edges = [(u, v, -rate) for (_, u, v), (rate, _) in graph._best.items()]
+    start = time.perf_counter()
+    for u, v, weight in edges:
+        if distance[u] + weight < distance.get(v, 0.0):
+            distance[v] = distance[u] + weight
+    sweep_s = time.perf_counter() - start
+
+    return {
+        "markets": len(markets),
+        "edges": graph.edge_count,
+        "cycles": graph.cycle_count,
+        "build_s": build_s,
+        "update_us": update_s * 1e6,
+        "cycles_rescored_per_update": graph.rescored / updates,
+        "opportunities": found,
+        "bellman_ford_us": sweep_s * (len(distance) - 1) * 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Triangular and multi-leg arbitrage over Binance and Gate.io quotes")
+    parser.add_argument("--webhook", help="Lark webhook URL, default the spread monitor's")
+    parser.add_argument("--min-profit", type=float, default=MIN_PROFIT_PCT, help="profit after fees in percent")
+    parser.add_argument("--max-legs", type=int, default=MAX_LEGS, choices=(3, 4), help="longest cycle")
+    parser.add_argument("--intra-venue", action="store_true", help="only cycles within one exchange")
+    parser.add_argument("--interval", type=float, default=CHECK_INTERVAL_SEC, help="seconds between scans")
+    parser.add_argument("--benchmark", type=int, metavar="BASES", help="time updates on a synthetic graph")
+    parser.add_argument("--updates", type=int, default=100000, help="benchmark updates")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        result = run_benchmark(args.benchmark, args.updates, args.max_legs)
+        print(f"{result['markets']} markets, {result['edges']} edges, {result['cycles']} cycles "
+              f"indexed in {result['build_s']:.2f}s")
+        print(f"One update: {result['update_us']:.1f}µs, re-scoring {result['cycles_rescored_per_update']:.1f} cycles")
+        print(f"One Bellman-Ford run over the graph: ~{result['bellman_ford_us'] / 1000:.0f}ms")
+        return
+
+    import exchange_spread_monitor
+    from lark_group_chat import LarkGroupChatClient
+
+    client = LarkGroupChatClient(args.webhook or exchange_spread_monitor.WEBHOOK_URL)
+    graph = ArbitrageGraph(min_profit_pct=args.min_profit, max_legs=args.max_legs,
+                           cross_venue=not args.intra_venue)
+    while True:
+        book = exchange_spread_monitor.QuoteBook.fetch()
+        start = time.perf_counter()
+        opportunities = graph.scan_book(book)
+        print(f"{graph.edge_count} edges, {graph.cycle_count} cycles, {len(graph.profitable)} profitable, "
+              f"scan {(time.perf_counter() - start) * 1000:.1f}ms")
+        send_opportunities(client, opportunities)
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()